@@ -0,0 +1,193 @@
+"""Benchmarks of data generation, statistics and headless rendering at increasing cohort sizes.
+
+It includes:
+- Timing of every benchmark with its latency (median seconds per call) and throughput (rows per second)
+- The peak memory of every benchmark, measured with `tracemalloc` in a separate untimed call
+- The import time of the command line, so slow imports are caught like slow functions
+- Saving the results as a JSON baseline and comparing a run against a saved baseline
+
+Run from the repository root:
+    python -m benchmarks.run --sizes 78 10000 1000000 --save baseline.json
+    python -m benchmarks.run --sizes 78 10000 1000000 --compare baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from src.functions.calculate import analyze_cortisol_data, analyze_saa_response, calculate_two_way_anova_with_viz, chi_square
+from src.functions.general import generate_numbers_with_stats, prepare_data_from_csv
+from src.functions.report import analyze_study
+from src.objects.initialize_file import InitializeFile, read_participants
+from src.objects.renderer import Renderer
+from src.objects.study_dataset import StudyDataset
+
+# Cohort sizes (rows) benchmarked by default; up to 10**7 can be passed with --sizes
+DEFAULT_SIZES = (78, 10_000, 100_000, 1_000_000)
+
+# Slowdown over the baseline above which a benchmark counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def cohort_benchmarks(size: int, output_dir: Path) -> tuple:
+    """Lists the benchmarks of one cohort size.
+
+    Parameters:
+        size (int): Requested number of rows; the cohort is the smallest scale of the original data reaching it.
+        output_dir (Path): Directory the headless figures are written to.
+
+    Returns:
+        tuple: The actual number of rows and a dictionary of benchmark callables by name.
+    """
+    participants = len(read_participants())
+    scale = math.ceil(size / participants)
+    study = StudyDataset(InitializeFile(scale=scale).file)
+    rows = len(study.data)
+    contingency_table = prepare_data_from_csv(study.data)
+
+    benchmarks = {
+        "InitializeFile": lambda: InitializeFile(scale=scale),
+        "generate_numbers_with_stats": lambda: generate_numbers_with_stats(rows, 10.0, 2.0, 0.0, 20.0),
+        "prepare_data_from_csv": lambda: prepare_data_from_csv(study.data),
+        "chi_square": lambda: chi_square(contingency_table),
+        "analyze_saa_response": lambda: analyze_saa_response(study),
+        # These two add columns to their input, so each call gets its own shallow copy
+        "analyze_cortisol_data": lambda: analyze_cortisol_data(study.copy()),
+        "calculate_two_way_anova_with_viz": lambda: calculate_two_way_anova_with_viz(study.copy(), ["negative_image", "positive_image"]),
+    }
+
+    # Every visualization function, with the arguments the report draws it with
+    renderer = Renderer(output_dir)
+    for section in analyze_study(study):
+        for job in section["figures"]:
+            plot, args, kwargs = job if len(job) == 3 else (*job, {})
+            benchmarks.setdefault(plot.__name__, lambda plot=plot, args=args, kwargs=kwargs: plot(*args, renderer=renderer, **kwargs))
+    return rows, benchmarks
+
+def measure(benchmark: Callable, min_time: float = 0.2, max_repeat: int = 20) -> tuple:
+    """Measures the peak memory of a benchmark in one call, then times it.
+
+    Parameters:
+        benchmark (Callable): The call to measure.
+        min_time (float): Calls are repeated until they took this many seconds in total. Default is 0.2.
+        max_repeat (int): Maximum number of timed calls. Default is 20.
+
+    Returns:
+        tuple: The median seconds per call, the number of timed calls and the peak traced memory in bytes.
+    """
+    # The traced call also warms up caches and lazy imports before the timed calls
+    tracemalloc.start()
+    try:
+        benchmark()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    while not timings or (len(timings) < max_repeat and sum(timings) < min_time):
+        start = time.perf_counter()
+        benchmark()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), len(timings), peak
+
+def run(sizes: list, names: list | None = None, min_time: float = 0.2, max_repeat: int = 20) -> dict:
+    """Runs the benchmarks at every cohort size.
+
+    Parameters:
+        sizes (list): Requested cohort sizes, in rows.
+        names (list, optional): Names of the benchmarks to run. Default is all of them.
+        min_time (float): Minimum total timed seconds per benchmark. Default is 0.2.
+        max_repeat (int): Maximum number of timed calls per benchmark. Default is 20.
+
+    Returns:
+        dict: The environment ('environment') and one result per benchmark and size ('results'), keyed 'name@rows'.
+    """
+    results = {}
+    # Startup of a fresh interpreter importing the command line, which statistics-only runs pay
+    if names is None or "import src.cli" in names:
+        seconds, repeat, _ = measure(lambda: subprocess.run([sys.executable, "-c", "import src.cli"], check=True), min_time, max_repeat)
+        results["import src.cli"] = {"name": "import src.cli", "rows": 0, "seconds": seconds, "rows_per_second": None, "peak_memory_mb": None, "repeat": repeat}
+        print(f"{'import src.cli':<55}{'':>10}{seconds * 1000:>12.2f} ms", flush=True)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            # Silence the progress messages of the loading code
+            with contextlib.redirect_stdout(io.StringIO()):
+                rows, benchmarks = cohort_benchmarks(size, Path(directory))
+            for name, benchmark in benchmarks.items():
+                if names is not None and name not in names:
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, repeat, peak = measure(benchmark, min_time, max_repeat)
+                results[f"{name}@{rows}"] = {"name": name, "rows": rows, "seconds": seconds, "rows_per_second": rows / seconds,
+                                             "peak_memory_mb": peak / 1024 ** 2, "repeat": repeat}
+                print(f"{name:<55}{rows:>10}{seconds * 1000:>12.2f} ms{rows / seconds:>14.3g} rows/s{peak / 1024 ** 2:>10.1f} MB", flush=True)
+    return {"environment": environment(), "results": results}
+
+def environment() -> dict:
+    """Describes the machine, the library versions and the commit the benchmarks ran on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(),
+            "numpy": np.__version__, "pandas": pd.__version__, "matplotlib": matplotlib.__version__}
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Compares the latency of every benchmark present in both runs.
+
+    Parameters:
+        current (dict): The new run, as returned by `run`.
+        baseline (dict): The saved run.
+        tolerance (float): Relative slowdown tolerated before a benchmark counts as a regression. Default is 0.25.
+
+    Returns:
+        list: The keys of the regressed benchmarks.
+    """
+    regressions = []
+    print(f"\nCompared with commit {baseline['environment'].get('commit')}:")
+    for key, result in current["results"].items():
+        if key not in baseline["results"]:
+            continue
+        ratio = result["seconds"] / baseline["results"][key]["seconds"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ("faster" if ratio < 1 / (1 + tolerance) else "")
+        if flag == "REGRESSION":
+            regressions.append(key)
+        print(f"{key:<65}{ratio:>8.2f}x  {flag}")
+    return regressions
+
+def main(argv: list | None = None) -> int:
+    """Runs the benchmarks from the command line; exits with 1 when a compared benchmark regressed."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", nargs="+", type=lambda size: int(float(size)), default=list(DEFAULT_SIZES), help="cohort sizes in rows (e.g. 78 1e5 1e7)")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these benchmarks")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum total timed seconds per benchmark")
+    parser.add_argument("--max-repeat", type=int, default=20, help="maximum number of timed calls per benchmark")
+    parser.add_argument("--save", type=Path, help="write the results to this JSON baseline")
+    parser.add_argument("--compare", type=Path, help="compare the results with this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="tolerated relative slowdown (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    matplotlib.use("Agg")
+    current = run(args.sizes, args.only, args.min_time, args.max_repeat)
+    if args.save is not None:
+        args.save.write_text(json.dumps(current, indent=2))
+    if args.compare is not None:
+        return int(bool(compare(current, json.loads(args.compare.read_text()), args.tolerance)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Command-line entry point running selected research questions of the study.
+
+It includes:
+- Options for the input file, the output directory, the seed and the cohort scale factor
+- A subset of research questions, so only the analyses they need are loaded and run
+- A table of the wall time (and, on request, peak memory) of every stage, written to stderr
+- An optional trace of every traced function call, for Chrome/Perfetto and as JSON Lines
+- A batch mode analyzing every study of a directory or manifest of participant files into one results table
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from src.functions.batch import analyze_studies
+from src.functions.report import QUESTIONS, analyze_study, question_stages, study_pipeline, summarize, write_report
+from src.objects.dataset_cache import CACHE_DIR
+from src.objects.initialize_file import DATA_PATH
+from src.objects.tracer import Tracer, span
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the parser of the command-line options.
+
+    Returns:
+        argparse.ArgumentParser: The parser of `main`.
+    """
+    parser = argparse.ArgumentParser(prog="finalproject", description="Run the research questions of the HC/NC stress study.")
+    parser.add_argument("-i", "--input", type=Path, default=DATA_PATH, help="participant CSV file (default: the bundled data set)")
+    parser.add_argument("-o", "--output", type=Path, help="write the HTML and JSON report with its figures to this directory; "
+                                                          "otherwise the statistics are printed as JSON")
+    parser.add_argument("--batch", type=Path, metavar="SOURCE", help="analyze every study of a directory of participant CSVs or of a "
+                                                                      "manifest CSV instead of --input, and write one results table "
+                                                                      "(to OUTPUT/results.csv, or as CSV on stdout)")
+    parser.add_argument("--csv", type=Path, help="also save the augmented participant table to this CSV file")
+    parser.add_argument("-q", "--questions", nargs="+", choices=list(QUESTIONS), metavar="QUESTION",
+                        help=f"research questions to run, among: {', '.join(QUESTIONS)} (default: all)")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the generated columns (default: 42)")
+    parser.add_argument("--scale", type=int, default=1, help="cohort scale factor of the generated columns (default: 1)")
+    parser.add_argument("-j", "--jobs", type=int, help="number of analyses and figure workers run at the same time (default: one per CPU)")
+    parser.add_argument("--trace-memory", action="store_true", help="also measure the peak memory of every stage; the analyses then run "
+                                                                     "one at a time, whatever --jobs, and somewhat slower")
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR / "stages", help="directory of the memoized analysis results")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every analysis without reading or writing the stage cache")
+    parser.add_argument("--trace", type=Path, help="write a Chrome/Perfetto trace of the traced function calls to this file, "
+                                                   "and their structured log next to it (.jsonl)")
+    return parser
+
+def main(argv: list | None = None) -> int:
+    """Runs the selected research questions and prints the timing of every stage.
+
+    Parameters:
+        argv (list, optional): Command-line arguments, without the program name. Defaults to `sys.argv`.
+
+    Returns:
+        int: The exit status.
+    """
+    args = build_parser().parse_args(argv)
+    if args.scale < 1:
+        build_parser().error("--scale must be at least 1")
+    if args.batch is None and not args.input.is_file():
+        build_parser().error(f"input file not found: {args.input}")
+    if args.batch is not None and not args.batch.exists():
+        build_parser().error(f"batch directory or manifest not found: {args.batch}")
+
+    tracer = Tracer() if args.trace is not None else contextlib.nullcontext()
+    with tracer:
+        timings = _run(args) if args.batch is None else _run_batch(args)
+    if args.trace is not None:
+        tracer.write_chrome_trace(args.trace)
+        tracer.write_log(args.trace.with_suffix(".jsonl"))
+
+    print(f"{'stage':<22}{'status':<8}{'wall time (s)':>15}{'peak memory (MB)':>18}", file=sys.stderr)
+    for name, status, duration, peak in timings:
+        memory = f"{peak / 1024 ** 2:.1f}" if peak is not None else "-"
+        print(f"{name:<22}{status:<8}{duration:>15.3f}{memory:>18}", file=sys.stderr)
+    return 0
+
+def _run(args: argparse.Namespace) -> list:
+    """Run the pipeline and the output steps; returns their timing rows."""
+    pipeline = study_pipeline(args.input, scale=args.scale, seed=args.seed, directory=None if args.no_cache else args.cache_dir,
+                              max_workers=args.jobs, trace_memory=args.trace_memory)
+    # Loading reports its progress on stdout, which carries the statistics here
+    with contextlib.redirect_stdout(sys.stderr):
+        results = pipeline.run(["study", *question_stages(args.questions)])
+    timings = [(name, "cached" if name in pipeline.reused else "run", pipeline.durations[name], pipeline.peak_memory.get(name))
+               for name in pipeline.durations]
+
+    # The remaining steps are measured the same way, in this process only (figure workers are not included)
+    with _memory_tracing(args.trace_memory):
+        if args.csv is not None:
+            timings.append(_measure("csv", lambda: results["data"].to_csv(args.csv, index=False)))
+        if args.output is not None:
+            timings.append(_measure("report", lambda: write_report(results["study"], args.output, n_jobs=args.jobs, results=results,
+                                                                   questions=args.questions)))
+        else:
+            timings.append(_measure("summary", lambda: print(json.dumps(summarize(analyze_study(results["study"], results, args.questions)), indent=2))))
+    return timings
+
+def _run_batch(args: argparse.Namespace) -> list:
+    """Analyze the studies of the batch and write their results table; returns its timing row."""
+    if args.output is not None:
+        args.output.mkdir(parents=True, exist_ok=True)
+    output = args.output / "results.csv" if args.output is not None else sys.stdout
+    with _memory_tracing(args.trace_memory):
+        return [_measure("batch", lambda: analyze_studies(args.batch, scale=args.scale, seed=args.seed, n_jobs=args.jobs, output=output))]
+
+@contextlib.contextmanager
+def _memory_tracing(enabled: bool) -> Iterator[None]:
+    """Trace the allocations of a block with `tracemalloc` when enabled."""
+    if not enabled:
+        yield
+        return
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        tracemalloc.stop()
+
+def _measure(name: str, step: Callable) -> tuple:
+    """Run one step and return its timing row: name, status, wall time and peak traced memory (None when not traced)."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    with span(name, category="stage"):
+        step()
+    return name, "run", time.perf_counter() - start, tracemalloc.get_traced_memory()[1] - baseline if tracing else None
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""This module analyzes many studies run with the same HC/NC protocol, e.g. at several sites or waves.
+
+It includes:
+- The list of studies, from a directory of participant CSVs or from a manifest
+- The augmentation and analyses of every study, in a process pool fed by threads reading the files
+- One results table with a row of statistics per study and a pooled row over all their participants
+- Studies whose analyses fail (e.g. without HC or NC participants) get empty statistics and their error, instead of aborting the batch
+"""
+import collections
+import contextlib
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+import pandas as pd
+
+from src.functions.general import augment_with_cohorts
+from src.functions.simulation import study_statistics
+from src.objects.initialize_file import COHORT_SPEC, SYNTHETIC_COLUMNS, read_participants
+from src.objects.online_statistics import OnlineStudy
+from src.objects.tracer import traced
+
+# Name of the row of the results table pooling the participants of every study
+POOLED = "pooled"
+
+
+def read_manifest(source: str | Path) -> pd.DataFrame:
+    """Lists the studies of a batch.
+
+    A directory stands for all its CSV files, named after their file names. A manifest is a CSV
+    file with one row per study: a 'path' column (relative to the manifest), an optional 'study'
+    column naming the studies (by default their file names) and any other columns describing them,
+    e.g. 'site' and 'wave', which are kept in the results table.
+
+    Parameters:
+        source (str | Path): Directory of participant CSVs, or manifest CSV.
+
+    Returns:
+        pd.DataFrame: One row per study, indexed by 'study', with its absolute 'path' and the other manifest columns.
+
+    Raises:
+        FileNotFoundError: If the source does not exist.
+        KeyError: If the manifest has no 'path' column.
+        ValueError: If there is no study or two studies share a name.
+    """
+    source = Path(source)
+    if source.is_dir():
+        paths = sorted(source.glob("*.csv"))
+        manifest = pd.DataFrame({"study": [path.stem for path in paths], "path": paths})
+    elif source.is_file():
+        manifest = pd.read_csv(source)
+        if "path" not in manifest.columns:
+            msg = "Error: the manifest needs a 'path' column."
+            raise KeyError(msg)
+        manifest["path"] = [path if path.is_absolute() else source.parent / path for path in map(Path, manifest["path"])]
+        if "study" not in manifest.columns:
+            manifest.insert(0, "study", [path.stem for path in manifest["path"]])
+    else:
+        msg = f"Error: no directory or manifest at '{source}'."
+        raise FileNotFoundError(msg)
+
+    if manifest.empty:
+        msg = "Error: the batch has no study."
+        raise ValueError(msg)
+    manifest["study"] = manifest["study"].astype(str)
+    duplicated = manifest["study"][manifest["study"].duplicated()].unique()
+    if len(duplicated) > 0:
+        msg = f"Error: several studies are named {', '.join(duplicated)}."
+        raise ValueError(msg)
+    return manifest.set_index("study")
+
+@traced
+def analyze_studies(source: str | Path, scale: int = 1, seed: int | None = 42, n_jobs: int | None = None, io_threads: int = 4,
+                    output: str | Path | IO | None = None) -> pd.DataFrame:
+    """Augments and analyzes every study of a batch, and pools their participants.
+
+    A pool of threads reads the participant files while a pool of worker processes generates the
+    synthetic columns of the studies already read and runs their analyses, so reading and computing
+    overlap. At most `io_threads + n_jobs` studies are read ahead or queued for analysis at a time,
+    so the memory held by the batch does not grow with the number of studies. The cohorts of every study are sized by the participants it contains, as when a file is
+    augmented chunk by chunk. Every study draws from its own `np.random.default_rng` stream, spawned from one
+    `np.random.SeedSequence`, so its data only depends on the seed and its position in the batch.
+
+    The pooled row treats the participants of all the studies as one cohort: the chi-square test of
+    the cortisol responders and the sAA ANOVA are derived from the merged counts and moments of the
+    studies (see `OnlineStudy`); the other statistics of this row are empty.
+
+    A study whose analyses fail, e.g. because it has no HC or no NC participant or a responder
+    class is empty, does not stop the batch: its statistics are left empty and the 'error' column
+    gives the reason. Its participants are still pooled. Studies that cannot be read still raise.
+
+    Parameters:
+        source (str | Path): Directory of participant CSVs, or manifest CSV (see `read_manifest`).
+        scale (int): Cohort scale factor of every study. Default is 1.
+        seed (int, optional): Seed of the root sequence; None draws fresh entropy. Default is 42.
+        n_jobs (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        io_threads (int): Number of threads reading the files. Default is 4.
+        output (str | Path | IO, optional): When given, also write the results table to this CSV file.
+
+    Returns:
+        pd.DataFrame: One row per study and a last 'pooled' row, indexed by 'study', with the manifest columns,
+                      the number of participants ('n_participants'), one column per statistic, named as in
+                      `simulate_study`, and the 'error' of the studies whose analyses failed (empty otherwise).
+
+    Raises:
+        ValueError: If 'n_jobs' or 'io_threads' is not positive, or the batch is invalid.
+    """
+    n_jobs = n_jobs if n_jobs is not None else os.cpu_count() or 1
+    if n_jobs <= 0 or io_threads <= 0:
+        msg = "Error: 'n_jobs' and 'io_threads' must be positive."
+        raise ValueError(msg)
+    manifest = read_manifest(source)
+    streams = np.random.SeedSequence(seed).spawn(len(manifest))
+
+    workers = ProcessPoolExecutor(max_workers=min(n_jobs, len(manifest))) if n_jobs > 1 else None
+    window = io_threads + n_jobs
+    analyses, reads, running = [], collections.deque(), set()
+    with ThreadPoolExecutor(max_workers=io_threads) as readers, workers or contextlib.nullcontext():
+        # The threads read ahead while the studies already read are analyzed, within a window of studies in memory
+        for name, stream in zip(manifest.index, streams, strict=True):
+            running = {analysis for analysis in running if not analysis.done()}
+            while len(running) >= window:
+                running = wait(running, return_when=FIRST_COMPLETED).not_done
+            while len(analyses) + len(reads) < len(manifest) and len(reads) + len(running) < window:
+                reads.append(readers.submit(read_participants, manifest["path"].iloc[len(analyses) + len(reads)]))
+            with _study_errors(name):
+                participants = reads.popleft().result()
+                if workers is None:
+                    analyses.append(_analyze_study(participants, stream, scale))
+                else:
+                    analyses.append(workers.submit(_analyze_study, participants, stream, scale))
+                    running.add(analyses[-1])
+        if workers is not None:
+            for i, name in enumerate(manifest.index):
+                with _study_errors(name):
+                    analyses[i] = analyses[i].result()
+
+    pooled = OnlineStudy()
+    for _, study in analyses:
+        pooled.merge(study)
+    pooled_row = {"n_participants": sum(row["n_participants"] for row, _ in analyses)} | _failures(lambda: _pooled_statistics(pooled))
+
+    statistics = pd.DataFrame([row for row, _ in analyses] + [pooled_row], index=pd.Index([*manifest.index, POOLED], name="study"))
+    statistics = statistics.reindex(columns=[*statistics.columns.drop("error", errors="ignore"), "error"])
+    results = manifest.drop(columns="path").reindex(statistics.index).join(statistics)
+    if output is not None:
+        results.to_csv(output)
+    return results
+
+def _analyze_study(participants: pd.DataFrame, stream: np.random.SeedSequence, scale: int) -> tuple:
+    """Augment and analyze one study; returns its row of statistics and its accumulators for the pooled row."""
+    data = augment_with_cohorts(participants, COHORT_SPEC, scale, SYNTHETIC_COLUMNS, match_sizes=True, rng=np.random.default_rng(stream))
+    row = {"n_participants": len(data)} | _failures(lambda: study_statistics(data))
+    return row, OnlineStudy().update(data)
+
+def _pooled_statistics(pooled: OnlineStudy) -> dict:
+    """The statistics of the pooled row, from the merged accumulators of the studies."""
+    chi2, p, _ = pooled.chi_square()
+    saa = pooled.saa_response()
+    return {
+        "cortisol_chi_square.chi2": chi2, "cortisol_chi_square.p_value": p,
+        "saa_anova.F": saa["anova_results"]["f_statistic"], "saa_anova.p_value": saa["anova_results"]["p_value"],
+        "saa_anova.cohens_d": saa["effect_size"]["cohens_d"],
+    }
+
+def _failures(analyze: Callable[[], dict]) -> dict:
+    """Run the analyses of a row; when the data does not allow them, return the error instead of the statistics."""
+    try:
+        return analyze()
+    except (ValueError, ZeroDivisionError) as err:
+        return {"error": f"{type(err).__name__}: {err}"}
+
+@contextlib.contextmanager
+def _study_errors(name: str) -> Iterator[None]:
+    """Name the study in the errors raised while loading or analyzing it."""
+    try:
+        yield
+    except Exception as err:
+        err.add_note(f"While analyzing the study '{name}'.")
+        raise
@@ -3,58 +3,231 @@
 It includes:
 - Data manipulation using Pandas and NumPy
 - Statistical tests (Chi-Square, ANOVA)
-- Model fitting with Statsmodels
+- Permutation and bootstrap resampling
+- Factorial ANOVA over a shared design matrix
 """
 
+import itertools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-from scipy.stats import chi2_contingency, f_oneway
-from statsmodels.formula.api import ols
+from scipy.special import chdtrc, fdtrc, stdtr
+
+from src.functions.general import factor_codes, label_mask
+from src.objects.result_cache import memoized
+from src.objects.study_dataset import StudyDataset
+from src.objects.tracer import traced
+
+# scipy.stats takes over a second to import, so the tail probabilities come from scipy.special (which
+# scipy.stats uses itself) and this module never imports scipy.stats
+
+# F statistic and p-value of a one-way ANOVA, shaped like scipy's F_onewayResult
+AnovaResult = namedtuple("AnovaResult", ["statistic", "pvalue"])
+
+# Per-group count, mean and sum of squared deviations (with minimum and maximum) of columns, from grouped_moments
+Moments = namedtuple("Moments", ["count", "mean", "m2", "min", "max", "levels"])
+
+# Rows converted at a time by the grouped statistics, which bounds their memory on memory-mapped columns
+BLOCK_SIZE = 1 << 20
+
+
+@traced
+def grouped_moments(data: pd.DataFrame, columns: list, factors: list, cross: bool = False, extremes: bool = False,
+                    block_size: int | None = None) -> Moments:
+    """Accumulate the count, mean and spread of columns in every group, reading the rows block by block.
+
+    The groups are the combinations of the levels of the factors. Every block of rows is reduced
+    to per-group moments with bincount and merged into the running moments with the parallel form
+    of Welford's algorithm (see `merge_moments`), so only one block of the columns is ever converted in memory and the
+    columns may be memory-mapped arrays larger than the memory. Rows missing a factor level or any
+    of the values are left out.
+
+    Parameters:
+    data (pd.DataFrame): The participant table
+    columns (list): The numeric columns
+    factors (list): The grouping columns; an empty list makes one group of all the rows
+    cross (bool): Accumulate the matrix of cross-products of the deviations of all the columns instead of
+        the sum of squared deviations of each column. Default is False.
+    extremes (bool): Also track the minimum and maximum of every column. Default is False.
+    block_size (int, optional): Number of rows per block. Default is `BLOCK_SIZE`.
+
+    Returns:
+    Moments: The count of every group, shaped by the number of levels of every factor; the mean (and
+        minimum and maximum, or None) with a trailing axis of columns; the sums of squared deviations
+        with one trailing axis of columns, or two with `cross`; and the levels of every factor.
+        Empty groups have a NaN mean.
+    """
+    block_size = block_size or BLOCK_SIZE
+    coded = [factor_codes(data, factor) for factor in factors]
+    shape = tuple(len(levels) for _, levels in coded)
+    n_groups, width = int(np.prod(shape)), len(columns)
+    arrays = [data[column].to_numpy() for column in columns]
+
+    count = np.zeros(n_groups, dtype=np.int64)
+    mean = np.zeros((n_groups, width))
+    m2 = np.zeros((n_groups, width, width) if cross else (n_groups, width))
+    minimum, maximum = np.full((n_groups, width), np.inf), np.full((n_groups, width), -np.inf)
+    for start in range(0, len(data), block_size):
+        values = np.column_stack([np.asarray(array[start:start + block_size], dtype=np.float64) for array in arrays])
+        valid = ~np.isnan(values).any(axis=1)
+        key = np.zeros(len(values), dtype=np.int64)
+        for codes, levels in coded:
+            block_codes = codes[start:start + block_size]
+            valid &= block_codes >= 0
+            key = key * len(levels) + block_codes
+        key, values = key[valid], values[valid]
+
+        # Moments of the block, then merged with those of the previous blocks
+        block_count = np.bincount(key, minlength=n_groups)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block_mean = np.stack([np.bincount(key, weights=column, minlength=n_groups) for column in values.T], axis=1) / block_count[:, None]
+        deviations = values - block_mean[key]
+        if cross:
+            block_m2 = np.zeros_like(m2)
+            for i in range(width):
+                for j in range(i, width):
+                    block_m2[:, i, j] = block_m2[:, j, i] = np.bincount(key, weights=deviations[:, i] * deviations[:, j], minlength=n_groups)
+        else:
+            block_m2 = np.stack([np.bincount(key, weights=column * column, minlength=n_groups) for column in deviations.T], axis=1)
+        count, mean, m2 = merge_moments(count, mean, m2, block_count, block_mean, block_m2)
+        if extremes:
+            np.minimum.at(minimum, key, values)
+            np.maximum.at(maximum, key, values)
+
+    mean[count == 0] = np.nan
+    if not extremes:
+        minimum = maximum = None
+    else:
+        minimum[count == 0] = maximum[count == 0] = np.nan
+    return Moments(count.reshape(shape), mean.reshape(*shape, width), m2.reshape(*shape, *m2.shape[1:]),
+                   None if minimum is None else minimum.reshape(*shape, width), None if maximum is None else maximum.reshape(*shape, width),
+                   [levels for _, levels in coded])
+
+def merge_moments(count: np.ndarray, mean: np.ndarray, m2: np.ndarray, other_count: np.ndarray, other_mean: np.ndarray,
+                  other_m2: np.ndarray) -> tuple:
+    """Merge the moments of two sets of rows, group by group, with the parallel form of Welford's algorithm (Chan et al.).
+
+    Parameters:
+    count (np.ndarray): Number of rows of every group in the first set
+    mean (np.ndarray): Means of the columns of every group, with a trailing axis of columns
+    m2 (np.ndarray): Sums of squared deviations, with one trailing axis of columns, or two for cross-products
+    other_count (np.ndarray): Number of rows of every group in the second set
+    other_mean (np.ndarray): Means of the second set; NaN for its empty groups
+    other_m2 (np.ndarray): Sums of squared deviations of the second set
+
+    Returns:
+    tuple: The count, mean and sums of squared deviations of the union of both sets.
+    """
+    total = count + other_count
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(total > 0, other_count / total, 0.0)
+    delta = np.nan_to_num(other_mean - mean)
+    weight = count * share
+    if m2.ndim > mean.ndim:
+        m2 = m2 + other_m2 + delta[..., :, None] * delta[..., None, :] * weight[..., None, None]
+    else:
+        m2 = m2 + other_m2 + delta ** 2 * weight[..., None]
+    return total, mean + delta * share[..., None], m2
+
+def moments_anova(count: np.ndarray, mean: np.ndarray, m2: np.ndarray) -> tuple:
+    """One-way ANOVAs from the count, mean and sum of squared deviations of their groups (last axis).
+
+    Parameters:
+    count (np.ndarray): Number of values of every group; empty groups are left out
+    mean (np.ndarray): Mean of every group
+    m2 (np.ndarray): Sum of squared deviations from the mean of every group
+
+    Returns:
+    tuple: The F statistics, p-values and degrees of freedom (between and within groups); F is NaN
+        without two non-empty groups or without residual degrees of freedom.
+    """
+    total = count.sum(axis=-1)
+    df_between = (count > 0).sum(axis=-1) - 1
+    df_within = total - df_between - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grand_mean = np.nansum(count * mean, axis=-1) / total
+        ss_between = np.nansum(count * (mean - grand_mean[..., None]) ** 2, axis=-1)
+        ss_within = m2.sum(axis=-1)
+        f_statistic = np.where((df_between > 0) & (df_within > 0), (ss_between / df_between) / (ss_within / df_within), np.nan)
+    return f_statistic, fdtrc(df_between, df_within, f_statistic), df_between, df_within
+
+def moments_cohens_d(count: np.ndarray, mean: np.ndarray, m2: np.ndarray) -> float:
+    """Cohen's d of two groups from their counts, means and sums of squared deviations.
+
+    Parameters:
+    count (np.ndarray): Number of values of both groups
+    mean (np.ndarray): Mean of both groups
+    m2 (np.ndarray): Sum of squared deviations from the mean of both groups
+
+    Returns:
+    float: Cohen's d effect size of the first group against the second
+    Raises:
+    ZeroDivisionError: If the pooled standard deviation is zero or undefined
+    """
+    if (count[0] + count[1] - 2) == 0:
+        msg = "Deviation is zero. Cannot calculate pooled standard."
+        raise ZeroDivisionError(msg)
+    pooled_sd = np.sqrt((m2[0] + m2[1]) / (count[0] + count[1] - 2))
+    if pooled_sd == 0:
+        msg = "Pooled standard deviation is zero. Cannot calculate Cohen's d."
+        raise ZeroDivisionError(msg)
+    return (mean[0] - mean[1]) / pooled_sd
 
+def _unseeded_resampling(arguments: dict) -> bool:
+    """Whether a call of `analyze_saa_response` draws unseeded resamples, so that it must not be memoized."""
+    return arguments["n_resamples"] > 0 and arguments["seed"] is None
 
-def analyze_saa_response(data: pd.DataFrame ) -> dict:
+@traced
+@memoized(columns=["status", "change_image_sAA_level"], ignore=["n_jobs"], skip=_unseeded_resampling)
+def analyze_saa_response(data: pd.DataFrame | StudyDataset, n_resamples: int = 0, seed: int | None = None, n_jobs: int = 1,
+                         group_data: bool = True) -> dict:
     """Analyze sAA response differences between HC and NC groups
 
+    The ANOVA, effect size and summary statistics are derived from the moments of both groups,
+    accumulated block by block (see `grouped_moments`), so they also run on memory-mapped columns
+    larger than the memory. The raw group data and the resampling do need both groups in memory.
+
     Parameters:
-    data (pd.DataFrame): The DataFrame we perform the analysis on
+    data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) we perform the analysis on
+    n_resamples (int): Number of permutations and bootstrap resamples; 0 (default) skips resampling
+    seed (int, optional): Seed of the resampling
+    n_jobs (int): Number of processes sharing the resamples
+    group_data (bool): Include the values of both groups as lists ('group_data'). Default is True.
     Returns:
     dict: Dictionary containing all statistical results and summary statistics
     Raises:
         KeyError: If the columns are missing
     """
-    if "change_image_sAA_level" not in data.columns:
+    table = data.data if isinstance(data, StudyDataset) else data
+    if "change_image_sAA_level" not in table.columns:
         raise KeyError("Missing required column: change_image_sAA_level")
-    # Rest of the function logic...
 
-    # Create separate groups for HC and NC
-    hc_group = data["change_image_sAA_level"][42:]
-    nc_group = data["change_image_sAA_level"][:42]
-    if len(hc_group) == 0 or len(nc_group) == 0:
+    # Moments of the HC and NC groups, in one pass over the data
+    moments = grouped_moments(table, ["change_image_sAA_level"], ["status"], extremes=True)
+    groups = [moments.levels[0].index("HC"), moments.levels[0].index("NC")]
+    count, mean, m2 = moments.count[groups], moments.mean[groups, 0], moments.m2[groups, 0]
+    if (count == 0).any():
         raise ValueError("One of the groups is empty.")
     # Perform one-way ANOVA
-    f_statistic, p_value = f_oneway(hc_group,nc_group)
+    f_statistic, p_value, _, _ = moments_anova(count, mean, m2)
     # Calculate descriptive statistics
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(m2 / (count - 1))
     summary_stats = {
-        "HC": {
-            "count": len(hc_group),
-            "mean": float(hc_group.mean()),
-            "std": float(hc_group.std()),
-            "min": float(hc_group.min()),
-            "max": float(hc_group.max())
-        },
-        "NC": {
-            "count": len(nc_group),
-            "mean": float(nc_group.mean()),
-            "std": float(nc_group.std()),
-            "min": float(nc_group.min()),
-            "max": float(nc_group.max())
-        }
+        name: {
+            "count": int(count[i]),
+            "mean": float(mean[i]),
+            "std": float(std[i]),
+            "min": float(moments.min[group, 0]),
+            "max": float(moments.max[group, 0])
+        } for i, (name, group) in enumerate(zip(["HC", "NC"], groups, strict=True))
     }
     # Calculate effect size
-    effect_size = calculate_effect_size(hc_group, nc_group)
+    effect_size = moments_cohens_d(count, mean, m2)
     # Organize all results in a dictionary
-    return {
+    results = {
         "anova_results": {
             "f_statistic": float(f_statistic),
             "p_value": float(p_value)
@@ -63,12 +236,121 @@ def analyze_saa_response(data: pd.DataFrame ) -> dict:
             "cohens_d": float(effect_size)
         },
         "summary_statistics": summary_stats,
-        "group_data": {
-            "HC": list(hc_group),
-            "NC": list(nc_group)
-        }
+    }
+    if group_data or n_resamples > 0:
+        # Create separate groups for HC and NC
+        dataset = StudyDataset.wrap(data)
+        hc_group = dataset.column("change_image_sAA_level", status="HC")
+        nc_group = dataset.column("change_image_sAA_level", status="NC")
+        if group_data:
+            results["group_data"] = {
+                "HC": list(hc_group),
+                "NC": list(nc_group)
+            }
+        if n_resamples > 0:
+            results["resampling"] = resample_two_groups(hc_group, nc_group, n_resamples, seed=seed, n_jobs=n_jobs)
+    return results
+
+@traced
+def resample_two_groups(group1: pd.Series, group2: pd.Series, n_resamples: int, confidence: float = 0.95,
+                        seed: int | None = None, n_jobs: int = 1) -> dict:
+    """Permutation test and bootstrap confidence intervals for the one-way ANOVA and Cohen's d of two groups.
+
+    All resamples of a batch are drawn as one index matrix, and their group means, variances,
+    F statistics and Cohen's d values are computed with batched NumPy reductions. With n_jobs > 1
+    the resamples are split across a process pool using independent random streams.
+
+    Parameters:
+    group1 (pd.Series): HC group data
+    group2 (pd.Series): NC group data
+    n_resamples (int): Number of permutations and of bootstrap resamples
+    confidence (float): Confidence level of the bootstrap intervals. Default is 0.95
+    seed (int, optional): Seed of the resampling
+    n_jobs (int): Number of processes sharing the resamples. Default is 1
+
+    Returns:
+    dict: Permutation p-values and bootstrap confidence intervals
+
+    Raises:
+    ValueError: If 'n_resamples' or 'n_jobs' is not positive, or a group has fewer than 2 values
+    """
+    if n_resamples <= 0 or n_jobs <= 0:
+        msg = "'n_resamples' and 'n_jobs' must be positive."
+        raise ValueError(msg)
+    values1 = np.asarray(group1, dtype=np.float64)
+    values2 = np.asarray(group2, dtype=np.float64)
+    if len(values1) < 2 or len(values2) < 2:
+        msg = "Each group needs at least 2 values for resampling."
+        raise ValueError(msg)
+
+    # Center on the pooled mean so the sums of squares keep their precision
+    values = np.concatenate([values1, values2])
+    values = values - values.mean()
+    n1 = len(values1)
+    f_observed, d_observed, _ = _two_group_statistics(values[None, :n1], values[None, n1:])
+
+    # Split the resamples into jobs with independent random streams
+    streams = np.random.SeedSequence(seed).spawn(n_jobs)
+    sizes = [len(part) for part in np.array_split(np.arange(n_resamples), n_jobs)]
+    jobs = [(values, n1, size, stream) for size, stream in zip(sizes, streams, strict=True) if size > 0]
+    if len(jobs) == 1:
+        parts = [_resample_job(*jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            parts = list(pool.map(_resample_job, *zip(*jobs, strict=True)))
+    permuted_f, permuted_d, boot_f, boot_d, boot_diff = (np.concatenate(arrays) for arrays in zip(*parts, strict=True))
+
+    tail = (1 - confidence) / 2 * 100
+    return {
+        "n_resamples": n_resamples,
+        "permutation": {
+            "f_p_value": float((np.count_nonzero(permuted_f >= f_observed[0]) + 1) / (n_resamples + 1)),
+            "cohens_d_p_value": float((np.count_nonzero(np.abs(permuted_d) >= abs(d_observed[0])) + 1) / (n_resamples + 1)),
+        },
+        "bootstrap": {
+            "confidence": confidence,
+            "f_statistic_ci": tuple(float(v) for v in np.percentile(boot_f, [tail, 100 - tail])),
+            "cohens_d_ci": tuple(float(v) for v in np.percentile(boot_d, [tail, 100 - tail])),
+            "mean_difference_ci": tuple(float(v) for v in np.percentile(boot_diff, [tail, 100 - tail])),
+        },
     }
 
+def _resample_job(values: np.ndarray, n1: int, n_resamples: int, stream: np.random.SeedSequence) -> tuple:
+    """Draw a share of the permutations and bootstrap resamples in memory-bounded batches."""
+    rng = np.random.default_rng(stream)
+    n = len(values)
+    batch = max(1, 2 ** 22 // n)
+    results = ([], [], [], [], [])
+    for start in range(0, n_resamples, batch):
+        rows = min(batch, n_resamples - start)
+
+        # Permutations: shuffle the pooled values of every row, then split them into the two groups
+        permuted = rng.permuted(np.broadcast_to(values, (rows, n)), axis=1)
+        f_stat, d_stat, _ = _two_group_statistics(permuted[:, :n1], permuted[:, n1:])
+        results[0].append(f_stat)
+        results[1].append(d_stat)
+
+        # Bootstrap: resample every group with replacement
+        sample1 = values[:n1][rng.integers(0, n1, (rows, n1))]
+        sample2 = values[n1:][rng.integers(0, n - n1, (rows, n - n1))]
+        f_stat, d_stat, diff = _two_group_statistics(sample1, sample2)
+        results[2].append(f_stat)
+        results[3].append(d_stat)
+        results[4].append(diff)
+    return tuple(np.concatenate(arrays) for arrays in results)
+
+def _two_group_statistics(sample1: np.ndarray, sample2: np.ndarray) -> tuple:
+    """One-way ANOVA F, Cohen's d and mean difference of every row of two resampled groups."""
+    n1, n2 = sample1.shape[1], sample2.shape[1]
+    mean1, mean2 = sample1.mean(axis=1), sample2.mean(axis=1)
+    grand_mean = (n1 * mean1 + n2 * mean2) / (n1 + n2)
+    ss_between = n1 * (mean1 - grand_mean) ** 2 + n2 * (mean2 - grand_mean) ** 2
+    ss_within = ((sample1 - mean1[:, None]) ** 2).sum(axis=1) + ((sample2 - mean2[:, None]) ** 2).sum(axis=1)
+    pooled_var = ss_within / (n1 + n2 - 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ss_between / pooled_var, (mean1 - mean2) / np.sqrt(pooled_var), mean1 - mean2
+
+@traced
 def calculate_effect_size(group1: pd.Series, group2: pd.Series) -> float:
     """Calculate Cohen's d effect size.
 
@@ -82,17 +364,11 @@ def calculate_effect_size(group1: pd.Series, group2: pd.Series) -> float:
     """
     n1, n2 = len(group1), len(group2)
     var1, var2 = group1.var(), group2.var()
-    # Pooled standard deviation
-    if (n1 + n2 - 2) == 0:
-        msg = "Deviation is zero. Cannot calculate pooled standard."
-        raise ZeroDivisionError(msg)
-    pooled_sd = np.sqrt(((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2))
-    if pooled_sd == 0:
-        msg = "Pooled standard deviation is zero. Cannot calculate Cohen's d."
-        raise ZeroDivisionError(msg)
-    # cohen's d calculation
-    return (group1.mean() - group2.mean()) / pooled_sd
+    # cohen's d calculation, from the pooled standard deviation
+    return moments_cohens_d(np.array([n1, n2]), np.array([group1.mean(), group2.mean()]), np.array([(n1 - 1) * var1, (n2 - 1) * var2]))
 
+@traced
+@memoized()
 def chi_square(data: pd.DataFrame) -> tuple:
     """Perform chi-square test on the data.
 
@@ -114,68 +390,125 @@ def chi_square(data: pd.DataFrame) -> tuple:
         msg = "Missing required columns: 'Responders' or 'Non-Responders'"
         raise KeyError(msg) from e
     else:
-        chi2, p, _, _ = chi2_contingency(contingency_table)
-        return chi2, p, contingency_table
+        if (_expected_frequencies(contingency_table) == 0).any():
+            msg = "The internally computed table of expected frequencies has a zero element."
+            raise ValueError(msg)
+        chi2, p = contingency_chi_square(contingency_table)
+        return float(chi2), float(p), contingency_table
+
+def contingency_chi_square(observed: np.ndarray) -> tuple:
+    """Pearson's chi-square test of independence of stacked contingency tables.
+
+    As scipy's chi2_contingency, Yates' continuity correction is applied to 2x2 tables. Tables
+    with an empty expected cell get NaN.
 
-def calculate_two_way_anova_with_viz(data: pd.DataFrame, val: str) -> tuple:
+    Parameters:
+    observed (np.ndarray): Counts whose last two axes are the tables, e.g. shape (..., 2, 2)
+
+    Returns:
+    tuple:
+        - np.ndarray: chi-square statistic of every table
+        - np.ndarray: p-value of every table
+    """
+    observed = np.asarray(observed, dtype=np.float64)
+    expected = _expected_frequencies(observed)
+    dof = (observed.shape[-2] - 1) * (observed.shape[-1] - 1)
+    if dof == 0:
+        return np.zeros(observed.shape[:-2]), np.ones(observed.shape[:-2])
+    if dof == 1:
+        difference = expected - observed
+        observed = observed + np.sign(difference) * np.minimum(0.5, np.abs(difference))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi2 = np.where((expected > 0).all(axis=(-2, -1)), ((observed - expected) ** 2 / expected).sum(axis=(-2, -1)), np.nan)
+    return chi2, chdtrc(dof, chi2)
+
+def _expected_frequencies(observed: np.ndarray) -> np.ndarray:
+    """Expected counts of stacked contingency tables under independence."""
+    observed = np.asarray(observed, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return observed.sum(axis=-1, keepdims=True) * observed.sum(axis=-2, keepdims=True) / observed.sum(axis=(-2, -1), keepdims=True)
+
+def _two_way_anova_columns(arguments: dict) -> list:
+    """Columns read by `calculate_two_way_anova_with_viz`, from its arguments."""
+    outcomes = [arguments["val"]] if isinstance(arguments["val"], str) else list(arguments["val"])
+    return ["responsive_state_SAA", "responsive_state_cortisol", "status", *outcomes]
+
+@traced
+@memoized(columns=_two_way_anova_columns)
+def calculate_two_way_anova_with_viz(data: pd.DataFrame | StudyDataset, val: str | list) -> tuple:
     """Calculates a Two-Way ANOVA with interaction effects for emotional stimuli image ratings.
 
     Parameters:
-    data (pd.DataFrame): The DataFrame for analysis
-    val (str): The emotional stimuli
+    data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) for analysis
+    val (str | list): The emotional stimuli, or a list of them analyzed over one shared design
 
     Returns:
     tuple:
         - pd.DataFrame: Group means for emotional stimuli image ratings
-        - pd.DataFrame: ANOVA table containing F-statistics and p-values
+        - pd.DataFrame | dict: ANOVA table containing F-statistics and p-values, or a table per
+          stimulus when 'val' is a list
 
     Raises:
     KeyError: If required columns are missing or not categorized properly
     """
-    required_columns = ["responsive_state_SAA", "responsive_state_cortisol", "status", val]
+    if isinstance(data, StudyDataset):
+        data = data.data
+    outcomes = [val] if isinstance(val, str) else list(val)
+    required_columns = ["responsive_state_SAA", "responsive_state_cortisol", "status", *outcomes]
     missing_cols = [col for col in required_columns if col not in data.columns]
     if missing_cols:
         msg = f"Missing required columns: {', '.join(missing_cols)}"
         raise KeyError(msg)
 
-
+    factors = ["status", "saa_responders", "cortisol_responders"]
     try:
-        # Categorize into responders and non-responders
-        data["saa_responders"] = np.where(data["responsive_state_SAA"] == "responders", "SAA Responders", "SAA Nonresponders")
-        data["cortisol_responders"] = np.where(data["responsive_state_cortisol"] == "responders", "Cortisol Responders", "Cortisol Nonresponders")
+        # Categorize into responders and non-responders (one byte per participant)
+        data["saa_responders"] = pd.Categorical.from_codes(label_mask(data, "responsive_state_SAA", "responders").astype(np.int8),
+                                                           ["SAA Nonresponders", "SAA Responders"])
+        data["cortisol_responders"] = pd.Categorical.from_codes(label_mask(data, "responsive_state_cortisol", "responders").astype(np.int8),
+                                                                ["Cortisol Nonresponders", "Cortisol Responders"])
 
-        # Calculate means for each group (by status and responder type)
-        group_means = data.groupby(["status", "saa_responders", "cortisol_responders"]).agg({val: "mean"}).reset_index()
+        # Moments of every group (by status and responder type), in one block-wise pass
+        moments = grouped_moments(data, outcomes, factors)
 
     except KeyError as e:
         msg = "Error categorizing responder states. Ensure 'status', 'responsive_state_SAA' and 'responsive_state_cortisol' exist."
         raise KeyError(msg) from e
 
-    # Perform the Two-Way ANOVA
-    formula = f"{val} ~ C(status) * C(saa_responders) * C(cortisol_responders)"
-    model = ols(formula, data=data).fit()
-    anova_table = sm.stats.anova_lm(model, typ=2)
+    # Means of the observed groups, in group order
+    cells = np.nonzero(moments.count > 0)
+    group_means = pd.DataFrame({factor: np.asarray(levels, dtype=object)[codes] for factor, levels, codes in zip(factors, moments.levels, cells, strict=True)})
+    group_means["status"] = group_means["status"].astype(data["status"].dtype)
+    for j, outcome in enumerate(outcomes):
+        group_means[outcome] = moments.mean[cells][:, j]
+
+    # Perform the Two-Way ANOVA of every stimulus over one design matrix
+    anova_tables = _factorial_tables(moments, outcomes, factors, typ=2, contrast="treatment")
 
-    return group_means, anova_table
+    return group_means, anova_tables[val] if isinstance(val, str) else anova_tables
 
-def analyze_cortisol_data(data: pd.DataFrame) -> tuple:
+@traced
+def analyze_cortisol_data(data: pd.DataFrame | StudyDataset) -> tuple:
     """Analyzes cortisol data by performing MANOVA tests.
 
     Parameters:
-    data (pd.DataFrame): The DataFrame for cortisol analysis
+    data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) for cortisol analysis
 
     Returns:
     tuple:
-        - scipy.stats._stats_py.F_onewayResult: ANOVA results for NC group (cortisol baseline by phase)
-        - scipy.stats._stats_py.F_onewayResult: ANOVA results for NC group (cortisol change by phase)
-        - scipy.stats._stats_py.F_onewayResult: ANOVA results for HC group (cortisol baseline by pill type)
-        - scipy.stats._stats_py.F_onewayResult: ANOVA results for HC group (cortisol change by pill type)
+        - AnovaResult: ANOVA results for NC group (cortisol baseline by phase)
+        - AnovaResult: ANOVA results for NC group (cortisol change by phase)
+        - AnovaResult: ANOVA results for HC group (cortisol baseline by pill type)
+        - AnovaResult: ANOVA results for HC group (cortisol change by pill type)
         - pd.DataFrame: Filtered data for NC group
         - pd.DataFrame: Filtered data for HC group
 
     Raises:
     KeyError: If the required columns are missing
     """
+    dataset = StudyDataset.wrap(data)
+    data = dataset.data
+
     # Ensure the cortisol_change column is created
     if "cortisol_change" not in data.columns:
         if "change_CPS_cortisol_level" in data.columns:
@@ -186,31 +519,300 @@ def analyze_cortisol_data(data: pd.DataFrame) -> tuple:
 
     try:
         # Filter NC and HC groups
-        nc_data = data[data["status"] == "NC"]
-        hc_data = data[data["status"] == "HC"]
-
-        # One-way ANOVA for NC group (cortisol baseline by phase)
-        follicular_nc = nc_data[nc_data["phase"] == "follicular"]["cortisol_level_baseline"]
-        luteal_nc = nc_data[nc_data["phase"] == "luteal"]["cortisol_level_baseline"]
-        anova_nc_baseline = f_oneway(follicular_nc, luteal_nc)
+        nc_data = dataset.select(status="NC")
+        hc_data = dataset.select(status="HC")
 
-        # One-way ANOVA for NC group (cortisol change by phase)
-        follicular_nc_change = nc_data[nc_data["phase"] == "follicular"]["cortisol_change"]
-        luteal_nc_change = nc_data[nc_data["phase"] == "luteal"]["cortisol_change"]
-        anova_nc_change = f_oneway(follicular_nc_change, luteal_nc_change)
+        # One-way ANOVAs of baseline and change by phase and by pill type, within each group, in one pass
+        anova = one_way_anova(dataset, ["cortisol_level_baseline", "cortisol_change"], ["phase", "pill_type"], by="status")
 
-        # One-way ANOVA for HC group (cortisol baseline by pill type)
-        monophasic_hc = hc_data[hc_data["pill_type"] == "monophasic"]["cortisol_level_baseline"]
-        triphasic_hc = hc_data[hc_data["pill_type"] == "triphasic"]["cortisol_level_baseline"]
-        anova_hc_baseline = f_oneway(monophasic_hc, triphasic_hc)
-
-        # One-way ANOVA for HC group (cortisol change by pill type)
-        monophasic_hc_change = hc_data[hc_data["pill_type"] == "monophasic"]["cortisol_change"]
-        triphasic_hc_change = hc_data[hc_data["pill_type"] == "triphasic"]["cortisol_change"]
-        anova_hc_change = f_oneway(monophasic_hc_change, triphasic_hc_change)
+        # NC group by phase, HC group by pill type
+        anova_nc_baseline = AnovaResult(*anova.loc[("NC", "phase", "cortisol_level_baseline"), ["F", "p_value"]])
+        anova_nc_change = AnovaResult(*anova.loc[("NC", "phase", "cortisol_change"), ["F", "p_value"]])
+        anova_hc_baseline = AnovaResult(*anova.loc[("HC", "pill_type", "cortisol_level_baseline"), ["F", "p_value"]])
+        anova_hc_change = AnovaResult(*anova.loc[("HC", "pill_type", "cortisol_change"), ["F", "p_value"]])
 
     except KeyError as e:
         msg = "Missing required columns: 'status', 'phase', 'pill_type', 'cortisol_level_baseline', or 'cortisol_change'"
         raise KeyError(msg) from e
     else:
         return anova_nc_baseline, anova_nc_change, anova_hc_baseline, anova_hc_change, nc_data, hc_data
+
+@traced
+def one_way_anova(data: pd.DataFrame | StudyDataset, outcomes: list, factors: list, by: str | None = None) -> pd.DataFrame:
+    """Perform one-way ANOVAs of several outcomes by several factors from grouped sufficient statistics.
+
+    For every factor, the count, mean and sum of squared deviations of every outcome are
+    accumulated per group in one block-wise pass (see `grouped_moments`), and all F statistics and
+    p-values are derived from them.
+
+    Parameters:
+    data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) for analysis
+    outcomes (list): The outcome columns
+    factors (list): The grouping columns, each tested on its own
+    by (str, optional): A column whose groups are analyzed separately, e.g. 'status'
+
+    Returns:
+    pd.DataFrame: F statistic, p-value and degrees of freedom, indexed by ([by group,] factor, outcome).
+        Tests with fewer than two non-empty groups are NaN.
+
+    Raises:
+    KeyError: If the required columns are missing
+    """
+    if isinstance(data, StudyDataset):
+        data = data.data
+    required_columns = [*outcomes, *factors] + ([by] if by is not None else [])
+    missing_cols = [col for col in required_columns if col not in data.columns]
+    if missing_cols:
+        msg = f"Missing required columns: {', '.join(missing_cols)}"
+        raise KeyError(msg)
+
+    rows = []
+    for factor in factors:
+        # Per group count, mean and sum of squared deviations of every outcome, as (outcome, stratum, level)
+        moments = grouped_moments(data, outcomes, [factor] if by is None else [by, factor])
+        strata = [None] if by is None else moments.levels[0]
+        count = moments.count.reshape(len(strata), -1)
+        mean = np.moveaxis(moments.mean.reshape(len(strata), -1, len(outcomes)), -1, 0)
+        m2 = np.moveaxis(moments.m2.reshape(len(strata), -1, len(outcomes)), -1, 0)
+        f_statistic, p_value, df_between, df_within = moments_anova(count, mean, m2)
+
+        for s, stratum in enumerate(strata):
+            for j, outcome in enumerate(outcomes):
+                rows.append({"by": stratum, "factor": factor, "outcome": outcome, "F": float(f_statistic[j, s]), "p_value": float(p_value[j, s]),
+                             "df_between": int(df_between[s]), "df_within": int(df_within[s])})
+
+    index = ["by", "factor", "outcome"] if by is not None else ["factor", "outcome"]
+    return pd.DataFrame(rows, columns=["by", "factor", "outcome", "F", "p_value", "df_between", "df_within"]).set_index(index).drop(columns=["by"], errors="ignore")
+
+@traced
+def factorial_anova(data: pd.DataFrame | StudyDataset, outcomes: list, factors: list, typ: int = 2, contrast: str = "treatment") -> dict:
+    """Perform full-factorial ANOVAs of several outcomes that share one design matrix.
+
+    The data are first reduced block by block to the count, means and sums of squared deviations
+    of every cell (see `grouped_moments`). As the model is saturated, the cell means weighted by
+    the cell counts carry all the information of the fit: the design (main effects and every
+    interaction of `factors`) is built over the cells and QR-factored once, all outcomes are
+    solved together as one multi-column weighted least-squares problem, and the hypothesis matrix
+    of every term is derived once and applied to all outcomes. When every cell has participants,
+    the tables match `sm.stats.anova_lm` on `ols("y ~ C(a) * C(b) * ...")`.
+
+    They differ on rank-deficient designs, e.g. with empty cells. A term left only partly testable
+    gets the number of testable contrasts as its df, where anova_lm keeps the nominal df: a type I
+    term gets the part of the sums of squares it adds to the fit, and a type II term is tested
+    against the estimable contrasts of the terms containing it. The sums of squares, df, F and
+    p-values of such terms, and for type II those of the terms they contain, then differ from
+    anova_lm (which may report NaN for them).
+
+    Parameters:
+    data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) for analysis
+    outcomes (list): The outcome columns
+    factors (list): The categorical columns crossed in the design
+    typ (int): Type of sums of squares: 1 (sequential), 2 or 3. Default is 2.
+    contrast (str): 'treatment' (first level as reference) or 'sum' coding. Type III tables are
+        usually read with 'sum' coding.
+
+    Returns:
+    dict: The ANOVA table of every outcome (sum_sq, df, F, PR(>F), one row per term and a
+        'Residual' row). Rows missing a factor or any outcome are left out of all the models.
+
+    Raises:
+    KeyError: If the required columns are missing
+    ValueError: If 'typ' or 'contrast' is not supported
+    """
+    if isinstance(data, StudyDataset):
+        data = data.data
+    missing_cols = [col for col in [*outcomes, *factors] if col not in data.columns]
+    if missing_cols:
+        msg = f"Missing required columns: {', '.join(missing_cols)}"
+        raise KeyError(msg)
+    if typ not in (1, 2, 3):
+        msg = "Error: 'typ' must be 1, 2 or 3."
+        raise ValueError(msg)
+    if contrast not in ("treatment", "sum"):
+        msg = "Error: 'contrast' must be 'treatment' or 'sum'."
+        raise ValueError(msg)
+
+    return _factorial_tables(grouped_moments(data, outcomes, factors), outcomes, factors, typ, contrast)
+
+def _factorial_tables(moments: Moments, outcomes: list, factors: list, typ: int, contrast: str) -> dict:
+    """ANOVA tables of the full-factorial model of `factorial_anova` from the moments of its cells."""
+    # The observed cells, their weights and mean outcomes; the residuals are the deviations within the cells
+    count = moments.count.ravel()
+    cells = np.flatnonzero(count > 0)
+    weights = np.sqrt(count[cells].astype(np.float64))[:, None]
+    values = moments.mean.reshape(-1, len(outcomes))[cells]
+    ssr = moments.m2.reshape(-1, len(outcomes)).sum(axis=0)
+    cell_codes = np.unravel_index(cells, moments.count.shape)
+
+    # Coding columns of every factor, over the levels present (as in a formula fit)
+    blocks = []
+    for codes in cell_codes:
+        present, codes = np.unique(codes, return_inverse=True)
+        levels = np.arange(1, len(present)) if contrast == "treatment" else np.arange(len(present) - 1)
+        block = (codes[:, None] == levels).astype(np.float64)
+        if contrast == "sum":
+            block[codes == len(present) - 1] = -1.0
+        blocks.append(block)
+
+    # Intercept, then every term by order (a, b, a:b, ...), each spanning the product of its factors' columns
+    terms = [term for order in range(1, len(factors) + 1) for term in itertools.combinations(range(len(factors)), order)]
+    columns = [np.ones((len(values), 1))]
+    for term in terms:
+        block = blocks[term[0]]
+        for i in term[1:]:
+            block = (block[:, :, None] * blocks[i][:, None, :]).reshape(len(values), -1)
+        columns.append(block)
+    design = np.hstack(columns)
+    bounds = np.cumsum([0, *(block.shape[1] for block in columns)])
+    term_columns = [np.arange(bounds[k + 1], bounds[k + 2]) for k in range(len(terms))]
+
+    # One QR of the weighted design for all outcomes: effects, minimum-norm coefficients and their covariance
+    q, r = np.linalg.qr(weights * design)
+    effects = q.T @ (weights * values)
+    if len(r) < design.shape[1]:
+        # Fewer observed cells than coefficients: the missing effects are zero
+        r = np.vstack([r, np.zeros((design.shape[1] - len(r), design.shape[1]))])
+        effects = np.vstack([effects, np.zeros((len(r) - len(effects), len(outcomes)))])
+    r_inverse = np.linalg.pinv(r)
+    params = r_inverse @ effects
+    normalized_cov = r_inverse @ r_inverse.T
+    df_resid = count.sum() - np.linalg.matrix_rank(design)
+
+    sum_sq = np.empty((len(terms), len(outcomes)))
+    df = np.empty(len(terms))
+    identity = np.eye(design.shape[1])
+    # Projection onto the estimable combinations of the coefficients (the row space of the design)
+    _, singular, row_space = np.linalg.svd(weights * design, full_matrices=False)
+    row_space = row_space[singular > 1e-9 * singular.max()]
+    estimable = row_space.T @ row_space
+    if typ == 1:
+        # Fitted sum of squares and rank of the model as every term enters it, over the (few) cells
+        fitted, ranks = [], []
+        for bound in bounds[1:]:
+            prefix = weights * design[:, :bound]
+            coefficients = np.linalg.lstsq(prefix, weights * values, rcond=None)[0]
+            fitted.append(((prefix @ coefficients) ** 2).sum(axis=0))
+            ranks.append(np.linalg.matrix_rank(prefix))
+    for k, term in enumerate(terms):
+        if typ == 1:
+            # Sequential sums of squares, with as many degrees of freedom as the term adds to the rank
+            sum_sq[k] = fitted[k + 1] - fitted[k]
+            df[k] = ranks[k + 1] - ranks[k]
+            continue
+
+        hypothesis = identity[term_columns[k]]
+        if typ == 2:
+            # Test the term against the terms not containing it, from the part orthogonal to its containing terms
+            containing = [term_columns[j] for j, other in enumerate(terms) if set(term) < set(other)]
+            if containing:
+                # Only the estimable contrasts of the containing terms, so that the complement is the term's own
+                outer = identity[np.concatenate(containing)] @ estimable
+                u, singular, _ = np.linalg.svd(outer, full_matrices=False)
+                outer = u[:, singular > 1e-9 * singular.max()].T @ outer
+                full = np.vstack([hypothesis, outer])
+                complement, _ = np.linalg.qr(full @ normalized_cov @ outer.T, mode="complete")
+                hypothesis = complement[:, -len(term_columns[k]):].T @ full
+        # Wald sums of squares, with as many degrees of freedom as the term has testable contrasts
+        contrast_values = hypothesis @ params
+        contrast_cov = hypothesis @ normalized_cov @ hypothesis.T
+        sum_sq[k] = np.einsum("ij,ik,kj->j", contrast_values, np.linalg.pinv(contrast_cov), contrast_values)
+        df[k] = np.linalg.matrix_rank(contrast_cov)
+
+    names = [":".join(f"C({factors[i]})" for i in term) for term in terms]
+    tables = {}
+    for j, outcome in enumerate(outcomes):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f_statistic = (sum_sq[:, j] / df) / (ssr[j] / df_resid)
+        table = pd.DataFrame({"sum_sq": [*sum_sq[:, j], ssr[j]], "df": [*df, float(df_resid)],
+                              "F": [*f_statistic, np.nan], "PR(>F)": [*fdtrc(df, df_resid, f_statistic), np.nan]},
+                             index=[*names, "Residual"])
+        tables[outcome] = table
+    return tables
+
+@traced
+def linear_regressions(data: pd.DataFrame | StudyDataset, predictors: list, outcomes: list, by: str | None = None, multiple: bool = False) -> pd.DataFrame:
+    """Fit the least-squares regressions of several outcomes on several predictors in every group at once.
+
+    The count, means and cross-products of the deviations of all the columns are accumulated per
+    group in one block-wise pass (see `grouped_moments`), and every fit is solved in closed form
+    from them, so thousands of groups cost no more model objects than one.
+
+    Parameters:
+    data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) for analysis
+    predictors (list): The predictor columns
+    outcomes (list): The outcome columns
+    by (str, optional): A column whose groups are fitted separately, e.g. 'status'
+    multiple (bool): Fit each outcome on all the predictors together instead of on each predictor
+        alone. Default is False.
+
+    Returns:
+    pd.DataFrame: Slope, its standard error, t statistic and p-value, intercept and its standard error,
+        R² and number of observations, indexed by ([by group,] predictor, outcome). In a multiple
+        regression the intercept, R² and n are those of the whole model. Fits with fewer
+        observations than parameters plus one, or with collinear predictors, are NaN. Rows missing
+        any predictor or outcome are left out.
+
+    Raises:
+    KeyError: If the required columns are missing
+    """
+    if isinstance(data, StudyDataset):
+        data = data.data
+    required_columns = [*predictors, *outcomes] + ([by] if by is not None else [])
+    missing_cols = [col for col in required_columns if col not in data.columns]
+    if missing_cols:
+        msg = f"Missing required columns: {', '.join(missing_cols)}"
+        raise KeyError(msg)
+
+    # Per group count, means and cross-product matrix of the deviations of predictors and outcomes
+    moments = grouped_moments(data, [*predictors, *outcomes], [] if by is None else [by], cross=True)
+    groups = [None] if by is None else moments.levels[0]
+    width = len(predictors) + len(outcomes)
+    count = moments.count.reshape(-1).astype(np.float64)
+    means = moments.mean.reshape(len(groups), width)
+    cross = moments.m2.reshape(len(groups), width, width)
+    # Sums of squares around the overall means, the scale against which constant predictors are detected
+    offset = np.nansum(count[:, None] * means, axis=0) / count.sum() if count.sum() else np.zeros(width)
+    squares = np.diagonal(cross, axis1=1, axis2=2) + count[:, None] * np.nan_to_num(means - offset) ** 2
+
+    n_predictors = len(predictors)
+    models = [list(range(n_predictors))] if multiple else [[i] for i in range(n_predictors)]
+    rows = []
+    for model in models:
+        sxx = cross[:, model][:, :, model]
+        sxy = cross[:, model][:, :, n_predictors:]
+        syy = np.diagonal(cross[:, n_predictors:, n_predictors:], axis1=1, axis2=2)
+
+        # Normal equations of every group and outcome, solved in one batched call
+        # A group is solvable with enough observations, no constant predictor and no collinear predictors
+        df_resid = count - len(model) - 1
+        spread = np.nan_to_num(np.diagonal(sxx, axis1=1, axis2=2))
+        varying = (spread > 1e-12 * squares[:, model]).all(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = np.nan_to_num(sxx / np.sqrt(spread[:, :, None] * spread[:, None, :]))
+        solvable = (df_resid > 0) & varying & (np.linalg.matrix_rank(correlation) == len(model))
+        sxx_inverse = np.full_like(sxx, np.nan)
+        sxx_inverse[solvable] = np.linalg.inv(sxx[solvable])
+        slopes = sxx_inverse @ sxy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = (syy - np.einsum("gpo,gpo->go", slopes, sxy)) / df_resid[:, None]
+            r_squared = 1 - scale * df_resid[:, None] / syy
+            slope_se = np.sqrt(np.diagonal(sxx_inverse, axis1=1, axis2=2)[:, :, None] * scale[:, None, :])
+            t_statistic = slopes / slope_se
+            predictor_means = means[:, model]
+            intercepts = means[:, n_predictors:] - np.einsum("gp,gpo->go", predictor_means, slopes)
+            leverage = 1 / count + np.einsum("gp,gpq,gq->g", predictor_means, sxx_inverse, predictor_means)
+            intercept_se = np.sqrt(leverage[:, None] * scale)
+        p_values = 2 * stdtr(df_resid[:, None, None], -np.abs(t_statistic))
+
+        for g, group in enumerate(groups):
+            for k, i in enumerate(model):
+                for j, outcome in enumerate(outcomes):
+                    rows.append({"by": group, "predictor": predictors[i], "outcome": outcome,
+                                 "slope": float(slopes[g, k, j]), "slope_se": float(slope_se[g, k, j]),
+                                 "t": float(t_statistic[g, k, j]), "p_value": float(p_values[g, k, j]),
+                                 "intercept": float(intercepts[g, j]), "intercept_se": float(intercept_se[g, j]),
+                                 "r_squared": float(r_squared[g, j]), "n": int(count[g])})
+
+    index = ["by", "predictor", "outcome"] if by is not None else ["predictor", "outcome"]
+    columns = ["by", "predictor", "outcome", "slope", "slope_se", "t", "p_value", "intercept", "intercept_se", "r_squared", "n"]
+    return pd.DataFrame(rows, columns=columns).set_index(index).drop(columns=["by"], errors="ignore")
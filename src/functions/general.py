@@ -8,7 +8,21 @@ Includes functions for:
 import numpy as np
 import pandas as pd
 
+from src.objects.tracer import traced
 
+# Shared code dictionary of the participant label columns: a label's code is its position in the list
+LABEL_CATEGORIES = {
+    "gender": ["woman", "man"],
+    "status": ["HC", "NC"],
+    "phase": ["follicular", "luteal"],
+    "pill_type": ["monophasic", "triphasic"],
+    "stress_test_condition": ["cps", "control"],
+    "responsive_state_SAA": ["responders", "non-responders"],
+    "responsive_state_cortisol": ["responders", "non-responders", "control-non-responders"],
+}
+
+
+@traced
 def generate_numbers_with_stats(n: int, target_mean: float, target_std: float, min_val: float, max_val: float) -> list:
     """Generate a list of numbers with specified statistics.
 
@@ -58,6 +72,256 @@ def generate_numbers_with_stats(n: int, target_mean: float, target_std: float, m
 
     return sorted(numbers)
 
+@traced
+def generate_numbers_with_stats_batch(n: np.ndarray, target_mean: np.ndarray, target_std: np.ndarray, min_val: np.ndarray, max_val: np.ndarray, sort: bool = True,
+                                      rng: np.random.Generator | None = None) -> tuple:
+    """Generate many cohorts at once, each following the recipe of `generate_numbers_with_stats`.
+
+    All arguments are broadcast against each other, one element per cohort. The random draws
+    are taken in cohort order, so with the same seed the result matches calling
+    `generate_numbers_with_stats` once per cohort.
+
+    Args:
+        n (np.ndarray): Number of values in each cohort.
+        target_mean (np.ndarray): Target mean of each cohort.
+        target_std (np.ndarray): Target standard deviation of each cohort.
+        min_val (np.ndarray): Minimum value allowed in each cohort.
+        max_val (np.ndarray): Maximum value allowed in each cohort.
+        sort (bool): Whether to sort the values inside each cohort. Default is True.
+        rng (np.random.Generator, optional): Source of the random draws. Defaults to the global NumPy random state.
+
+    Returns:
+        tuple:
+            - np.ndarray: A flat array in which every cohort occupies a contiguous block.
+            - np.ndarray: Offsets of the blocks; cohort i is ``values[offsets[i]:offsets[i + 1]]``.
+
+    Raises:
+        ValueError: If any 'n' is less than 2, any 'min_val' is greater than or equal to its 'max_val', or any 'target_std' is 0.
+    """
+    n, target_mean, target_std, min_val, max_val = np.broadcast_arrays(
+        np.asarray(n, dtype=np.int64), np.asarray(target_mean, dtype=np.float64), np.asarray(target_std, dtype=np.float64),
+        np.asarray(min_val, dtype=np.float64), np.asarray(max_val, dtype=np.float64),
+    )
+    n, target_mean, target_std, min_val, max_val = (arg.ravel() for arg in (n, target_mean, target_std, min_val, max_val))
+    if (n < 2).any():
+        msg = "Error: every 'n' must be at least 2."
+        raise ValueError(msg)
+    if (min_val >= max_val).any():
+        msg = "Error: every 'min_val' must be less than its 'max_val'."
+        raise ValueError(msg)
+    if (target_std == 0).any():
+        msg = "Error: 'target_std' cannot be zero."
+        raise ValueError(msg)
+    if n.size == 0:
+        return np.empty(0), np.zeros(1, dtype=np.int64)
+
+    starts = np.concatenate(([0], np.cumsum(n)[:-1]))
+    low = np.repeat(min_val, n)
+    high = np.repeat(max_val, n)
+
+    # Normal draws for all but the last two slots of each cohort, which hold the endpoints
+    numbers = np.empty(int(n.sum()))
+    drawn = np.ones(numbers.size, dtype=bool)
+    drawn[starts + n - 2] = False
+    drawn[starts + n - 1] = False
+    standard_normal = rng.standard_normal if rng is not None else np.random.standard_normal
+    numbers[drawn] = np.repeat(target_mean, n - 2) + np.repeat(target_std, n - 2) * standard_normal(int((n - 2).sum()))
+    numbers[starts + n - 2] = min_val
+    numbers[starts + n - 1] = max_val
+    np.clip(numbers, low, high, out=numbers)
+
+    # Adjust to get target mean
+    numbers += np.repeat(target_mean - np.add.reduceat(numbers, starts) / n, n)
+
+    # Adjust to get target std
+    deviation = numbers - np.repeat(np.add.reduceat(numbers, starts) / n, n)
+    current_std = np.sqrt(np.add.reduceat(deviation * deviation, starts) / n)
+    del deviation
+    mean = np.repeat(target_mean, n)
+    numbers -= mean
+    numbers *= np.repeat(target_std / current_std, n)
+    numbers += mean
+
+    # Final clip and round
+    np.clip(numbers, low, high, out=numbers)
+    np.round(numbers, 2, out=numbers)
+    if sort:
+        for start, stop in zip(starts, starts + n, strict=True):
+            numbers[start:stop].sort()
+    return numbers, np.append(starts, numbers.size)
+
+@traced
+def augment_with_cohorts(data: pd.DataFrame, spec: pd.DataFrame, scale: int = 1, columns: list | None = None, match_sizes: bool = False,
+                         rng: np.random.Generator | None = None) -> pd.DataFrame:
+    """Add synthetic columns to a participant table following a cohort specification.
+
+    Every row of `spec` describes one cohort: the column it fills, the participant labels it
+    applies to (``None`` matches everyone) and the statistics of its values. The cohort's
+    sorted values are written into the matching participants in row order.
+
+    Args:
+        data (pd.DataFrame): The participant table holding the label columns.
+        spec (pd.DataFrame): Cohort specification with a 'column' field, one field per label
+            column and the 'n', 'mean', 'std', 'min' and 'max' fields.
+        scale (int): Number of times every participant (and every cohort) is replicated.
+        columns (list, optional): Output order of the generated columns. Defaults to their order in `spec`.
+        match_sizes (bool): Take each cohort's size from the number of matching participants instead of
+            the spec's 'n', so any slice of a participant table can be augmented. Cohorts matching a single
+            participant receive the target mean. Default is False.
+        rng (np.random.Generator, optional): Source of the random draws. Defaults to the global NumPy random state.
+
+    Returns:
+        pd.DataFrame: The (scaled) participant table with the generated columns added.
+
+    Raises:
+        TypeError: If 'scale' is not an integer.
+        ValueError: If 'scale' is smaller than 1 or the cohorts do not cover every participant exactly once.
+        KeyError: If a label column of the specification is missing in the data.
+    """
+    if not isinstance(scale, int):
+        msg = "Error: 'scale' must be an integer."
+        raise TypeError(msg)
+    if scale < 1:
+        msg = "Error: 'scale' must be at least 1."
+        raise ValueError(msg)
+
+    labels = [field for field in spec.columns if field not in ("column", "n", "mean", "std", "min", "max")]
+    missing_labels = [field for field in labels if field not in data.columns]
+    if missing_labels:
+        msg = f"Missing label columns: {', '.join(missing_labels)}"
+        raise KeyError(msg)
+    if columns is None:
+        columns = list(pd.unique(spec["column"]))
+
+    # Resolve the participants of every cohort on the unscaled table
+    label_values = {field: data[field].to_numpy() for field in labels}
+    coverage = {column: np.zeros(len(data), dtype=np.int64) for column in columns}
+    rows = []
+    for cohort in spec.itertuples(index=False):
+        mask = np.ones(len(data), dtype=bool)
+        for field in labels:
+            value = getattr(cohort, field)
+            if pd.notna(value):
+                mask &= label_values[field] == value
+        index = np.flatnonzero(mask)
+        if not match_sizes and len(index) != cohort.n:
+            msg = f"Error: cohort of '{cohort.column}' expects {cohort.n} participants but {len(index)} match."
+            raise ValueError(msg)
+        coverage[cohort.column][index] += 1
+        rows.append(index)
+    for column, counts in coverage.items():
+        if not (counts == 1).all():
+            msg = f"Error: the cohorts of '{column}' do not cover every participant exactly once."
+            raise ValueError(msg)
+
+    # Generate every cohort in a single vectorized pass
+    sizes = np.array([len(index) for index in rows], dtype=np.int64) * scale
+    drawn = sizes > 1
+    numbers, offsets = generate_numbers_with_stats_batch(sizes[drawn], spec["mean"].to_numpy()[drawn], spec["std"].to_numpy()[drawn],
+                                                         spec["min"].to_numpy()[drawn], spec["max"].to_numpy()[drawn], rng=rng)
+    single = np.round(np.clip(spec["mean"].to_numpy(), spec["min"].to_numpy(), spec["max"].to_numpy()), 2)
+
+    # Scatter the cohorts into preallocated columns; replicated participants are laid out consecutively
+    generated = {column: np.empty(len(data) * scale) for column in columns}
+    replicas = np.arange(scale)
+    block = np.cumsum(drawn) - 1
+    for i, (column, index) in enumerate(zip(spec["column"], rows, strict=True)):
+        target = (index[:, None] * scale + replicas).ravel()
+        if drawn[i]:
+            generated[column][target] = numbers[offsets[block[i]]:offsets[block[i] + 1]]
+        else:
+            generated[column][target] = single[i]
+
+    if scale == 1:
+        result = data.copy()
+    else:
+        result = data.iloc[np.repeat(np.arange(len(data)), scale)].reset_index(drop=True)
+        if "humans" in result.columns:
+            result["humans"] = "human" + pd.Series(np.arange(1, len(result) + 1)).astype(str)
+    for column in columns:
+        result[column] = generated[column]
+    return result
+
+# Cortisol responders to the CPS test versus non-responders and control participants, as counted for the chi-square test
+CORTISOL_RESPONDER_DEFINITION = {
+    "Responders": [{"stress_test_condition": "cps", "responsive_state_cortisol": "responders"}],
+    "Non-Responders": [
+        {"stress_test_condition": "cps", "responsive_state_cortisol": "non-responders"},
+        {"responsive_state_cortisol": "control-non-responders"},
+    ],
+}
+
+@traced
+def encode_labels(data: pd.DataFrame) -> pd.DataFrame:
+    """Convert the label columns of a participant table to categoricals coded by `LABEL_CATEGORIES`.
+
+    Args:
+        data (pd.DataFrame): A participant table; it is converted in place.
+
+    Returns:
+        pd.DataFrame: The same table with every label column it holds stored as integer codes.
+
+    Raises:
+        ValueError: If a label column holds a value outside the code dictionary.
+    """
+    for column, categories in LABEL_CATEGORIES.items():
+        if column not in data.columns:
+            continue
+        values = data[column].astype("category")
+        unexpected = set(values.cat.categories) - set(categories)
+        if unexpected:
+            msg = f"Error: unexpected values in '{column}': {', '.join(sorted(map(str, unexpected)))}"
+            raise ValueError(msg)
+        data[column] = values.cat.set_categories(categories)
+    return data
+
+def label_code(column: str, value: str) -> int:
+    """Look up the integer code of a label in the shared code dictionary.
+
+    Args:
+        column (str): The label column, e.g. 'status'.
+        value (str): The label, e.g. 'HC'.
+
+    Returns:
+        int: The code of the label.
+
+    Raises:
+        KeyError: If the column or the label is not in the code dictionary.
+    """
+    try:
+        return LABEL_CATEGORIES[column].index(value)
+    except (KeyError, ValueError) as e:
+        msg = f"Unknown label '{value}' for column '{column}'"
+        raise KeyError(msg) from e
+
+def label_codes(data: pd.DataFrame, column: str) -> np.ndarray:
+    """Return the integer codes of a label column, without copying when it is already encoded.
+
+    Args:
+        data (pd.DataFrame): The participant table.
+        column (str): The label column.
+
+    Returns:
+        np.ndarray: The code of every row; -1 for missing or unknown labels.
+    """
+    values = data[column]
+    if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == LABEL_CATEGORIES[column]:
+        return values.cat.codes.to_numpy()
+    return pd.Categorical(values, categories=LABEL_CATEGORIES[column]).codes
+
+def label_mask(data: pd.DataFrame, column: str, value: str) -> np.ndarray:
+    """Select the rows holding a label by comparing integer codes.
+
+    Args:
+        data (pd.DataFrame): The participant table.
+        column (str): The label column.
+        value (str): The label to select.
+
+    Returns:
+        np.ndarray: A boolean mask of the rows holding the label.
+    """
+    return label_codes(data, column) == label_code(column, value)
+
 def split_list(lst: list, size: int) -> tuple:
     """Split a list into two parts based on a specified size.
 
@@ -84,6 +348,7 @@ def split_list(lst: list, size: int) -> tuple:
 
     return lst[:size], lst[size:]
 
+@traced
 def prepare_data_from_csv(data: pd.DataFrame) -> pd.DataFrame:
     """Create a new DataFrame summarizing Responders and Non-Responders for each group.
 
@@ -108,26 +373,84 @@ def prepare_data_from_csv(data: pd.DataFrame) -> pd.DataFrame:
         msg = "Error: 'status' column is empty."
         raise ValueError(msg)
 
-    # Create a copy of the data to avoid modifying the original
-    working_data = data.copy()
+    return build_contingency_table(data, "status", CORTISOL_RESPONDER_DEFINITION)
 
-    # Process each group (HC, NC) and compute responder counts
-    results = []
-    for status in working_data["status"].unique():
-        group_data = working_data[working_data["status"] == status]
+@traced
+def build_contingency_table(data: pd.DataFrame, group_column: str, definition: dict) -> pd.DataFrame:
+    """Count the participants of every class in every group in a single pass over the data.
 
-        responders = group_data[
-            (group_data["stress_test_condition"] == "cps") &
-            (group_data["responsive_state_cortisol"] == "responders")
-        ].shape[0]
+    Each class is defined as a list of label conditions, and a participant belongs to the class
+    when it meets any of them, e.g. ``{"Responders": [{"responsive_state_cortisol": "responders"}]}``.
+    The participants are counted once per combination of the labels involved, and the class counts
+    are then summed from those combinations.
 
-        non_responders = group_data[
-            ((group_data["stress_test_condition"] == "cps") &
-            (group_data["responsive_state_cortisol"] == "non-responders")) |
-            (group_data["responsive_state_cortisol"] == "control-non-responders")
-        ].shape[0]
+    Args:
+        data (pd.DataFrame): The participant table.
+        group_column (str): The column defining the groups (rows of the table), e.g. 'status'.
+        definition (dict): The conditions of every class (columns of the table), in column order.
 
-        results.append({"Group": status, "Responders": responders, "Non-Responders": non_responders})
+    Returns:
+        pd.DataFrame: A 'Group' column followed by one count column per class, sorted by group.
 
-    # Convert results to DataFrame and sort
-    return pd.DataFrame(results).sort_values("Group", ascending=True).reset_index(drop=True)
+    Raises:
+        KeyError: If a column used by the groups or the definition is missing in the data.
+    """
+    columns = [group_column, *dict.fromkeys(column for conditions in definition.values() for condition in conditions for column in condition if column != group_column)]
+    missing_columns = [column for column in columns if column not in data.columns]
+    if missing_columns:
+        msg = f"Missing required columns: {', '.join(missing_columns)}"
+        raise KeyError(msg)
+
+    # Count every combination of labels in one pass; cell 0 of each axis holds missing labels
+    labels = []
+    key = np.zeros(len(data), dtype=np.int64)
+    for column in columns:
+        codes, categories = factor_codes(data, column)
+        labels.append(categories)
+        key = key * (len(categories) + 1) + codes.astype(np.int64) + 1
+    shape = [len(categories) + 1 for categories in labels]
+    counts = np.bincount(key, minlength=int(np.prod(shape))).reshape(shape)
+
+    # Sum the combinations belonging to every class, per group
+    cells = np.indices(shape)
+    table = {}
+    for name, conditions in definition.items():
+        member = np.zeros(shape, dtype=bool)
+        for condition in conditions:
+            match = np.ones(shape, dtype=bool)
+            for column, value in condition.items():
+                axis = columns.index(column)
+                code = labels[axis].index(value) + 1 if value in labels[axis] else -1
+                match &= cells[axis] == code
+            member |= match
+        table[name] = (counts * member).reshape(shape[0], -1).sum(axis=1)[1:]
+
+    observed = counts.reshape(shape[0], -1).sum(axis=1)[1:] > 0
+    result = pd.DataFrame({"Group": labels[0]} | table)[observed]
+    return result.sort_values("Group", ascending=True).reset_index(drop=True)
+
+@traced
+def factor_codes(data: pd.DataFrame, column: str) -> tuple:
+    """Return the integer codes of a grouping column together with the labels they stand for.
+
+    Label columns use the shared code dictionary; any other column is factorized in sorted order,
+    reusing the codes of a categorical column whose sorted categories all occur.
+
+    Args:
+        data (pd.DataFrame): The participant table.
+        column (str): The grouping column.
+
+    Returns:
+        tuple:
+            - np.ndarray: The code of every row; -1 for missing values.
+            - list: The label of every code.
+    """
+    if column in LABEL_CATEGORIES:
+        return label_codes(data, column), LABEL_CATEGORIES[column]
+    values = data[column]
+    if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.is_monotonic_increasing:
+        codes = values.cat.codes.to_numpy()
+        if (np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)) > 0).all():
+            return codes, list(values.cat.categories)
+    codes, categories = pd.factorize(values, sort=True)
+    return codes, list(categories)
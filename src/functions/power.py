@@ -0,0 +1,172 @@
+"""This module estimates the statistical power of the study's tests by simulation.
+
+It includes:
+- Power of the chi-square test of the cortisol responders of two groups
+- Power of the one-way ANOVA of the sAA response of two groups
+- Power of a term of the 2x2x2 factorial ANOVA of the memory scores
+- The smallest sample size reaching a target power
+
+Every grid cell (sample size, effect size) is simulated as stacked arrays of replicates: all
+replicates of all cells are drawn and tested at once, without a loop over the replicates.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy.special import fdtrc
+
+from src.functions.calculate import contingency_chi_square
+from src.objects.tracer import traced
+
+# Terms of the factorial model of calculate_two_way_anova_with_viz, as named in its ANOVA tables
+FACTORIAL_FACTORS = ["status", "saa_responders", "cortisol_responders"]
+FACTORIAL_TERMS = [":".join(f"C({FACTORIAL_FACTORS[i]})" for i in term) for order in range(1, 4) for term in itertools.combinations(range(3), order)]
+
+
+@traced
+def chi_square_power(sizes: list, effects: list, n_replicates: int = 2000, alpha: float = 0.05, base_rate: float = 0.5, ratio: float = 1.0,
+                     seed: int | None = None) -> pd.DataFrame:
+    """Power of the chi-square test (as `chi_square`) comparing the responder rates of two groups.
+
+    Parameters:
+        sizes (list): Sizes of the first group (e.g. NC).
+        effects (list): Differences between the responder rates of the second and the first group.
+        n_replicates (int): Number of simulated studies per grid cell. Default is 2000.
+        alpha (float): Significance level. Default is 0.05.
+        base_rate (float): Responder rate of the first group. Default is 0.5.
+        ratio (float): Size of the second group relative to the first, e.g. 36 / 42 for HC / NC. Default is 1.
+        seed (int, optional): Seed of the simulation.
+
+    Returns:
+        pd.DataFrame: Power of every grid cell, indexed by size ('n') with one column (power curve) per effect.
+
+    Raises:
+        ValueError: If a responder rate falls outside [0, 1].
+    """
+    sizes, effects = _grid(sizes, effects, n_replicates)
+    rates = base_rate + effects
+    if not 0 <= base_rate <= 1 or ((rates < 0) | (rates > 1)).any():
+        msg = "Error: 'base_rate' and 'base_rate' + every effect must be between 0 and 1."
+        raise ValueError(msg)
+    rng = np.random.default_rng(seed)
+    shape = (len(sizes), len(effects), n_replicates)
+
+    # Responders of every replicate of every cell, as stacked 2x2 tables
+    n1 = np.broadcast_to(sizes[:, None, None], shape)
+    n2 = np.broadcast_to(np.maximum(1, np.round(sizes * ratio)).astype(np.int64)[:, None, None], shape)
+    responders1 = rng.binomial(n1, base_rate)
+    responders2 = rng.binomial(n2, np.broadcast_to(rates[None, :, None], shape))
+    tables = np.stack([np.stack([responders1, n1 - responders1], axis=-1), np.stack([responders2, n2 - responders2], axis=-1)], axis=-2)
+    _, p_value = contingency_chi_square(tables)
+    return _power_table(p_value, alpha, sizes, effects)
+
+@traced
+def anova_power(sizes: list, effects: list, n_replicates: int = 2000, alpha: float = 0.05, ratio: float = 1.0, seed: int | None = None) -> pd.DataFrame:
+    """Power of the one-way ANOVA (as in `analyze_saa_response`) comparing the means of two normal groups.
+
+    Only the sufficient statistics of every replicate are drawn (each group's mean from a normal
+    distribution, the within-group sum of squares from a chi-square distribution), which gives the
+    same F statistics as simulating every observation at a fraction of the cost.
+
+    Parameters:
+        sizes (list): Sizes of the first group (e.g. NC).
+        effects (list): Differences of means in standard deviations (Cohen's d).
+        n_replicates (int): Number of simulated studies per grid cell. Default is 2000.
+        alpha (float): Significance level. Default is 0.05.
+        ratio (float): Size of the second group relative to the first, e.g. 36 / 42 for HC / NC. Default is 1.
+        seed (int, optional): Seed of the simulation.
+
+    Returns:
+        pd.DataFrame: Power of every grid cell, indexed by size ('n') with one column (power curve) per effect.
+
+    Raises:
+        ValueError: If a group would have fewer than 2 values.
+    """
+    sizes, effects = _grid(sizes, effects, n_replicates)
+    n1 = sizes.astype(np.float64)[:, None, None]
+    n2 = np.round(sizes * ratio).astype(np.float64)[:, None, None]
+    if (n1 < 2).any() or (n2 < 2).any():
+        msg = "Error: every group needs at least 2 values."
+        raise ValueError(msg)
+    rng = np.random.default_rng(seed)
+    shape = (len(sizes), len(effects), n_replicates)
+
+    mean1 = rng.standard_normal(shape) / np.sqrt(n1)
+    mean2 = effects[None, :, None] + rng.standard_normal(shape) / np.sqrt(n2)
+    ss_within = rng.chisquare(np.broadcast_to(n1 + n2 - 2, shape))
+    ss_between = (mean1 - mean2) ** 2 * n1 * n2 / (n1 + n2)
+    f_statistic = ss_between / (ss_within / (n1 + n2 - 2))
+    return _power_table(fdtrc(1, n1 + n2 - 2, f_statistic), alpha, sizes, effects)
+
+@traced
+def factorial_power(sizes: list, effects: list, term: str = "C(status)", n_replicates: int = 2000, alpha: float = 0.05,
+                    seed: int | None = None) -> pd.DataFrame:
+    """Power of one term of the 2x2x2 factorial ANOVA of `calculate_two_way_anova_with_viz` in a balanced design.
+
+    The eight cells (status x sAA responders x cortisol responders) hold the same number of
+    normal observations, and the tested term shifts the cell means by +/- half the effect. In a
+    balanced design every term has one degree of freedom and its type I, II and III sums of
+    squares coincide, so they are computed from the simulated cell means and residual sum of
+    squares alone.
+
+    Parameters:
+        sizes (list): Number of participants per cell.
+        effects (list): Effects of the term in standard deviations (difference between its two contrast halves).
+        term (str): The tested term, one of `FACTORIAL_TERMS`. Default is 'C(status)'.
+        n_replicates (int): Number of simulated studies per grid cell. Default is 2000.
+        alpha (float): Significance level. Default is 0.05.
+        seed (int, optional): Seed of the simulation.
+
+    Returns:
+        pd.DataFrame: Power of every grid cell, indexed by cell size ('n') with one column (power curve) per effect.
+
+    Raises:
+        ValueError: If the term is unknown or a cell would have fewer than 2 values.
+    """
+    if term not in FACTORIAL_TERMS:
+        msg = f"Error: unknown term '{term}'. Choose from {', '.join(FACTORIAL_TERMS)}."
+        raise ValueError(msg)
+    sizes, effects = _grid(sizes, effects, n_replicates)
+    if (sizes < 2).any():
+        msg = "Error: every cell needs at least 2 values."
+        raise ValueError(msg)
+    rng = np.random.default_rng(seed)
+    shape = (len(sizes), len(effects), n_replicates)
+
+    # +/-1 contrast of the tested term over the eight cells
+    levels = np.array(list(itertools.product([-1.0, 1.0], repeat=3)))
+    factors = [FACTORIAL_FACTORS.index(name[2:-1]) for name in term.split(":")]
+    contrast = levels[:, factors].prod(axis=1)
+
+    n = sizes.astype(np.float64)[:, None, None]
+    cell_means = effects[None, :, None, None] / 2 * contrast + rng.standard_normal((*shape, 8)) / np.sqrt(n)[..., None]
+    ss_term = n * (cell_means @ contrast) ** 2 / 8
+    df_resid = 8 * (n - 1)
+    ss_resid = rng.chisquare(np.broadcast_to(df_resid, shape))
+    return _power_table(fdtrc(1, df_resid, ss_term / (ss_resid / df_resid)), alpha, sizes, effects)
+
+def required_sample_size(power: pd.DataFrame, target: float = 0.8) -> pd.Series:
+    """Smallest sample size of a power table reaching the target power, for every effect.
+
+    Parameters:
+        power (pd.DataFrame): A power table as returned by the power functions.
+        target (float): The power to reach. Default is 0.8.
+
+    Returns:
+        pd.Series: The smallest size of the grid reaching `target` per effect, NaN when none does.
+    """
+    reached = power.ge(target)
+    return reached.idxmax().where(reached.any()).rename("n")
+
+def _grid(sizes: list, effects: list, n_replicates: int) -> tuple:
+    """Validate a sweep grid and return its sizes and effects as arrays."""
+    if n_replicates <= 0:
+        msg = "Error: 'n_replicates' must be positive."
+        raise ValueError(msg)
+    sizes = np.sort(np.asarray(sizes, dtype=np.int64))
+    return sizes, np.asarray(effects, dtype=np.float64)
+
+def _power_table(p_value: np.ndarray, alpha: float, sizes: np.ndarray, effects: np.ndarray) -> pd.DataFrame:
+    """Share of replicates rejecting the null hypothesis in every grid cell; undefined tests do not reject."""
+    power = (p_value < alpha).mean(axis=-1)
+    return pd.DataFrame(power, index=pd.Index(sizes, name="n"), columns=pd.Index(effects, name="effect"))
@@ -0,0 +1,314 @@
+"""This module runs the research questions of the study and reports their results.
+
+It includes:
+- The analyses of every research question as memoized pipeline stages
+- The statistics and figures of every research question
+- A JSON file with the statistics of every question
+- A self-contained HTML report with the statistics and the embedded figures
+"""
+import base64
+import html
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.functions.calculate import analyze_cortisol_data, analyze_saa_response, calculate_two_way_anova_with_viz, chi_square, linear_regressions
+from src.functions.general import prepare_data_from_csv
+from src.functions.visualization import (
+    heat_map,
+    plot_affect_baseline_cortisol_saa_linear_regressions,
+    plot_cortisol_phase_pill_effects,
+    plot_difference_of_cortisol_chi2,
+    plot_difference_saa_responses,
+    plot_negative_images_responses,
+    plot_positive_images_responses,
+    render_figures,
+    statistics_of_saa_responses,
+    vizualizations_two_way_anova,
+)
+from src.objects.dataset_cache import CACHE_DIR, DatasetCache
+from src.objects.initialize_file import DATA_PATH, InitializeFile
+from src.objects.pipeline import Pipeline
+from src.objects.renderer import Renderer
+from src.objects.study_dataset import StudyDataset
+
+
+def load_participants(source: Path, scale: int = 1, seed: int = 42, cache_dir: str | Path | None = CACHE_DIR) -> pd.DataFrame:
+    """Loads and augments the participant file, reusing the on-disk dataset cache.
+
+    Parameters:
+        source (Path): Path of the participant CSV.
+        scale (int): Cohort scale factor of the generated columns. Default is 1.
+        seed (int): Seed of the generated columns. Default is 42.
+        cache_dir (str | Path | None): Directory of the dataset cache, or None to generate the columns every time.
+                                       Default is the user cache directory.
+
+    Returns:
+        pd.DataFrame: The augmented participant table.
+    """
+    cache = DatasetCache(cache_dir) if cache_dir is not None else None
+    return InitializeFile(source, scale=scale, seed=seed, cache=cache).file
+
+def _cortisol_response(study: StudyDataset) -> dict:
+    """Chi-square test of the cortisol responders by group."""
+    contingency_table = prepare_data_from_csv(study.data)
+    chi2, p, _ = chi_square(contingency_table)
+    return {"contingency_table": contingency_table, "chi2": chi2, "p_value": p}
+
+def _saa_response(study: StudyDataset) -> dict:
+    """One-way ANOVA and effect size of the sAA response, without the raw group values."""
+    return analyze_saa_response(study, group_data=False)
+
+def _baseline_regressions(study: StudyDataset) -> pd.DataFrame:
+    """Regressions of the cortisol change on the baseline levels, by group."""
+    return linear_regressions(study, ["sAA_level_baseline", "cortisol_level_baseline"], ["change_CPS_cortisol_level"], by="status")
+
+def _phase_pill(study: StudyDataset) -> tuple:
+    """One-way ANOVAs of baseline cortisol and its change by phase (NC) and pill type (HC)."""
+    return analyze_cortisol_data(study.copy())[:4]
+
+def _memory(study: StudyDataset) -> tuple:
+    """Two-way ANOVAs of the negative and positive image ratings over one shared design."""
+    return calculate_two_way_anova_with_viz(study.copy(), ["negative_image", "positive_image"])
+
+# Analysis stage of every research question, by name
+ANALYSES = {
+    "cortisol_response": _cortisol_response,
+    "saa_response": _saa_response,
+    "baseline_regressions": _baseline_regressions,
+    "phase_pill": _phase_pill,
+    "memory": _memory,
+}
+
+# Analysis stage answering every research question, by question name
+QUESTIONS = {
+    "cortisol": "cortisol_response",
+    "saa": "saa_response",
+    "regressions": "baseline_regressions",
+    "phase_pill": "phase_pill",
+    "negative_memory": "memory",
+    "positive_memory": "memory",
+}
+
+def question_stages(questions: list | None = None) -> list:
+    """Lists the analysis stages needed to answer some research questions.
+
+    Parameters:
+        questions (list, optional): Names of the questions (keys of `QUESTIONS`). Default is all of them.
+
+    Returns:
+        list: The names of the analysis stages, without duplicates, in question order.
+
+    Raises:
+        ValueError: If a question name is unknown.
+    """
+    questions = list(QUESTIONS) if questions is None else questions
+    unknown = [question for question in questions if question not in QUESTIONS]
+    if unknown:
+        msg = f"Error: unknown questions: {', '.join(unknown)}. Choose from {', '.join(QUESTIONS)}."
+        raise ValueError(msg)
+    return list(dict.fromkeys(QUESTIONS[question] for question in questions))
+
+def study_pipeline(source: str | Path = DATA_PATH, scale: int = 1, seed: int = 42, directory: str | Path | None = CACHE_DIR / "stages",
+                   max_workers: int | None = None, trace_memory: bool = False) -> Pipeline:
+    """Builds the stage graph of the study: load, index, then one independent analysis per research question.
+
+    Parameters:
+        source (str | Path): Path of the participant CSV. Default is the bundled data set.
+        scale (int): Cohort scale factor of the generated columns. Default is 1.
+        seed (int): Seed of the generated columns. Default is 42.
+        directory (str | Path | None): Directory of the memoized analysis results, with the augmented datasets in its
+                                       'datasets' subdirectory, or None to keep nothing.
+        max_workers (int, optional): Number of analyses run at the same time.
+        trace_memory (bool): Measure the peak memory of every stage; the analyses then run one at a time. Default is False.
+
+    Returns:
+        Pipeline: The pipeline; its 'study' output and the analysis outputs feed `analyze_study`.
+    """
+    pipeline = Pipeline(directory, max_workers=max_workers, trace_memory=trace_memory)
+    # A string, as Path parameters are identified by their file content
+    cache_dir = str(Path(directory) / "datasets") if directory is not None else None
+    pipeline.add("data", load_participants, params={"source": Path(source), "scale": scale, "seed": seed, "cache_dir": cache_dir}, cache=False)
+    pipeline.add("study", StudyDataset, inputs=("data",), cache=False)
+    for name, analysis in ANALYSES.items():
+        pipeline.add(name, analysis, inputs=("study",))
+    return pipeline
+
+def analyze_study(data: pd.DataFrame | StudyDataset, results: dict | None = None, questions: list | None = None) -> list:
+    """Gathers the statistics and figures of the research questions.
+
+    Parameters:
+        data (pd.DataFrame | StudyDataset): The participant table (or its indexed dataset).
+        results (dict, optional): Outputs of the analysis stages, e.g. from `study_pipeline(...).run()`.
+                                  The missing analyses are run here.
+        questions (list, optional): Names of the questions to answer (keys of `QUESTIONS`). Default is all of them.
+
+    Returns:
+        list: One section per research question, in order, as dictionaries with the 'question',
+              its 'statistics' and its 'figures' as (plot function, args[, kwargs]) jobs.
+
+    Raises:
+        ValueError: If a question name is unknown.
+    """
+    stages = question_stages(questions)
+    questions = list(QUESTIONS) if questions is None else questions
+    study = StudyDataset.wrap(data)
+    results = dict(results or {})
+    for name in stages:
+        if name not in results:
+            results[name] = ANALYSES[name](study)
+    sections = []
+
+    # Is there a difference in the cortisol response to the stress test between HC and NC women?
+    if "cortisol" in questions:
+        cortisol = results["cortisol_response"]
+        sections.append({
+            "question": "Is there a difference in the cortisol response to a stress test (Cold Pressor Stress - CPS) "
+                        "between HC women and NC women?",
+            "statistics": {"chi_square": {"chi2": cortisol["chi2"], "p_value": cortisol["p_value"]}, "contingency_table": cortisol["contingency_table"]},
+            "figures": [(plot_difference_of_cortisol_chi2, (cortisol["contingency_table"], cortisol["chi2"], cortisol["p_value"]))],
+        })
+
+    # Is there a difference in the sAA response to emotional stimuli between HC and NC women?
+    if "saa" in questions:
+        saa = results["saa_response"]
+        sections.append({
+            "question": "Is there a difference in the noradrenaline (sAA) response to emotional stimuli between "
+                        "women in the HC group and the NC group?",
+            "statistics": {"anova": saa["anova_results"], "effect_size": saa["effect_size"],
+                           "summary_statistics": pd.DataFrame(saa["summary_statistics"]).T.rename_axis("group")},
+            "figures": [(plot_difference_saa_responses, (study,)), (statistics_of_saa_responses, (saa,))],
+        })
+
+    # Do baseline cortisol and sAA levels affect the stress test response differently in HC and NC women?
+    if "regressions" in questions:
+        regressions = results["baseline_regressions"]
+        sections.append({
+            "question": "Do baseline levels of cortisol and sAA affect stress test response in women from the HC group "
+                        "differently than in women from the NC group?",
+            "statistics": {"regressions": regressions.rename_axis(index={"by": "status"})},
+            "figures": [(plot_affect_baseline_cortisol_saa_linear_regressions, (study, regressions))],
+        })
+
+    # Are the cycle phase (NC) and the pill type (HC) related to baseline cortisol and its change?
+    if "phase_pill" in questions:
+        anovas = dict(zip(["NC phase, baseline cortisol", "NC phase, cortisol change", "HC pill type, baseline cortisol", "HC pill type, cortisol change"],
+                          results["phase_pill"], strict=True))
+        columns = {"phase": "phase", "pill_type": "pill_type", "cortisol_level_baseline": "cortisol_level_baseline", "change_CPS_cortisol_level": "cortisol_change"}
+        nc_data = study.select(status="NC")[list(columns)].rename(columns=columns)
+        hc_data = study.select(status="HC")[list(columns)].rename(columns=columns)
+        sections.append({
+            "question": "Is there a relationship between the phase of the cycle in the NC group and the type of pills in "
+                        "the HC group and the initial cortisol and the change in cortisol?",
+            "statistics": {"anova": pd.DataFrame({name: {"F": result.statistic, "p_value": result.pvalue} for name, result in anovas.items()}).T.rename_axis("test")},
+            "figures": [(plot_cortisol_phase_pill_effects, (*anovas.values(), nc_data, hc_data))],
+        })
+
+    # Does memory for negative and positive stimuli differ between HC and NC women by cortisol and sAA response?
+    for val, kind, plot in [("negative_image", "negative", plot_negative_images_responses), ("positive_image", "positive", plot_positive_images_responses)]:
+        if f"{kind}_memory" not in questions:
+            continue
+        group_means, anova_tables = results["memory"]
+        sections.append({
+            "question": f"Is there a difference in memory for {kind} stimuli between women in the HC group and women in "
+                        "the NC group, according to the cortisol response and the sAA response?",
+            "statistics": {"group_means": group_means[["status", "saa_responders", "cortisol_responders", val]],
+                           "two_way_anova": anova_tables[val].rename_axis("term")},
+            "figures": [(plot, (study,)), (heat_map, (group_means, val)),
+                        (vizualizations_two_way_anova, (anova_tables[val],), {"name": f"two_way_anova_{val}"})],
+        })
+    return sections
+
+def summarize(sections: list) -> list:
+    """Converts the statistics of research questions to JSON values.
+
+    Parameters:
+        sections (list): Sections as returned by `analyze_study`.
+
+    Returns:
+        list: One dictionary per section with the 'question' and its 'statistics', where tables are lists
+              of records and missing values are None.
+    """
+    return [{"question": section["question"], "statistics": _to_json(section["statistics"])} for section in sections]
+
+def write_report(data: pd.DataFrame | StudyDataset, output_dir: str | Path, n_jobs: int | None = None, results: dict | None = None,
+                 questions: list | None = None) -> tuple:
+    """Runs the research questions and writes its statistics as JSON and as a self-contained HTML report.
+
+    The figures are rendered in parallel to `output_dir`/figures, then the HTML is written in one
+    streaming pass with every figure embedded as a base64 PNG.
+
+    Parameters:
+        data (pd.DataFrame | StudyDataset): The participant table (or its indexed dataset).
+        output_dir (str | Path): Directory of 'report.html', 'report.json' and the figures. Created when missing.
+        n_jobs (int, optional): Number of figure rendering processes. Defaults to the number of CPUs.
+        results (dict, optional): Outputs of the analysis stages; the missing analyses are run here.
+        questions (list, optional): Names of the questions to report (keys of `QUESTIONS`). Default is all of them.
+
+    Returns:
+        tuple: The paths of the HTML report and of the JSON statistics.
+    """
+    output_dir = Path(output_dir)
+    study = StudyDataset.wrap(data)
+    sections = analyze_study(study, results, questions)
+
+    # Render the figures of all the questions together, then regroup the files per question
+    jobs = [job for section in sections for job in section["figures"]]
+    outputs = iter(render_figures(jobs, Renderer(output_dir / "figures"), n_jobs=n_jobs))
+    figures = []
+    for section in sections:
+        paths = []
+        for _ in section["figures"]:
+            output = next(outputs)
+            paths.extend(output if isinstance(output, list) else [output])
+        figures.append(paths)
+
+    payload = {
+        "participants": len(study.data),
+        "questions": [{**summary, "figures": [f"figures/{path.name}" for path in paths]} for summary, paths in zip(summarize(sections), figures, strict=True)],
+    }
+    json_path = output_dir / "report.json"
+    json_path.write_text(json.dumps(payload, indent=2))
+
+    html_path = output_dir / "report.html"
+    with html_path.open("w", encoding="utf-8") as handle:
+        handle.write("<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n<title>Study report</title>\n"
+                     "<style>body{font-family:sans-serif;max-width:1100px;margin:auto}table{border-collapse:collapse;margin:8px 0}"
+                     "td,th{border:1px solid #ccc;padding:3px 8px;text-align:right}img{max-width:100%}</style>\n</head>\n<body>\n")
+        handle.write(f"<h1>Study report</h1>\n<p>{len(study.data)} participants</p>\n")
+        for number, (section, paths) in enumerate(zip(sections, figures, strict=True), start=1):
+            handle.write(f"<h2>{number}. {html.escape(section['question'])}</h2>\n")
+            for name, value in section["statistics"].items():
+                handle.write(f"<h3>{html.escape(name.replace('_', ' ').capitalize())}</h3>\n")
+                handle.write(_to_html(value))
+            for path in paths:
+                encoded = base64.b64encode(path.read_bytes()).decode("ascii")
+                handle.write(f"<img alt=\"{html.escape(path.stem)}\" src=\"data:image/png;base64,{encoded}\">\n")
+        handle.write("</body>\n</html>\n")
+    return html_path, json_path
+
+def _to_json(value: object) -> object:
+    """Convert statistics to JSON values, with tables as lists of records and NaN as null."""
+    if isinstance(value, pd.DataFrame):
+        return _to_json((value if isinstance(value.index, pd.RangeIndex) else value.reset_index()).to_dict("records"))
+    if isinstance(value, dict):
+        return {str(key): _to_json(item) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [_to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def _to_html(value: object) -> str:
+    """Render a statistics table or a dictionary of values as an HTML table."""
+    if isinstance(value, pd.DataFrame):
+        return value.to_html(float_format=lambda number: f"{number:.4g}", na_rep="", border=0,
+                             index=not isinstance(value.index, pd.RangeIndex)) + "\n"
+    rows = "".join(f"<tr><th>{html.escape(str(key))}</th><td>{html.escape(f'{item:.4g}' if isinstance(item, float) else str(item))}</td></tr>"
+                   for key, item in value.items())
+    return f"<table>{rows}</table>\n"
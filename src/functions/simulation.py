@@ -0,0 +1,122 @@
+"""This module reruns the analyses of the study over many independent synthetic datasets.
+
+It includes:
+- Monte Carlo replicates of the augmented dataset, each with its own random stream
+- The chi-square, sAA ANOVA, cortisol ANOVAs and two-way ANOVAs of every replicate, in a process pool
+- The distributions of the statistics and p-values across replicates
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.functions.calculate import analyze_cortisol_data, analyze_saa_response, calculate_two_way_anova_with_viz, chi_square
+from src.functions.general import augment_with_cohorts, prepare_data_from_csv
+from src.objects.initialize_file import COHORT_SPEC, DATA_PATH, SYNTHETIC_COLUMNS, read_participants
+from src.objects.study_dataset import StudyDataset
+from src.objects.tracer import traced
+
+# Outcomes of the two-way ANOVAs run in every replicate
+MEMORY_OUTCOMES = ["negative_image", "positive_image"]
+
+
+@traced
+def simulate_study(n_replicates: int, seed: int | None = None, scale: int = 1, source: str | Path = DATA_PATH, n_jobs: int | None = None) -> pd.DataFrame:
+    """Regenerates the synthetic columns of the study under independent seeds and reruns the analyses on each.
+
+    Every replicate draws from its own `np.random.default_rng` stream, spawned from one
+    `np.random.SeedSequence`, so the replicates are independent, never touch the global random
+    state, and do not depend on how they are split across processes. The replicates are run in
+    chunks by a pool of worker processes.
+
+    Parameters:
+        n_replicates (int): Number of synthetic datasets.
+        seed (int, optional): Seed of the root sequence; None draws fresh entropy.
+        scale (int): Cohort scale factor of every replicate. Default is 1.
+        source (str | Path): Participant CSV whose label columns every replicate keeps. Default is the bundled data set.
+        n_jobs (int, optional): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        pd.DataFrame: One row per replicate (indexed 'replicate') and one column per statistic, named
+                      '<analysis>.<statistic>', e.g. 'saa_anova.p_value' or 'negative_image.C(status).F'.
+
+    Raises:
+        ValueError: If 'n_replicates' or 'n_jobs' is not positive.
+    """
+    n_jobs = n_jobs if n_jobs is not None else os.cpu_count() or 1
+    if n_replicates <= 0 or n_jobs <= 0:
+        msg = "Error: 'n_replicates' and 'n_jobs' must be positive."
+        raise ValueError(msg)
+
+    participants = read_participants(source)
+    streams = np.random.SeedSequence(seed).spawn(n_replicates)
+
+    # A few chunks per worker keeps them busy until the end without sending one task per replicate
+    n_chunks = min(n_replicates, n_jobs * 4) if n_jobs > 1 else 1
+    chunks = [[streams[i] for i in part] for part in np.array_split(np.arange(n_replicates), n_chunks)]
+    if n_jobs == 1:
+        rows = [_run_replicates(participants, chunks[0], scale)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, n_chunks)) as pool:
+            rows = list(pool.map(_run_replicates, [participants] * n_chunks, chunks, [scale] * n_chunks))
+    return pd.DataFrame([row for chunk in rows for row in chunk]).rename_axis("replicate")
+
+def summarize_simulation(replicates: pd.DataFrame, alpha: float = 0.05) -> pd.DataFrame:
+    """Summarizes the distribution of every statistic across replicates.
+
+    Parameters:
+        replicates (pd.DataFrame): Replicates as returned by `simulate_study`.
+        alpha (float): Significance level of the rejection rates. Default is 0.05.
+
+    Returns:
+        pd.DataFrame: Mean, standard deviation, 2.5%, 50% and 97.5% quantiles of every statistic, and for
+                      p-values the share of replicates below `alpha`, indexed by statistic.
+    """
+    summary = pd.DataFrame({
+        "mean": replicates.mean(),
+        "std": replicates.std(),
+        "q025": replicates.quantile(0.025),
+        "median": replicates.median(),
+        "q975": replicates.quantile(0.975),
+    })
+    p_values = [column for column in replicates.columns if column.endswith("p_value")]
+    # Replicates whose test was undefined (NaN p-value) are left out of the rates
+    rejected = (replicates[p_values] < alpha).where(replicates[p_values].notna())
+    summary["rejection_rate"] = rejected.mean().reindex(summary.index)
+    return summary.rename_axis("statistic")
+
+def study_statistics(data: pd.DataFrame) -> dict:
+    """Runs the analyses of the study on one augmented participant table.
+
+    Parameters:
+        data (pd.DataFrame): The augmented participant table.
+
+    Returns:
+        dict: One flat row of statistics, named '<analysis>.<statistic>' as the columns of `simulate_study`.
+    """
+    study = StudyDataset(data)
+    row = {}
+
+    chi2, p, _ = chi_square(prepare_data_from_csv(data))
+    row.update({"cortisol_chi_square.chi2": chi2, "cortisol_chi_square.p_value": p})
+
+    saa = analyze_saa_response(study, group_data=False)
+    row.update({"saa_anova.F": saa["anova_results"]["f_statistic"], "saa_anova.p_value": saa["anova_results"]["p_value"],
+                "saa_anova.cohens_d": saa["effect_size"]["cohens_d"]})
+
+    tests = ["nc_phase_baseline", "nc_phase_change", "hc_pill_baseline", "hc_pill_change"]
+    for name, result in zip(tests, analyze_cortisol_data(study)[:4], strict=True):
+        row.update({f"{name}.F": result.statistic, f"{name}.p_value": result.pvalue})
+
+    _, anova_tables = calculate_two_way_anova_with_viz(study, MEMORY_OUTCOMES)
+    for outcome, table in anova_tables.items():
+        for term, values in table.drop(index="Residual").iterrows():
+            row.update({f"{outcome}.{term}.F": values["F"], f"{outcome}.{term}.p_value": values["PR(>F)"]})
+    return row
+
+def _run_replicates(participants: pd.DataFrame, streams: list, scale: int) -> list:
+    """Generate and analyze the replicates of one chunk; returns one flat row of statistics per replicate."""
+    return [study_statistics(augment_with_cohorts(participants, COHORT_SPEC, scale, SYNTHETIC_COLUMNS, rng=np.random.default_rng(stream)))
+            for stream in streams]
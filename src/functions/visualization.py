@@ -3,17 +3,37 @@
 It includes:
 - Data manipulation using Pandas and NumPy
 - Statistical tests (Chi-Square, ANOVA)
-- Model fitting with Statsmodels
+- Regression lines from the batched fits of the calculation layer
+- Interactive or headless rendering through a Renderer, and parallel rendering of figure sets
 """
-import matplotlib.pyplot as plt
+import io
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import statsmodels.api as sm
-from scipy.stats import f_oneway
+
+from src.functions.calculate import AnovaResult, linear_regressions
+from src.functions.general import label_mask
+from src.objects.renderer import Renderer
+from src.objects.study_dataset import StudyDataset
+from src.objects.tracer import traced
+
+# matplotlib and seaborn take seconds to import, so they are imported by the functions
+# drawing with them rather than here: statistics-only runs never load them
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# Largest number of points drawn per group in a scatter plot; larger groups are drawn from a fixed random sample
+MAX_SCATTER_POINTS = 20_000
 
 
-def plot_difference_of_cortisol_chi2(data: pd.DataFrame, chi2: float, p: float, threshold: float=0.055) ->None:
+@traced
+def plot_difference_of_cortisol_chi2(data: pd.DataFrame, chi2: float, p: float, threshold: float=0.055,
+                                     renderer: Renderer | None = None) -> "Figure | Path | None":
     """Creates a bar plot comparing the number of cortisol responders and non-responders in two groups
 
     (Naturally Cycling (NC) and Hormonal Contraceptive (HC) women). The function includes annotations,
@@ -24,109 +44,119 @@ def plot_difference_of_cortisol_chi2(data: pd.DataFrame, chi2: float, p: float,
         chi2 (float): The Chi-square statistic value.
         p (float): The p-value associated with the Chi-square test.
         threshold (float, optional): The threshold for defining responders in μg/dL. Default is 0.055.
+        renderer (Renderer, optional): Where the figure goes; shown interactively when omitted.
 
     Returns:
-        None: This function generates and displays a plot but does not return any value.
+        Figure | Path | None: The figure or its file when rendered headless, None when displayed.
     """
-     # Create figure and axis
-    plt.figure(figsize=(8, 6))
+    renderer = renderer or Renderer()
+
+    # Create figure and axis
+    fig = renderer.figure(figsize=(8, 6))
+    ax = fig.add_subplot()
 
     # Plot bars
     bar_width = 0.35
     x = range(len(data["Group"]))
 
     # Plot Responders and Non-Responders bars
-    plt.bar(x, data["Responders"], bar_width, color="#E6E6FA", label="Responders")
-    plt.bar([i + bar_width for i in x], data["Non-Responders"], bar_width, color="#87CEFA", label="Non-Responders")
+    ax.bar(x, data["Responders"], bar_width, color="#E6E6FA", label="Responders")
+    ax.bar([i + bar_width for i in x], data["Non-Responders"], bar_width, color="#87CEFA", label="Non-Responders")
 
     # Customize the plot
-    plt.title("Number of CPS Cortisol Responders and Non-Responders in\n"
-              "Naturally Cycling (NC) and Hormonal Contraceptive (HC) Women")
-    plt.xlabel("Contraceptive Group")
-    plt.ylabel("Number of Participants")
+    ax.set_title("Number of CPS Cortisol Responders and Non-Responders in\n"
+                 "Naturally Cycling (NC) and Hormonal Contraceptive (HC) Women")
+    ax.set_xlabel("Contraceptive Group")
+    ax.set_ylabel("Number of Participants")
 
     # Set x-axis ticks
-    plt.xticks([i + bar_width/2 for i in x], data["Group"])
+    ax.set_xticks([i + bar_width/2 for i in x], data["Group"])
 
     # Add trend line
-    plt.plot([0 + bar_width/2, 1 + bar_width/2],
-             [data["Responders"].iloc[0], data["Responders"].iloc[1]],
-             "k--", label="Trend Line")
+    ax.plot([0 + bar_width/2, 1 + bar_width/2],
+            [data["Responders"].iloc[0], data["Responders"].iloc[1]],
+            "k--", label="Trend Line")
 
     # Add 'Higher Responders in NC' annotation
-    plt.annotate("Higher Responders in NC",
+    ax.annotate("Higher Responders in NC",
                 xy=(1 + bar_width/2, data["Responders"].iloc[1]),
                 xytext=(0.5 + bar_width/2, data["Responders"].max() + 2),
                 arrowprops={"facecolor":"black", "arrowstyle":"->"},
                 ha="center")
 
     # Set y-axis limit to match reference
-    plt.ylim(0, 30)
+    ax.set_ylim(0, 30)
 
     # Add legend
-    plt.legend(loc="upper right")
+    ax.legend(loc="upper right")
 
     # Add statistical information
-    plt.figtext(0.15, 0.02,
-                f"Threshold used for defining responders: {threshold:.3f} μg/dL\n"
-                f"Chi-square statistic: {chi2:.2f}\n"
-                f"p-value: {p:.4f}\n"
-                "No statistically significant difference (p ≥ 0.05)",
-                fontsize=8)
+    fig.text(0.15, 0.02,
+             f"Threshold used for defining responders: {threshold:.3f} μg/dL\n"
+             f"Chi-square statistic: {chi2:.2f}\n"
+             f"p-value: {p:.4f}\n"
+             "No statistically significant difference (p ≥ 0.05)",
+             fontsize=8)
 
     # Adjust layout
-    plt.tight_layout()
-    plt.subplots_adjust(bottom=0.2)
-    plt.show()
+    fig.tight_layout()
+    fig.subplots_adjust(bottom=0.2)
+    return renderer.finish(fig, "cortisol_responders_chi2")
 
-def plot_difference_saa_responses(data: pd.DataFrame) -> None:
+@traced
+def plot_difference_saa_responses(data: pd.DataFrame | StudyDataset, renderer: Renderer | None = None) -> "Figure | Path | None":
     """Plots the difference in salivary alpha-amylase (sAA) responses between women in HC (Hormonal Contraceptive)
 
     and NC (Natural Cycle) groups based on the provided data.
 
     Parameters:
-        data (pd.DataFrame): The DataFrame we perform the analysis on.
+        data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) we perform the analysis on.
+        renderer (Renderer, optional): Where the figure goes; shown interactively when omitted.
 
     Returns:
-        None: The function generates a bar plot but does not return any value.
+        Figure | Path | None: The figure or its file when rendered headless, None when displayed.
 
     Raises:
         KeyError: If the required column 'change_image_sAA_level' is missing.
     """
     # Extract groups from the DataFrame.
-    if "change_image_sAA_level" not in data.columns:
+    dataset = StudyDataset.wrap(data)
+    if "change_image_sAA_level" not in dataset.data.columns:
         msg = "Error: The required column 'change_image_sAA_level' is missing from the DataFrame."
         raise KeyError(msg)
 
     groups = {
-        "NC": data["change_image_sAA_level"][:42],
-        "HC": data["change_image_sAA_level"][42:],
+        "NC": dataset.column("change_image_sAA_level", status="NC"),
+        "HC": dataset.column("change_image_sAA_level", status="HC"),
     }
 
     # Create a bar plot
-    plt.figure(figsize=(8, 6))
-    plt.bar(
+    renderer = renderer or Renderer()
+    fig = renderer.figure(figsize=(8, 6))
+    ax = fig.add_subplot()
+    ax.bar(
         ["HC Women", "NC Women"],
         [np.mean(groups["HC"]), np.mean(groups["NC"])],
         capsize=5,
         color=["#4A6D7C", "#475657"],
         alpha=0.8
     )
-    plt.title("Difference in sAA Responses: HC vs NC Groups", fontsize=10, weight="bold")
-    plt.ylabel("sAA Change (U/mL)\nSEM", fontsize=12)
-    plt.xticks(fontsize=12)
-    plt.yticks(fontsize=12)
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
-    plt.show()
-
-def statistics_of_saa_responses(results: dict) -> None:
+    ax.set_title("Difference in sAA Responses: HC vs NC Groups", fontsize=10, weight="bold")
+    ax.set_ylabel("sAA Change (U/mL)\nSEM", fontsize=12)
+    ax.tick_params(labelsize=12)
+    ax.grid(axis="y", linestyle="--", alpha=0.7)
+    return renderer.finish(fig, "saa_responses")
+
+@traced
+def statistics_of_saa_responses(results: dict, renderer: Renderer | None = None) -> "Figure | Path | None":
     """Display sAA response Anova analysis results as a visual table
 
     Parameters:
     results (dict): Dictionary containing ANOVA, effect size, and summary statistics
+    renderer (Renderer, optional): Where the figure goes; shown interactively when omitted
 
     Returns:
-        None: The function generates a table plot but does not return any value
+        Figure | Path | None: The figure or its file when rendered headless, None when displayed.
     """
     # Prepare the data for visualization
     table_data = []
@@ -139,18 +169,22 @@ def statistics_of_saa_responses(results: dict) -> None:
             table_data.append([f"{group} {stat.capitalize()}", f"{value:.4f}"])
 
     # Plot the table
-    plt.figure(figsize=(10, 5))
-    plt.axis("off")
-    plt.title("sAA Response Analysis Results", fontsize=14, weight="bold")
+    renderer = renderer or Renderer()
+    fig = renderer.figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    ax.axis("off")
+    ax.set_title("sAA Response Analysis Results", fontsize=14, weight="bold")
 
     # Create the table
-    table = plt.table(cellText=table_data, colLabels=["Metric", "Value"], cellLoc="center", loc="center", bbox=[0, 0, 1, 1])
+    table = ax.table(cellText=table_data, colLabels=["Metric", "Value"], cellLoc="center", loc="center", bbox=[0, 0, 1, 1])
     table.set_fontsize(10)
     table.auto_set_column_width(col=[0, 1])
 
-    plt.show()
+    return renderer.finish(fig, "saa_statistics")
 
-def plot_affect_baseline_cortisol_saa_linear_regressions(data: pd.DataFrame) -> None:
+@traced
+def plot_affect_baseline_cortisol_saa_linear_regressions(data: pd.DataFrame | StudyDataset, regressions: pd.DataFrame | None = None,
+                                                          renderer: Renderer | None = None) -> list | None:
     """Creates scatter plots with linear regression lines for:
 
     1. SAA Level Baseline vs Change in Cortisol Level
@@ -158,97 +192,57 @@ def plot_affect_baseline_cortisol_saa_linear_regressions(data: pd.DataFrame) ->
     for two groups: Naturally Cycling (NC) and Hormonal Contraceptive (HC).
 
     Parameters:
-        data (pd.DataFrame): The DataFrame we perform the analysis on
+        data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) we perform the analysis on
+        regressions (pd.DataFrame, optional): Fits from `linear_regressions` by status; computed when omitted
+        renderer (Renderer, optional): Where the figures go; shown interactively when omitted.
 
     Returns:
-        None: The function generates and displays scatter plots with regression lines.
+        list | None: The two figures or their files when rendered headless, None when displayed.
 
     Raises:
         KeyError: If required columns are missing from the data
     """
-    # Separate data by groups
-    try:
-        group_nc = data[data["status"] == "NC"].copy()
-        group_hc = data[data["status"] == "HC"].copy()
-    except KeyError as e:
-        msg = f"Error accessing contingency table columns: {e}"
-        raise KeyError(msg) from e
-
-    # Plot SAA Level Baseline vs Change in Cortisol Level
-    plt.figure(figsize=(10, 8))
-
-    # Group NC
-    try:
-        x_nc_saa = group_nc["sAA_level_baseline"]
-        y_nc_cortisol = group_nc["change_CPS_cortisol_level"]
-    except KeyError as e:
-        msg = f"Error accessing contingency table columns: {e}"
-        raise KeyError(msg) from e
-    x_nc_saa_const = sm.add_constant(x_nc_saa)
-    model_nc_saa = sm.OLS(y_nc_cortisol, x_nc_saa_const).fit()
-    y_nc_pred_saa = model_nc_saa.predict(x_nc_saa_const)
-    plt.scatter(x_nc_saa, y_nc_cortisol, alpha=0.7, label="NC (Data)", color="blue")
-    plt.plot(x_nc_saa, y_nc_pred_saa, label="NC (Regression)", color="blue", linestyle="--")
+    predictors = {"sAA_level_baseline": "SAA Level Baseline", "cortisol_level_baseline": "Cortisol Level Baseline"}
+    outcome = "change_CPS_cortisol_level"
 
-    # Group HC
-    try:
-        x_hc_saa = group_hc["sAA_level_baseline"]
-        y_hc_cortisol = group_hc["change_CPS_cortisol_level"]
-    except KeyError as e:
-        msg = f"Error accessing contingency table columns: {e}"
-        raise KeyError(msg) from e
-    x_hc_saa_const = sm.add_constant(x_hc_saa)
-    model_hc_saa = sm.OLS(y_hc_cortisol, x_hc_saa_const).fit()
-    y_hc_pred_saa = model_hc_saa.predict(x_hc_saa_const)
-    plt.scatter(x_hc_saa, y_hc_cortisol, alpha=0.7, label="HC (Data)", color="orange")
-    plt.plot(x_hc_saa, y_hc_pred_saa, label="HC (Regression)", color="orange", linestyle="--")
-
-    plt.xlabel("SAA Level Baseline")
-    plt.ylabel("Change in Cortisol Level")
-    plt.title("SAA Level Baseline vs Change in Cortisol Level (NC vs HC)")
-    plt.legend()
-    plt.grid()
-    plt.show()
-
-    # Plot Cortisol Level Baseline vs Change in Cortisol Level
-    plt.figure(figsize=(10, 8))
-
-    # Group NC
+    # Separate data by groups and fit every regression in one pass
     try:
-        x_nc_cortisol = group_nc["cortisol_level_baseline"]
-        y_nc_cortisol_change = group_nc["change_CPS_cortisol_level"]
+        dataset = StudyDataset.wrap(data)
+        groups = {"NC": dataset.select(status="NC"), "HC": dataset.select(status="HC")}
+        if regressions is None:
+            regressions = linear_regressions(dataset, list(predictors), [outcome], by="status")
     except KeyError as e:
         msg = f"Error accessing contingency table columns: {e}"
         raise KeyError(msg) from e
-    x_nc_cortisol_const = sm.add_constant(x_nc_cortisol)
-    model_nc_cortisol = sm.OLS(y_nc_cortisol_change, x_nc_cortisol_const).fit()
-    y_nc_pred_cortisol = model_nc_cortisol.predict(x_nc_cortisol_const)
-    plt.scatter(x_nc_cortisol, y_nc_cortisol_change, alpha=0.7, label="NC (Data)", color="blue")
-    plt.plot(x_nc_cortisol, y_nc_pred_cortisol, label="NC (Regression)", color="blue", linestyle="--")
 
-    # Group HC
-    try:
-        x_hc_cortisol = group_hc["cortisol_level_baseline"]
-        y_hc_cortisol_change = group_hc["change_CPS_cortisol_level"]
-    except KeyError as e:
-        msg = f"Error accessing contingency table columns: {e}"
-        raise KeyError(msg) from e
-    x_hc_cortisol_const = sm.add_constant(x_hc_cortisol)
-    model_hc_cortisol = sm.OLS(y_hc_cortisol_change, x_hc_cortisol_const).fit()
-    y_hc_pred_cortisol = model_hc_cortisol.predict(x_hc_cortisol_const)
-    plt.scatter(x_hc_cortisol, y_hc_cortisol_change, alpha=0.7, label="HC (Data)", color="orange")
-    plt.plot(x_hc_cortisol, y_hc_pred_cortisol, label="HC (Regression)", color="orange", linestyle="--")
-
-    plt.xlabel("Cortisol Level Baseline")
-    plt.ylabel("Change in Cortisol Level")
-    plt.title("Cortisol Level Baseline vs Change in Cortisol Level (NC vs HC)")
-    plt.legend()
-    plt.grid()
-    plt.show()
-
-def plot_cortisol_phase_pill_effects(anova_nc_baseline: f_oneway, anova_nc_change: f_oneway,
-                                     anova_hc_baseline: f_oneway, anova_hc_change: f_oneway,
-                                     nc_data: pd.DataFrame, hc_data: pd.DataFrame) -> None:
+    renderer = renderer or Renderer()
+    outputs = []
+    for predictor, title in predictors.items():
+        # Plot the baseline level vs Change in Cortisol Level
+        fig = renderer.figure(figsize=(10, 8))
+        ax = fig.add_subplot()
+        for status, color in [("NC", "blue"), ("HC", "orange")]:
+            group = groups[status]
+            points = group.sample(MAX_SCATTER_POINTS, random_state=0) if len(group) > MAX_SCATTER_POINTS else group
+            ax.scatter(points[predictor], points[outcome], alpha=0.7, label=f"{status} (Data)", color=color)
+
+            # The regression line only needs its two ends
+            fit = regressions.loc[(status, predictor, outcome)]
+            x = np.array([group[predictor].min(), group[predictor].max()])
+            ax.plot(x, fit["intercept"] + fit["slope"] * x, label=f"{status} (Regression)", color=color, linestyle="--")
+
+        ax.set_xlabel(title)
+        ax.set_ylabel("Change in Cortisol Level")
+        ax.set_title(f"{title} vs Change in Cortisol Level (NC vs HC)")
+        ax.legend()
+        ax.grid()
+        outputs.append(renderer.finish(fig, f"regression_{predictor}"))
+    return outputs if renderer.headless or renderer.output_dir is not None else None
+
+@traced
+def plot_cortisol_phase_pill_effects(anova_nc_baseline: AnovaResult, anova_nc_change: AnovaResult,
+                                     anova_hc_baseline: AnovaResult, anova_hc_change: AnovaResult,
+                                     nc_data: pd.DataFrame, hc_data: pd.DataFrame, renderer: Renderer | None = None) -> "Figure | Path | None":
     """Creates a 2x2 grid of bar plots to visualize the effects of menstrual phase and pill type on cortisol levels
 
     (baseline and change) for Naturally Cycling (NC) and Hormonal Contraceptive (HC) groups.
@@ -256,67 +250,77 @@ def plot_cortisol_phase_pill_effects(anova_nc_baseline: f_oneway, anova_nc_chang
     Parameters:
         nc_data (pd.DataFrame): DataFrame of the NC group
         hc_data (pd.DataFrame): DataFrame of the HC group
+        renderer (Renderer, optional): Where the figure goes; shown interactively when omitted.
 
     Returns:
-        None: The function generates and displays a grid of bar plots.
+        Figure | Path | None: The figure or its file when rendered headless, None when displayed.
     """
-    plt.figure(figsize=(10, 8))  # Adjusted size to make each subplot smaller
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    renderer = renderer or Renderer()
+    fig = renderer.figure(figsize=(10, 8))  # Adjusted size to make each subplot smaller
+    axes = fig.subplots(2, 2).ravel()
 
     # NC baseline cortisol levels
-    plt.subplot(2, 2, 1)
-    sns.barplot(data=nc_data, x="phase", y="cortisol_level_baseline", palette="muted", errorbar=None, hue= "phase", legend=False)
-    plt.title("NC Baseline Cortisol Levels", fontsize=10)
-    plt.xlabel("phase", fontsize=10, labelpad=-7)
-    plt.ylabel("Baseline Cortisol Level", fontsize=8)
-    plt.xticks(rotation=45, fontsize=8, ha="right")
-    plt.yticks(fontsize=8)
-    plt.ylim(0, nc_data["cortisol_level_baseline"].max() * 1.1)
+    ax = axes[0]
+    sns.barplot(data=_category_means(nc_data, "phase", "cortisol_level_baseline"), x="phase", y="cortisol_level_baseline", palette="muted", errorbar=None, hue="phase", legend=False, ax=ax)
+    ax.set_title("NC Baseline Cortisol Levels", fontsize=10)
+    ax.set_xlabel("phase", fontsize=10, labelpad=-7)
+    ax.set_ylabel("Baseline Cortisol Level", fontsize=8)
+    plt.setp(ax.get_xticklabels(), rotation=45, fontsize=8, ha="right")
+    ax.tick_params(axis="y", labelsize=8)
+    ax.set_ylim(0, nc_data["cortisol_level_baseline"].max() * 1.1)
 
     # NC cortisol change
-    plt.subplot(2, 2, 2)
-    sns.barplot(data=nc_data, x="phase", y="cortisol_change", palette="muted", errorbar=None,  hue= "phase", legend=False)
-    plt.title("NC Cortisol Change", fontsize=10)
-    plt.xlabel("phase", fontsize=10, labelpad=-7)
-    plt.ylabel("Cortisol Change", fontsize=8)
-    plt.xticks(rotation=45, fontsize=8, ha="right")
-    plt.yticks(fontsize=8)
-    plt.ylim(0, nc_data["cortisol_change"].max() * 1.1)
+    ax = axes[1]
+    sns.barplot(data=_category_means(nc_data, "phase", "cortisol_change"), x="phase", y="cortisol_change", palette="muted", errorbar=None, hue="phase", legend=False, ax=ax)
+    ax.set_title("NC Cortisol Change", fontsize=10)
+    ax.set_xlabel("phase", fontsize=10, labelpad=-7)
+    ax.set_ylabel("Cortisol Change", fontsize=8)
+    plt.setp(ax.get_xticklabels(), rotation=45, fontsize=8, ha="right")
+    ax.tick_params(axis="y", labelsize=8)
+    ax.set_ylim(0, nc_data["cortisol_change"].max() * 1.1)
 
     # HC baseline cortisol levels
-    plt.subplot(2, 2, 3)
-    sns.barplot(data=hc_data, x="pill_type", y="cortisol_level_baseline", palette="pastel", errorbar=None, hue= "pill_type", legend=False)
-    plt.title("HC Baseline Cortisol Levels", fontsize=10)
-    plt.ylabel("Baseline Cortisol Level", fontsize=8)
-    plt.xlabel("Pill Type", fontsize=10, labelpad=-7)
-    plt.xticks(rotation=45, fontsize=8, ha="right")
-    plt.yticks(fontsize=8)
-    plt.ylim(0, hc_data["cortisol_level_baseline"].max() * 1.1)
+    ax = axes[2]
+    sns.barplot(data=_category_means(hc_data, "pill_type", "cortisol_level_baseline"), x="pill_type", y="cortisol_level_baseline", palette="pastel", errorbar=None, hue="pill_type", legend=False, ax=ax)
+    ax.set_title("HC Baseline Cortisol Levels", fontsize=10)
+    ax.set_ylabel("Baseline Cortisol Level", fontsize=8)
+    ax.set_xlabel("Pill Type", fontsize=10, labelpad=-7)
+    plt.setp(ax.get_xticklabels(), rotation=45, fontsize=8, ha="right")
+    ax.tick_params(axis="y", labelsize=8)
+    ax.set_ylim(0, hc_data["cortisol_level_baseline"].max() * 1.1)
 
     # HC cortisol change
-    plt.subplot(2, 2, 4)
-    sns.barplot(data=hc_data, x="pill_type", y="cortisol_change", palette="pastel", errorbar=None, hue= "pill_type", legend=False)
-    plt.title("HC Cortisol Change", fontsize=10)
-    plt.ylabel("Cortisol Change", fontsize=8)
-    plt.xlabel("Pill Type", fontsize=10, labelpad=-7)
-    plt.xticks(rotation=45, fontsize=8, ha="right")
-    plt.yticks(fontsize=8)
-    plt.ylim(0, hc_data["cortisol_change"].max() * 1.1)
-
-    plt.tight_layout()
-    plt.show()
-
-def plot_negative_images_responses(data: pd.DataFrame) -> None:
+    ax = axes[3]
+    sns.barplot(data=_category_means(hc_data, "pill_type", "cortisol_change"), x="pill_type", y="cortisol_change", palette="pastel", errorbar=None, hue="pill_type", legend=False, ax=ax)
+    ax.set_title("HC Cortisol Change", fontsize=10)
+    ax.set_ylabel("Cortisol Change", fontsize=8)
+    ax.set_xlabel("Pill Type", fontsize=10, labelpad=-7)
+    plt.setp(ax.get_xticklabels(), rotation=45, fontsize=8, ha="right")
+    ax.tick_params(axis="y", labelsize=8)
+    ax.set_ylim(0, hc_data["cortisol_change"].max() * 1.1)
+
+    fig.tight_layout()
+    return renderer.finish(fig, "cortisol_phase_pill_effects")
+
+@traced
+def plot_negative_images_responses(data: pd.DataFrame | StudyDataset, renderer: Renderer | None = None) -> "Figure | Path | None":
     """Plots the average memory for negative stimuli based on SAA and Cortisol responses in two groups.
 
     Parameters:
-        data (pd.DataFrame): The DataFrame we perform the analysis on.
+        data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) we perform the analysis on.
+        renderer (Renderer, optional): Where the figure goes; shown interactively when omitted.
 
     Returns:
-        None: Generates and displays a bar plot.
+        Figure | Path | None: The figure or its file when rendered headless, None when displayed.
 
     Raises:
         KeyError: If required columns are missing from the data.
     """
+    import seaborn as sns
+    dataset = StudyDataset.wrap(data)
+    data = dataset.data
     required_columns = {"status", "responsive_state_SAA", "responsive_state_cortisol", "negative_image"}
     missing_columns = required_columns - set(data.columns)
     if missing_columns:
@@ -324,15 +328,15 @@ def plot_negative_images_responses(data: pd.DataFrame) -> None:
         raise KeyError(msg)
 
     # Split data based on group (HC vs NC)
-    hc_data = data[data["status"] == "HC"].copy()
-    nc_data = data[data["status"] == "NC"].copy()
+    hc_data = dataset.select(status="HC").copy()
+    nc_data = dataset.select(status="NC").copy()
 
     # Define responders and non-responders for both HC and NC
-    hc_data["saa_responders"] = np.where(hc_data["responsive_state_SAA"] == "responders", "SAA Responders", "SAA Nonresponders")
-    hc_data["cortisol_responders"] = np.where(hc_data["responsive_state_cortisol"] == "responders", "Cortisol Responders", "Cortisol Nonresponders")
+    hc_data["saa_responders"] = np.where(label_mask(hc_data, "responsive_state_SAA", "responders"), "SAA Responders", "SAA Nonresponders")
+    hc_data["cortisol_responders"] = np.where(label_mask(hc_data, "responsive_state_cortisol", "responders"), "Cortisol Responders", "Cortisol Nonresponders")
 
-    nc_data["saa_responders"] = np.where(nc_data["responsive_state_SAA"] == "responders", "SAA Responders", "SAA Nonresponders")
-    nc_data["cortisol_responders"] = np.where(nc_data["responsive_state_cortisol"] == "responders", "Cortisol Responders", "Cortisol Nonresponders")
+    nc_data["saa_responders"] = np.where(label_mask(nc_data, "responsive_state_SAA", "responders"), "SAA Responders", "SAA Nonresponders")
+    nc_data["cortisol_responders"] = np.where(label_mask(nc_data, "responsive_state_cortisol", "responders"), "Cortisol Responders", "Cortisol Nonresponders")
 
     # Combine data for plotting
     combined_data_saa = pd.concat([hc_data[["status", "saa_responders", "negative_image"]],
@@ -349,29 +353,34 @@ def plot_negative_images_responses(data: pd.DataFrame) -> None:
     merged_data = pd.concat([combined_data_saa, combined_data_cortisol])
 
     # Create a combined bar plot
-    plt.figure(figsize=(12, 8))
-    sns.barplot(data=merged_data, x="responders", y="negative_image", hue="status", errorbar=None, palette="pastel", dodge=True)
-    plt.title("Memory for Negative Stimuli Based on SAA and Cortisol Responses (Combined)")
-    plt.ylabel("Average Memory for Negative Stimuli")
-    plt.xlabel("Responders vs Nonresponders")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
-
-
-def heat_map(group_means: pd.DataFrame, val: str) -> None:
+    renderer = renderer or Renderer()
+    fig = renderer.figure(figsize=(12, 8))
+    ax = fig.add_subplot()
+    sns.barplot(data=_category_means(merged_data, ["responders", "status"], "negative_image"), x="responders", y="negative_image", hue="status", errorbar=None, palette="pastel", dodge=True, ax=ax)
+    ax.set_title("Memory for Negative Stimuli Based on SAA and Cortisol Responses (Combined)")
+    ax.set_ylabel("Average Memory for Negative Stimuli")
+    ax.set_xlabel("Responders vs Nonresponders")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    return renderer.finish(fig, "negative_images_responses")
+
+
+@traced
+def heat_map(group_means: pd.DataFrame, val: str, renderer: Renderer | None = None) -> "Figure | Path | None":
     """Creates a heatmap visualization of group means based on the specified value column.
 
     Parameters:
         group_means (pd.DataFrame): The DataFrame we perform the analysis on.
         val (str): The name of the column in `group_means` to be used for the heatmap values.
+        renderer (Renderer, optional): Where the figure goes; shown interactively when omitted.
 
     Returns:
-        None: Generates and displays a heatmap.
+        Figure | Path | None: The figure or its file when rendered headless, None when displayed.
 
     Raises:
         KeyError: If required columns are missing from the data.
     """
+    import seaborn as sns
     required_columns = ["saa_responders", "cortisol_responders", "status", val]
     missing_columns = [col for col in required_columns if col not in group_means.columns]
     if missing_columns:
@@ -383,15 +392,18 @@ def heat_map(group_means: pd.DataFrame, val: str) -> None:
                                     columns="status", values=val, aggfunc="mean")
 
     # Visualization of group means
-    plt.figure(figsize=(10, 6))
-    sns.heatmap(means, annot=True, fmt=".2f", cmap="coolwarm", cbar_kws={"label": "Mean Memory Score"})
-    plt.title("Heatmap of Group Means")
-    plt.xlabel("Status")
-    plt.ylabel("SAA and Cortisol Responders")
-    plt.tight_layout()
-    plt.show()
-
-def vizualizations_two_way_anova(anova_table: pd.DataFrame) -> None:
+    renderer = renderer or Renderer()
+    fig = renderer.figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    sns.heatmap(means, annot=True, fmt=".2f", cmap="coolwarm", cbar_kws={"label": "Mean Memory Score"}, ax=ax)
+    ax.set_title("Heatmap of Group Means")
+    ax.set_xlabel("Status")
+    ax.set_ylabel("SAA and Cortisol Responders")
+    fig.tight_layout()
+    return renderer.finish(fig, f"heat_map_{val}")
+
+@traced
+def vizualizations_two_way_anova(anova_table: pd.DataFrame, renderer: Renderer | None = None, name: str = "two_way_anova") -> list | None:
     """Creates visualizations for a two-way ANOVA table, displaying F-values and p-values for effects related to status.
 
     Parameters:
@@ -400,13 +412,16 @@ def vizualizations_two_way_anova(anova_table: pd.DataFrame) -> None:
                                     - 'Effect': The effect names.
                                     - 'F': The F-values for each effect.
                                     - 'PR(>F)': The p-values for each effect.
+        renderer (Renderer, optional): Where the figures go; shown interactively when omitted.
+        name (str, optional): File name prefix of the figures. Default is 'two_way_anova'.
 
     Returns:
-        None: Generates and displays bar plots.
+        list | None: The two figures or their files when rendered headless, None when displayed.
 
     Raises:
         KeyError: If required columns are missing from the data.
     """
+    import seaborn as sns
     required_columns = ["F", "PR(>F)"]
     missing_columns = [col for col in required_columns if col not in anova_table.columns]
     if missing_columns:
@@ -419,38 +434,47 @@ def vizualizations_two_way_anova(anova_table: pd.DataFrame) -> None:
     anova_viz = anova_viz[anova_viz["Effect"].str.contains("status")]
 
     # Plot F-Values for status effects
-    plt.figure(figsize=(12, 6))
-    sns.barplot(data=anova_viz, x="Effect", y="F", palette="muted", hue="Effect", legend=False)
-    plt.title("ANOVA F-Values for Status (NC/HC) Effects")
-    plt.ylabel("F-Value")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+    renderer = renderer or Renderer()
+    fig = renderer.figure(figsize=(12, 6))
+    ax = fig.add_subplot()
+    sns.barplot(data=anova_viz, x="Effect", y="F", palette="muted", hue="Effect", legend=False, ax=ax)
+    ax.set_title("ANOVA F-Values for Status (NC/HC) Effects")
+    ax.set_ylabel("F-Value")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    outputs = [renderer.finish(fig, f"{name}_f_values")]
 
     # Plot p-Values for status effects
-    plt.figure(figsize=(12, 6))
-    sns.barplot(data=anova_viz, x="Effect", y="PR(>F)", palette="muted", hue="Effect", legend=False)
-    plt.title("ANOVA p-Values for Status (NC/HC) Effects")
-    plt.ylabel("p-Value")
-    plt.xticks(rotation=45)
-    plt.axhline(0.05, color="red", linestyle="--", label="Significance Threshold (p=0.05)")
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
-
-
-def plot_positive_images_responses(data: pd.DataFrame) -> None:
+    fig = renderer.figure(figsize=(12, 6))
+    ax = fig.add_subplot()
+    sns.barplot(data=anova_viz, x="Effect", y="PR(>F)", palette="muted", hue="Effect", legend=False, ax=ax)
+    ax.set_title("ANOVA p-Values for Status (NC/HC) Effects")
+    ax.set_ylabel("p-Value")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.axhline(0.05, color="red", linestyle="--", label="Significance Threshold (p=0.05)")
+    ax.legend()
+    fig.tight_layout()
+    outputs.append(renderer.finish(fig, f"{name}_p_values"))
+    return outputs if renderer.headless or renderer.output_dir is not None else None
+
+
+@traced
+def plot_positive_images_responses(data: pd.DataFrame | StudyDataset, renderer: Renderer | None = None) -> "Figure | Path | None":
     """Plots the average memory for positive stimuli based on SAA and Cortisol responses in two groups.
 
     Parameters:
-        data (pd.DataFrame): The DataFrame we perform the analysis on.
+        data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) we perform the analysis on.
+        renderer (Renderer, optional): Where the figure goes; shown interactively when omitted.
 
     Returns:
-        None: Generates and displays a bar plot.
+        Figure | Path | None: The figure or its file when rendered headless, None when displayed.
 
     Raises:
         KeyError: If required columns are missing from the data.
     """
+    import seaborn as sns
+    dataset = StudyDataset.wrap(data)
+    data = dataset.data
     required_columns = {"status", "responsive_state_SAA", "responsive_state_cortisol", "positive_image"}
     missing_columns = required_columns - set(data.columns)
     if missing_columns:
@@ -458,15 +482,15 @@ def plot_positive_images_responses(data: pd.DataFrame) -> None:
         raise KeyError(msg)
 
     # Split data based on group (HC vs NC)
-    hc_data = data[data["status"] == "HC"].copy()
-    nc_data = data[data["status"] == "NC"].copy()
+    hc_data = dataset.select(status="HC").copy()
+    nc_data = dataset.select(status="NC").copy()
 
     # Define responders and non-responders for both HC and NC
-    hc_data["saa_responders"] = np.where(hc_data["responsive_state_SAA"] == "responders", "SAA Responders", "SAA Nonresponders")
-    hc_data["cortisol_responders"] = np.where(hc_data["responsive_state_cortisol"] == "responders", "Cortisol Responders", "Cortisol Nonresponders")
+    hc_data["saa_responders"] = np.where(label_mask(hc_data, "responsive_state_SAA", "responders"), "SAA Responders", "SAA Nonresponders")
+    hc_data["cortisol_responders"] = np.where(label_mask(hc_data, "responsive_state_cortisol", "responders"), "Cortisol Responders", "Cortisol Nonresponders")
 
-    nc_data["saa_responders"] = np.where(nc_data["responsive_state_SAA"] == "responders", "SAA Responders", "SAA Nonresponders")
-    nc_data["cortisol_responders"] = np.where(nc_data["responsive_state_cortisol"] == "responders", "Cortisol Responders", "Cortisol Nonresponders")
+    nc_data["saa_responders"] = np.where(label_mask(nc_data, "responsive_state_SAA", "responders"), "SAA Responders", "SAA Nonresponders")
+    nc_data["cortisol_responders"] = np.where(label_mask(nc_data, "responsive_state_cortisol", "responders"), "Cortisol Responders", "Cortisol Nonresponders")
 
     # Combine data for plotting
     combined_data_saa = pd.concat([hc_data[["status", "saa_responders", "positive_image"]],
@@ -483,11 +507,65 @@ def plot_positive_images_responses(data: pd.DataFrame) -> None:
     merged_data = pd.concat([combined_data_saa, combined_data_cortisol])
 
     # Create a combined bar plot
-    plt.figure(figsize=(12, 8))
-    sns.barplot(data=merged_data, x="responders", y="positive_image", hue="status", errorbar=None, palette="muted", dodge=True)
-    plt.title("Memory for Positive Stimuli Based on SAA and Cortisol Responses (Combined)")
-    plt.ylabel("Average Memory for Positive Stimuli")
-    plt.xlabel("Responders vs Nonresponders")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+    renderer = renderer or Renderer()
+    fig = renderer.figure(figsize=(12, 8))
+    ax = fig.add_subplot()
+    sns.barplot(data=_category_means(merged_data, ["responders", "status"], "positive_image"), x="responders", y="positive_image", hue="status", errorbar=None, palette="muted", dodge=True, ax=ax)
+    ax.set_title("Memory for Positive Stimuli Based on SAA and Cortisol Responses (Combined)")
+    ax.set_ylabel("Average Memory for Positive Stimuli")
+    ax.set_xlabel("Responders vs Nonresponders")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    return renderer.finish(fig, "positive_images_responses")
+
+@traced
+def render_figures(jobs: list, renderer: Renderer, n_jobs: int | None = None) -> list:
+    """Renders independent figures in a pool of worker processes and collects them as image files.
+
+    Every job carries its precomputed data. Workers import matplotlib and seaborn and draw a
+    throwaway figure once when they start, so fonts and styles are loaded before the first job,
+    and then take jobs one at a time until all are done.
+
+    Parameters:
+        jobs (list): Tuples of (plot function, args) or (plot function, args, kwargs). The plot
+                     functions must be module-level functions of this module or another importable one.
+        renderer (Renderer): A headless renderer with an output directory.
+        n_jobs (int, optional): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        list: The files written by every job (a path, or a list of paths), in job order.
+
+    Raises:
+        ValueError: If the renderer does not write headless files, or 'n_jobs' is not positive.
+    """
+    if not renderer.headless or renderer.output_dir is None:
+        msg = "Error: render_figures needs a headless renderer with an output directory."
+        raise ValueError(msg)
+    n_jobs = n_jobs if n_jobs is not None else os.cpu_count() or 1
+    if n_jobs <= 0:
+        msg = "Error: 'n_jobs' must be positive."
+        raise ValueError(msg)
+
+    tasks = [(job[0], job[1], job[2] if len(job) > 2 else {}, renderer) for job in jobs]
+    if n_jobs == 1 or len(tasks) <= 1:
+        return [_render_job(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)), initializer=_start_render_worker) as pool:
+        return list(pool.map(_render_job, *zip(*tasks, strict=True)))
+
+def _start_render_worker() -> None:
+    """Load the plotting stack in a worker by drawing a throwaway figure."""
+    import matplotlib
+    import seaborn as sns
+    from matplotlib.figure import Figure
+    matplotlib.use("Agg")
+    figure = Figure(figsize=(1, 1))
+    sns.barplot(x=["a"], y=[1], ax=figure.add_subplot())
+    figure.savefig(io.BytesIO(), format="png")
+
+def _render_job(function: Callable, args: tuple, kwargs: dict, renderer: Renderer) -> Path | list:
+    """Render one figure job with the given renderer."""
+    return function(*args, **kwargs, renderer=renderer)
+
+def _category_means(data: pd.DataFrame, by: str | list, value: str) -> pd.DataFrame:
+    """Mean of `value` per category, in the order seaborn draws the categories of the full data."""
+    return data.groupby(by, sort=False, observed=True)[value].mean().reset_index()
@@ -0,0 +1,134 @@
+"""Module for keeping participant tables on disk as memory-mapped columns."""
+import json
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.objects.tracer import traced
+
+
+class ColumnStore:
+    """This class keeps a participant table on disk as one flat binary file per column.
+
+    The table is written chunk by chunk, so it never has to fit in memory, and is opened with
+    every column memory-mapped read-only: numeric columns as ``np.memmap`` arrays and label
+    columns as categoricals over memory-mapped codes. Pages are read from disk as they are
+    touched and can be dropped again by the operating system, so a table far larger than the
+    memory can be analyzed by functions reading it block by block (see `grouped_moments`).
+    Columns that are neither numeric nor categorical, such as the participant identifiers, are
+    not stored: as Python strings they alone would take more memory than all the measurements.
+
+    Attributes:
+        directory (Path): The directory holding the column files.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        """Initializes the store.
+
+        Args:
+            directory (str | Path): The directory holding the column files. Created when missing.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @traced
+    def write(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """Write a table chunk by chunk, replacing the stored one.
+
+        Args:
+            chunks (Iterable[pd.DataFrame]): The chunks of the table, with the same columns in the same order.
+
+        Returns:
+            int: Number of rows written.
+
+        Raises:
+            FileExistsError: If the directory holds other files but no stored table.
+            ValueError: If a chunk does not have the columns and types of the first one.
+        """
+        if not (self.directory / "meta.json").exists() and any(self.directory.iterdir()):
+            msg = f"Error: '{self.directory}' is not empty and holds no stored table."
+            raise FileExistsError(msg)
+        self.clear()
+        meta, handles, rows = None, [], 0
+        try:
+            for chunk in chunks:
+                if meta is None:
+                    meta = self._layout(chunk)
+                    handles = [(self.directory / f"{i}.bin").open("wb") for i in range(len(meta["columns"]))]
+                for i, column in enumerate(meta["columns"]):
+                    if column not in chunk.columns:
+                        msg = f"Error: column '{column}' is missing in a chunk."
+                        raise ValueError(msg)
+                    series = chunk[column]
+                    if column in meta["categories"]:
+                        if not isinstance(series.dtype, pd.CategoricalDtype) or list(series.cat.categories) != meta["categories"][column]:
+                            msg = f"Error: the categories of column '{column}' changed between chunks."
+                            raise ValueError(msg)
+                        values = series.cat.codes.to_numpy()
+                    else:
+                        values = series.to_numpy(dtype=meta["dtypes"][i])
+                    values.astype(meta["dtypes"][i], copy=False).tofile(handles[i])
+                rows += len(chunk)
+        except BaseException:
+            for handle in handles:
+                handle.close()
+                Path(handle.name).unlink(missing_ok=True)
+            raise
+        for handle in handles:
+            handle.close()
+        if meta is not None:
+            (self.directory / "meta.json").write_text(json.dumps(meta | {"rows": rows}))
+        return rows
+
+    def open(self) -> pd.DataFrame:
+        """Open the stored table with memory-mapped columns.
+
+        Returns:
+            pd.DataFrame: The table; its columns are read-only views of the files.
+
+        Raises:
+            FileNotFoundError: If no table is stored.
+        """
+        meta_path = self.directory / "meta.json"
+        if not meta_path.exists():
+            msg = "Error: no table is stored in this directory."
+            raise FileNotFoundError(msg)
+        meta = json.loads(meta_path.read_text())
+        columns = {}
+        for i, (column, dtype) in enumerate(zip(meta["columns"], meta["dtypes"], strict=True)):
+            path = self.directory / f"{i}.bin"
+            values = np.memmap(path, dtype=dtype, mode="r", shape=(meta["rows"],)) if meta["rows"] else np.empty(0, dtype=dtype)
+            categories = meta["categories"].get(column)
+            if categories is not None:
+                columns[column] = pd.Categorical.from_codes(values, categories=categories, validate=False)
+            else:
+                columns[column] = values
+        return pd.DataFrame(columns, copy=False)
+
+    def clear(self) -> None:
+        """Remove the stored table: the column files listed in its metadata, then the metadata. Other files are kept."""
+        meta_path = self.directory / "meta.json"
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text())
+        for i in range(len(meta["columns"])):
+            (self.directory / f"{i}.bin").unlink(missing_ok=True)
+        meta_path.unlink()
+
+    @staticmethod
+    def _layout(chunk: pd.DataFrame) -> dict:
+        """The stored columns of a table, their file types and the categories of its label columns."""
+        columns, dtypes, categories = [], [], {}
+        for column in chunk.columns:
+            series = chunk[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                categories[column] = list(series.cat.categories)
+                dtypes.append(series.cat.codes.dtype.str)
+            elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                dtypes.append(np.dtype(series.dtype).str)
+            else:
+                continue
+            columns.append(column)
+        return {"columns": columns, "dtypes": dtypes, "categories": categories}
@@ -0,0 +1,163 @@
+"""Module for caching augmented datasets on disk between runs."""
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Bump when the stored layout changes, so old entries stop matching (changes of the generator code are keyed by source_digest)
+CACHE_VERSION = 1
+
+# Default location of the cache, overridable through the environment
+CACHE_DIR = Path(os.environ.get("FINALPROJECT_CACHE_DIR", Path.home() / ".cache" / "finalproject"))
+
+# The project's source package; its code is part of the keys of cached results
+SOURCE_DIR = Path(__file__).resolve().parents[1]
+
+
+class DatasetCache:
+    """This class keeps augmented datasets on disk as one ``.npy`` file per column.
+
+    Entries are keyed by a hash of the source file, the generator parameters, the seed and the
+    source code of the package (so a change of the generator regenerates them), are
+    memory-mapped when loaded, and the least recently used entries are evicted once the cache
+    grows beyond its size limit.
+
+    Attributes:
+        directory (Path): The directory holding the cache entries.
+        max_bytes (int): Size limit of all entries together.
+    """
+
+    def __init__(self, directory: str | Path = CACHE_DIR, max_bytes: int = 2 * 1024 ** 3) -> None:
+        """Initializes the cache.
+
+        Args:
+            directory (str | Path): The directory holding the cache entries. Created when missing.
+            max_bytes (int): Size limit of all entries together. Default is 2 GiB.
+
+        Raises:
+            ValueError: If 'max_bytes' is not positive.
+        """
+        if max_bytes <= 0:
+            msg = "Error: 'max_bytes' must be positive."
+            raise ValueError(msg)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key(self, source: str | Path, **params: object) -> str:
+        """Compute the cache key of a source file and the parameters used to augment it.
+
+        Args:
+            source (str | Path): Path of the source CSV.
+            **params: Generator parameters and seed; must be JSON serializable.
+
+        Returns:
+            str: A hexadecimal digest identifying the augmented dataset.
+        """
+        digest = hashlib.sha256()
+        with Path(source).open("rb") as handle:
+            for block in iter(lambda: handle.read(1024 ** 2), b""):
+                digest.update(block)
+        digest.update(json.dumps({"version": CACHE_VERSION, "source": source_digest(), **params}, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> pd.DataFrame | None:
+        """Load a cached dataset.
+
+        Args:
+            key (str): The cache key of the dataset.
+
+        Returns:
+            pd.DataFrame | None: The dataset with memory-mapped columns, or None when it is not cached.
+        """
+        entry = self.directory / key
+        meta_path = entry / "meta.json"
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        os.utime(meta_path)  # Mark as recently used
+
+        columns = {}
+        for i, column in enumerate(meta["columns"]):
+            # Copy-on-write mapping: pages are read lazily and writes never reach the file
+            values = np.load(entry / f"{i}.npy", mmap_mode="c")
+            categories = meta["categories"].get(column)
+            if categories is not None:
+                columns[column] = pd.Categorical.from_codes(values, categories=categories)
+            elif values.dtype.kind == "U":
+                columns[column] = values.astype(object)
+            else:
+                columns[column] = values
+        return pd.DataFrame(columns, copy=False)
+
+    def store(self, key: str, data: pd.DataFrame) -> None:
+        """Store a dataset, then evict old entries beyond the size limit.
+
+        Args:
+            key (str): The cache key of the dataset.
+            data (pd.DataFrame): The dataset to store.
+        """
+        staging = Path(tempfile.mkdtemp(dir=self.directory, prefix=".staging-"))
+        try:
+            categories = {}
+            for i, column in enumerate(data.columns):
+                series = data[column]
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    categories[column] = list(series.cat.categories)
+                    values = series.cat.codes.to_numpy()
+                elif pd.api.types.is_numeric_dtype(series):
+                    values = series.to_numpy()
+                else:
+                    values = series.to_numpy(dtype=str)
+                np.save(staging / f"{i}.npy", values)
+            meta = {"columns": list(data.columns), "categories": categories}
+            (staging / "meta.json").write_text(json.dumps(meta))
+            staging.replace(self.directory / key)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits its size limit."""
+        entries = []
+        for entry in self.directory.iterdir():
+            meta_path = entry / "meta.json"
+            if entry.name.startswith(".") or not meta_path.exists():
+                continue
+            size = sum(path.stat().st_size for path in entry.iterdir())
+            entries.append((meta_path.stat().st_mtime_ns, size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        """Remove every entry of the cache."""
+        for entry in self.directory.iterdir():
+            shutil.rmtree(entry, ignore_errors=True)
+
+@functools.cache
+def source_digest() -> str:
+    """Digest of the source code of the project's package, read once per process.
+
+    Cached results keyed by it are recomputed after any change of the code, including the helpers
+    the cached functions call in other modules.
+
+    Returns:
+        str: A hexadecimal digest of the paths and contents of every Python file of the package.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(SOURCE_DIR.rglob("*.py")):
+        digest.update(path.relative_to(SOURCE_DIR).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
@@ -1,13 +1,167 @@
-"""Module for demonstrating how to handle system-level operations."""
-import sys
+"""Module for loading the participant dataset and augmenting it with synthetic data."""
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
 
 import numpy as np
 import pandas as pd
 
-sys.path.append(r"C:/Users/matan/OneDrive/שולחן העבודה/python/project/src")
-sys.path.append(r"C:/Users/matan/OneDrive/שולחן העבודה/python/project/src/objects")
-sys.path.append(r"C:/Users/matan/OneDrive/שולחן העבודה/python/project/src/functions")
-from functions.general import generate_numbers_with_stats, split_list
+from src.functions.general import LABEL_CATEGORIES, augment_with_cohorts, encode_labels
+from src.objects.column_store import ColumnStore
+from src.objects.dataset_cache import DatasetCache
+from src.objects.tracer import traced
+
+# Participant table shipped with the project
+DATA_PATH = Path(__file__).resolve().parents[2] / "originalDataSet.csv"
+
+# Synthetic columns in the order they are added to the dataset
+SYNTHETIC_COLUMNS = [
+    "age", "BMI", "sAA_level_baseline", "change_image_sAA_level",
+    "cortisol_level_baseline", "change_CPS_cortisol_level", "positive_image", "negative_image",
+]
+
+# One row per synthetic cohort, in generation order (keeps the seeded data stable).
+# A label left as None matches every participant; 'n' is the cohort size before scaling.
+COHORT_SPEC = pd.DataFrame(
+    [
+        ("age", None, None, None, None, 78, 20.37, 2.37, 18, 35),
+        ("BMI", "HC", None, None, None, 36, 22.15, 3.98, 13, 33),
+        ("BMI", "NC", None, None, None, 42, 21.78, 2.71, 13, 33),
+        ("change_image_sAA_level", "HC", "responders", None, None, 17, 33.5, 10, 10, 50),
+        ("change_image_sAA_level", "NC", "responders", None, None, 22, 55, 15, 30, 68),
+        ("change_image_sAA_level", "HC", "non-responders", None, None, 19, -45, 8, -50, -40),
+        ("change_image_sAA_level", "NC", "non-responders", None, None, 20, -17, 4, -22, -15),
+        ("sAA_level_baseline", "HC", "responders", None, None, 17, 70, 10, 60, 80),
+        ("sAA_level_baseline", "NC", "responders", None, None, 22, 135, 10, 125, 145),
+        ("sAA_level_baseline", "HC", "non-responders", None, None, 19, 175, 10, 165, 185),
+        ("sAA_level_baseline", "NC", "non-responders", None, None, 20, 120, 10, 110, 130),
+        ("change_CPS_cortisol_level", "HC", None, "responders", None, 9, 0.2, 0.1, 0, 0.4),
+        ("change_CPS_cortisol_level", "NC", None, "responders", None, 17, 0.25, 0.15, 0, 0.4),
+        ("change_CPS_cortisol_level", "HC", None, "non-responders", None, 14, -0.03, 0.05, -0.08, 0),
+        ("change_CPS_cortisol_level", "NC", None, "non-responders", None, 7, -0.007, 0.005, -0.08, 0),
+        ("cortisol_level_baseline", "HC", None, "responders", None, 9, 0.075, 0.05, 0, 0.3),
+        ("cortisol_level_baseline", "NC", None, "responders", None, 17, 0.135, 0.08, 0, 0.3),
+        ("cortisol_level_baseline", "HC", None, "non-responders", None, 14, 0.23, 0.2, 0, 0.3),
+        ("cortisol_level_baseline", "NC", None, "non-responders", None, 7, 0.123, 0.105, 0, 0.3),
+        ("cortisol_level_baseline", "NC", None, "control-non-responders", None, 18, 0.123, 0.05, 0, 0.3),
+        ("cortisol_level_baseline", "HC", None, "control-non-responders", None, 13, 0.23, 0.15, 0, 0.3),
+        ("change_CPS_cortisol_level", "NC", None, "control-non-responders", None, 18, -0.007, 0.1, -0.08, 0),
+        ("change_CPS_cortisol_level", "HC", None, "control-non-responders", None, 13, -0.03, 0.1, -0.08, 0),
+        ("positive_image", "HC", "responders", None, "cps", 10, 2.8, 0.1, 2.7, 2.8),
+        ("positive_image", "NC", "responders", None, "cps", 12, 2.6, 0.1, 2.5, 2.7),
+        ("positive_image", "HC", "responders", None, "control", 7, 1.2, 0.05, 1.15, 1.25),
+        ("positive_image", "NC", "responders", None, "control", 10, 2.2, 0.1, 2.1, 2.3),
+        ("positive_image", "HC", "non-responders", None, "cps", 13, 3.4, 0.03, 3.37, 3.43),
+        ("positive_image", "NC", "non-responders", None, "cps", 12, 2.7, 0.15, 2.55, 2.85),
+        ("positive_image", "HC", "non-responders", None, "control", 6, 1.05, 0.1, 0.95, 1.15),
+        ("positive_image", "NC", "non-responders", None, "control", 8, 2.9, 0.1, 2.8, 3),
+        ("negative_image", "HC", "responders", None, "cps", 10, 2.9, 0.15, 2.75, 3.05),
+        ("negative_image", "NC", "responders", None, "cps", 12, 3.4, 0.08, 3.32, 3.48),
+        ("negative_image", "HC", "responders", None, "control", 7, 4.7, 0.02, 4.68, 4.72),
+        ("negative_image", "NC", "responders", None, "control", 10, 3.2, 0.1, 3.1, 3.3),
+        ("negative_image", "HC", "non-responders", None, "cps", 13, 4, 0.3, 3.7, 4.3),
+        ("negative_image", "NC", "non-responders", None, "cps", 12, 3.2, 0.15, 3.05, 3.35),
+        ("negative_image", "HC", "non-responders", None, "control", 6, 3, 0.2, 2.8, 3.2),
+        ("negative_image", "NC", "non-responders", None, "control", 8, 2.9, 0.1, 2.8, 3),
+    ],
+    columns=["column", "status", "responsive_state_SAA", "responsive_state_cortisol", "stress_test_condition",
+             "n", "mean", "std", "min", "max"],
+)
+
+# Explicit read schema; the measurement columns only exist in already augmented exports
+PARTICIPANT_DTYPES = {column: "category" for column in LABEL_CATEGORIES} | dict.fromkeys(SYNTHETIC_COLUMNS, "float64")
+
+
+@traced
+def read_participants(source: str | Path | IO = DATA_PATH, chunksize: int | None = None) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """Read a participant CSV with an explicit schema.
+
+    Args:
+        source (str | Path | IO): Path or file-like object of the CSV. Defaults to the bundled dataset.
+        chunksize (int, optional): When given, return an iterator of typed chunks of this many rows.
+
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: The typed table, or an iterator over its typed chunks.
+
+    Raises:
+        FileNotFoundError: If the CSV file is not found.
+        ValueError: If the file is empty or its format is invalid.
+        PermissionError: If reading the file is not permitted.
+        RuntimeError: For other general errors while loading the file.
+    """
+    try:
+        reader = pd.read_csv(source, dtype=PARTICIPANT_DTYPES, chunksize=chunksize)
+    except FileNotFoundError as err:
+        msg = "Error: File not found. Check the path."
+        raise FileNotFoundError(msg) from err
+    except pd.errors.EmptyDataError as err:
+        msg = "Error: The file is empty."
+        raise ValueError(msg) from err
+    except pd.errors.ParserError as err:
+        msg = "Error: There was a problem with the file format."
+        raise ValueError(msg) from err
+    except PermissionError as err:
+        msg = "Error: Permission to read file denied."
+        raise PermissionError(msg) from err
+    except Exception as e:
+        msg = f"General error: {e}"
+        raise RuntimeError(msg) from e
+
+    if chunksize is None:
+        return encode_labels(reader)
+    return _typed_chunks(reader)
+
+def _typed_chunks(reader: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Apply the participant schema to every chunk of a CSV reader."""
+    try:
+        for chunk in reader:
+            yield encode_labels(chunk)
+    except pd.errors.ParserError as err:
+        msg = "Error: There was a problem with the file format."
+        raise ValueError(msg) from err
+
+def iter_augmented_chunks(source: str | Path | IO = DATA_PATH, chunksize: int = 100_000, scale: int = 1) -> Iterator[pd.DataFrame]:
+    """Read and augment a participant CSV chunk by chunk.
+
+    Every chunk gets its own cohorts, sized by the participants it contains, so only one chunk
+    is held in memory at a time. Seed the global random state beforehand for reproducible output.
+
+    Args:
+        source (str | Path | IO): Path or file-like object of the CSV. Defaults to the bundled dataset.
+        chunksize (int): Number of participants read per chunk. Default is 100,000.
+        scale (int): Number of synthetic participants generated for every participant in the file.
+
+    Yields:
+        pd.DataFrame: The augmented chunks, in file order.
+    """
+    emitted = 0
+    for chunk in read_participants(source, chunksize):
+        augmented = augment_with_cohorts(chunk, COHORT_SPEC, scale, SYNTHETIC_COLUMNS, match_sizes=True)
+        if scale > 1 and "humans" in augmented.columns:
+            augmented["humans"] = "human" + pd.Series(np.arange(emitted + 1, emitted + len(augmented) + 1)).astype(str)
+        emitted += len(augmented)
+        yield augmented
+
+@traced
+def augment_csv(source: str | Path | IO, destination: str | Path | IO, chunksize: int = 100_000, scale: int = 1, seed: int = 42) -> int:
+    """Stream a participant CSV through the augmentation into a new CSV within a fixed memory budget.
+
+    Args:
+        source (str | Path | IO): Path or file-like object of the input CSV.
+        destination (str | Path | IO): Path or file-like object of the output CSV.
+        chunksize (int): Number of participants read per chunk. Default is 100,000.
+        scale (int): Number of synthetic participants generated for every participant in the file.
+        seed (int): Seed of the synthetic data. Default is 42.
+
+    Returns:
+        int: Number of participants written.
+    """
+    np.random.seed(seed)
+    written = 0
+    for chunk in iter_augmented_chunks(source, chunksize, scale):
+        chunk.to_csv(destination, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += len(chunk)
+    return written
 
 
 class InitializeFile:
@@ -19,105 +173,74 @@ class InitializeFile:
         file (pd.DataFrame): The processed dataset.
     """
 
-    def __init__(self) -> None:
+    @traced
+    def __init__(self, path: str | Path | IO = DATA_PATH, scale: int = 1, chunksize: int | None = None,
+                 seed: int = 42, cache: DatasetCache | None = None, store: ColumnStore | None = None) -> None:
         """Initializes the class by loading a dataset and augmenting it with synthetic data.
 
         Steps:
-            1. Load the dataset from a CSV file.
-            2. Generate synthetic data based on specified parameters.
+            1. Load the dataset from a CSV file with the participant schema.
+            2. Generate synthetic data for every cohort of `COHORT_SPEC` in one vectorized pass.
             3. Add new columns to the dataset.
 
+        Args:
+            path (str | Path | IO): Path or file-like object of the CSV. Defaults to the bundled dataset.
+            scale (int): Number of synthetic participants generated for every participant in the file.
+            chunksize (int, optional): When given, load and augment the file chunk by chunk, sizing the
+                cohorts of every chunk by the participants it contains.
+            seed (int): Seed of the synthetic data. Default is 42.
+            cache (DatasetCache, optional): When given, reuse the augmented dataset cached for the same
+                file, parameters and seed, or cache it after generating it. Only used for file paths.
+            store (ColumnStore, optional): When given, stream the augmented chunks (of `chunksize` rows,
+                100,000 by default) into the store and memory-map the file from it instead of holding it in
+                memory. The participant identifiers are not kept. Takes precedence over `cache`.
+
         Raises:
             FileNotFoundError: If the CSV file is not found.
-            pd.errors.EmptyDataError: If the CSV file is empty.
-            pd.errors.ParserError: If the file format is invalid.
-            Exception: For other general errors while loading the file.
-            ValueError: If the generated synthetic data lengths do not match the dataset.
-            Exception: For general errors during column addition.
+            ValueError: If the CSV file is empty or its format is invalid.
+            PermissionError: If reading the file is not permitted.
+            RuntimeError: For other general errors while loading the file or adding the columns.
         """
-        try:
-            file = pd.read_csv(r"C:\Users\matan\OneDrive\מסמכים\data set.csv")
+        if store is not None:
+            np.random.seed(seed)
+            store.write(iter_augmented_chunks(path, chunksize or 100_000, scale))
+            self.file = store.open()
             print("File uploaded successfully!")
-        except FileNotFoundError as err:
-            msg = "Error: File not found. Check the path."
-            raise FileNotFoundError(msg) from err
-        except pd.errors.EmptyDataError as err:
-            msg = "Error: The file is empty."
-            raise ValueError(msg) from err
-        except pd.errors.ParserError as err:
-            msg = "Error: There was a problem with the file format."
-            raise ValueError(msg) from err
-        except PermissionError as err:
-            msg = "Error: Permission to read file denied."
-            raise PermissionError(msg) from err
-        except Exception as e:
-            msg = f"General error: {e}"
-            raise RuntimeError(msg) from e
+            print("Columns added successfully!")
+            return
+
+        key = None
+        if cache is not None and isinstance(path, str | Path):
+            key = cache.key(path, spec=COHORT_SPEC.to_json(), scale=scale, chunksize=chunksize, seed=seed)
+            cached = cache.load(key)
+            if cached is not None:
+                self.file = cached
+                print("File loaded from cache!")
+                return
+
+        if chunksize is not None:
+            np.random.seed(seed)
+            self.file = pd.concat(iter_augmented_chunks(path, chunksize, scale), ignore_index=True)
+            print("File uploaded successfully!")
+            print("Columns added successfully!")
+        else:
+            file = read_participants(path)
+            print("File uploaded successfully!")
+            self.file = self._augment(file, scale, seed)
 
+        if key is not None:
+            cache.store(key, self.file)
+
+    @staticmethod
+    @traced
+    def _augment(file: pd.DataFrame, scale: int, seed: int) -> pd.DataFrame:
+        """Add the synthetic columns of `COHORT_SPEC` to a loaded participant table."""
         # Generate numbers
         # Partially based on means and standard deviation based on data extraction from graphs
-        np.random.seed(42)  # In order to get the same data every run
-        age = generate_numbers_with_stats(78, 20.37, 2.37, 18, 35)
-        bmi_hc = generate_numbers_with_stats(36, 22.15, 3.98, 13, 33)
-        bmi_nc = generate_numbers_with_stats(42, 21.78, 2.71, 13, 33)
-        responders_images_saa_level_hc = generate_numbers_with_stats(17, 33.5, 10, 10, 50)
-        responders_images_saa_level_nc = generate_numbers_with_stats(22, 55, 15, 30, 68)
-        nonresponders_images_saa_level_hc = generate_numbers_with_stats(19, -45, 8, -50, -40)
-        nonresponders_images_saa_level_nc = generate_numbers_with_stats(20, -17, 4, -22, -15)
-        responders_images_saa_level_hc_baseline = generate_numbers_with_stats(17, 70, 10, 60, 80)
-        responders_images_saa_level_nc_baseline = generate_numbers_with_stats(22, 135, 10, 125, 145)
-        nonresponders_images_saa_level_hc_baseline = generate_numbers_with_stats(19, 175, 10, 165, 185)
-        nonresponders_images_saa_level_nc_baseline = generate_numbers_with_stats(20, 120, 10, 110, 130)
-        responders_cps_corisol_level_hc = generate_numbers_with_stats(9 , 0.2, 0.1, 0, 0.4)
-        responders_cps_cortisol_level_nc = generate_numbers_with_stats(17, 0.25, 0.15, 0, 0.4)
-        nonresponders_cps_cortisol_level_hc = generate_numbers_with_stats(14 , -0.03, 0.05, -0.08, 0)
-        nonresponders_cps_cortisol_level_nc = generate_numbers_with_stats(7 , -0.007, 0.005, -0.08, 0)
-        responders_cps_corisol_level_hc_baseline = generate_numbers_with_stats(9 , 0.075, 0.05, 0, 0.3)
-        responders_cps_cortisol_level_nc_baseline = generate_numbers_with_stats(17 , 0.135, 0.08, 0, 0.3)
-        nonresponders_cps_cortisol_level_hc_baseline = generate_numbers_with_stats(14 , 0.23, 0.2, 0, 0.3)
-        nonresponders_cps_cortisol_level_nc_baseline = generate_numbers_with_stats(7 , 0.123, 0.105, 0, 0.3)
-        control_nonresponders_cortisol_nc_baseline = generate_numbers_with_stats(18, 0.123, 0.05, 0, 0.3)
-        control_nonresponders_cortisol_hc_baseline = generate_numbers_with_stats(13, 0.23, 0.15, 0, 0.3)
-        control_nonresponders_cortisol_nc = generate_numbers_with_stats(18, -0.007, 0.1, -0.08, 0)
-        control_nonresponders_cortisol_hc = generate_numbers_with_stats(13, -0.03,0.1,-0.08, 0)
-        responders_positive_image_cps_hc = generate_numbers_with_stats(10 , 2.8, 0.1, 2.7, 2.8)
-        responders_positive_image_cps_nc = generate_numbers_with_stats(12 , 2.6, 0.1, 2.5, 2.7)
-        responders_positive_image_control_hc = generate_numbers_with_stats(7 , 1.2, 0.05, 1.15, 1.25)
-        responders_positive_image_control_nc = generate_numbers_with_stats(10 , 2.2, 0.1, 2.1, 2.3)
-        nonresponders_positive_image_cps_hc = generate_numbers_with_stats(13 , 3.4, 0.03, 3.37, 3.43)
-        nonresponders_positive_image_cps_nc = generate_numbers_with_stats(12 , 2.7, 0.15, 2.55, 2.85)
-        nonresponders_positive_image_control_hc = generate_numbers_with_stats(6 , 1.05, 0.1, 0.95, 1.15)
-        nonresponders_positive_image_control_nc = generate_numbers_with_stats(8 , 2.9, 0.1, 2.8, 3)
-        responders_negative_image_cps_hc = generate_numbers_with_stats(10 , 2.9, 0.15, 2.75, 3.05)
-        responders_negative_image_cps_nc = generate_numbers_with_stats(12 , 3.4, 0.08, 3.32, 3.48)
-        responders_negative_image_control_hc = generate_numbers_with_stats(7, 4.7, 0.02, 4.68, 4.72)
-        responders_negative_image_control_nc = generate_numbers_with_stats(10, 3.2, 0.1, 3.1, 3.3)
-        nonresponders_negative_image_cps_hc = generate_numbers_with_stats(13 , 4, 0.3, 3.7, 4.3)
-        nonresponders_negative_image_cps_nc = generate_numbers_with_stats(12 , 3.2, 0.15, 3.05, 3.35)
-        nonresponders_negative_image_control_hc = generate_numbers_with_stats(6 , 3, 0.2, 2.8, 3.2)
-        nonresponders_negative_image_control_nc = generate_numbers_with_stats(8 , 2.9, 0.1, 2.8, 3)
-
-        # Split lists
-        part_one_responders_cps_cortisol_level_nc_baseline , part_two_responders_cps_cortisol_level_nc_baseline = split_list(responders_cps_cortisol_level_nc_baseline, 12)
-        part_one_nonresponders_cps_cortisol_level_hc_baseline , part_two_nonresponders_cps_cortisol_level_hc_baseline = split_list(nonresponders_cps_cortisol_level_hc_baseline, 1)
-        part_one_responders_cps_cortisol_level_nc , part_two_responders_cps_cortisol_level_nc = split_list(responders_cps_cortisol_level_nc, 12)
-        part_one_nonresponders_cps_cortisol_level_hc , part_two_nonresponders_cps_cortisol_level_hc = split_list(nonresponders_cps_cortisol_level_hc, 1)
-        part_one_control_nonresponders_cortisol_level_hc, part_two_control_nonresponders_cortisol_level_hc = split_list(control_nonresponders_cortisol_hc, 7)
-        part_one_control_nonresponders_cortisol_level_nc, part_two_control_nonresponders_cortisol_level_nc = split_list(control_nonresponders_cortisol_nc, 10)
-        part_one_control_nonresponders_cortisol_level_hc_baseline, part_two_control_nonresponders_cortisol_level_hc_baseline = split_list(control_nonresponders_cortisol_hc_baseline, 7)
-        part_one_control_nonresponders_cortisol_level_nc_baseline, part_two_control_nonresponders_cortisol_level_nc_baseline = split_list(control_nonresponders_cortisol_nc_baseline, 10)
-
+        np.random.seed(seed)  # In order to get the same data every run
         try:
             # Augment the dataset
-            file["age"] = age
-            file["BMI"] = bmi_nc + bmi_hc
-            file["sAA_level_baseline"] = responders_images_saa_level_nc_baseline + nonresponders_images_saa_level_nc_baseline + responders_images_saa_level_hc_baseline + nonresponders_images_saa_level_hc_baseline
-            file["change_image_sAA_level"] = responders_images_saa_level_nc + nonresponders_images_saa_level_nc + responders_images_saa_level_hc + nonresponders_images_saa_level_hc
-            file["cortisol_level_baseline"] = part_one_responders_cps_cortisol_level_nc_baseline+ part_one_control_nonresponders_cortisol_level_nc_baseline+ part_two_responders_cps_cortisol_level_nc_baseline + nonresponders_cps_cortisol_level_nc_baseline + part_two_control_nonresponders_cortisol_level_nc_baseline + responders_cps_corisol_level_hc_baseline + part_one_nonresponders_cps_cortisol_level_hc_baseline + part_one_control_nonresponders_cortisol_level_hc_baseline + part_two_nonresponders_cps_cortisol_level_hc_baseline + part_two_control_nonresponders_cortisol_level_hc_baseline
-            file["change_CPS_cortisol_level"] =  part_one_responders_cps_cortisol_level_nc+ part_one_control_nonresponders_cortisol_level_nc+ part_two_responders_cps_cortisol_level_nc + nonresponders_cps_cortisol_level_nc + part_two_control_nonresponders_cortisol_level_nc + responders_cps_corisol_level_hc + part_one_nonresponders_cps_cortisol_level_hc + part_one_control_nonresponders_cortisol_level_hc + part_two_nonresponders_cps_cortisol_level_hc + part_two_control_nonresponders_cortisol_level_hc
-            file["positive_image"] = responders_positive_image_cps_nc + responders_positive_image_control_nc + nonresponders_positive_image_cps_nc + nonresponders_positive_image_control_nc + responders_positive_image_cps_hc + responders_positive_image_control_hc + nonresponders_positive_image_cps_hc + nonresponders_positive_image_control_hc
-            file["negative_image"] = responders_negative_image_cps_nc + responders_negative_image_control_nc + nonresponders_negative_image_cps_nc + nonresponders_negative_image_control_nc + responders_negative_image_cps_hc + responders_negative_image_control_hc + nonresponders_negative_image_cps_hc + nonresponders_negative_image_control_hc
-            self.file = file
+            augmented = augment_with_cohorts(file, COHORT_SPEC, scale, SYNTHETIC_COLUMNS)
             print("Columns added successfully!")
         except PermissionError as err:
             msg = "Error: Permission to write into the file denied."
@@ -125,3 +248,5 @@ class InitializeFile:
         except Exception as e:
             msg = f"Error while adding columns: {e}"
             raise RuntimeError(msg) from e
+        else:
+            return augmented
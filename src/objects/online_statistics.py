@@ -0,0 +1,318 @@
+"""Module for updating the study's statistics incrementally as participants are enrolled."""
+import numpy as np
+import pandas as pd
+
+from src.functions.calculate import chi_square, merge_moments, moments_anova, moments_cohens_d
+from src.functions.general import CORTISOL_RESPONDER_DEFINITION, build_contingency_table
+
+
+class GroupMoments:
+    """This class accumulates the count, mean, variance, minimum and maximum of a measurement per group.
+
+    Every appended batch is reduced to per-group moments with a few vectorized reductions and
+    folded into the running ones with the parallel form of Welford's algorithm (`merge_moments`), so
+    the variance stays accurate however many batches are added. Accumulators built on separate
+    shards of the participants merge into the accumulator of all of them. Missing measurements
+    and participants without a group are skipped.
+
+    Attributes:
+        value_column (str): The measurement column.
+        group_columns (list): The columns whose combination of labels forms a group (a cell).
+        groups (list): The labels of the groups seen so far, a tuple per group for several columns.
+        count (np.ndarray): Number of measurements of every group.
+        mean (np.ndarray): Mean of every group.
+        m2 (np.ndarray): Sum of squared deviations from the mean of every group.
+        min (np.ndarray): Minimum of every group.
+        max (np.ndarray): Maximum of every group.
+    """
+
+    def __init__(self, value_column: str, group_columns: str | list) -> None:
+        """Initializes empty accumulators.
+
+        Args:
+            value_column (str): The measurement column, e.g. 'change_image_sAA_level'.
+            group_columns (str | list): The group column, e.g. 'status', or several columns forming cells.
+        """
+        self.value_column = value_column
+        self.group_columns = [group_columns] if isinstance(group_columns, str) else list(group_columns)
+        self.groups = []
+        self._index = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+
+    def update(self, data: pd.DataFrame) -> "GroupMoments":
+        """Add a batch of participants.
+
+        Args:
+            data (pd.DataFrame): The new rows, holding the measurement and group columns.
+
+        Returns:
+            GroupMoments: The updated accumulators.
+
+        Raises:
+            KeyError: If a required column is missing in the batch.
+        """
+        missing_columns = [column for column in [self.value_column, *self.group_columns] if column not in data.columns]
+        if missing_columns:
+            msg = f"Missing required columns: {', '.join(missing_columns)}"
+            raise KeyError(msg)
+        if len(self.group_columns) == 1:
+            codes, labels = pd.factorize(data[self.group_columns[0]])
+        else:
+            codes, labels = pd.MultiIndex.from_frame(data[self.group_columns]).factorize()
+            codes[data[self.group_columns].isna().any(axis=1).to_numpy()] = -1
+        values = data[self.value_column].to_numpy(dtype=np.float64)
+        keep = (codes >= 0) & ~np.isnan(values)
+        codes, values = codes[keep], values[keep]
+
+        # Moments of the batch, per group
+        k = len(labels)
+        count = np.bincount(codes, minlength=k)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(codes, values, minlength=k) / count
+        m2 = np.bincount(codes, (values - mean[codes]) ** 2, minlength=k)
+        minimum, maximum = np.full(k, np.inf), np.full(k, -np.inf)
+        np.minimum.at(minimum, codes, values)
+        np.maximum.at(maximum, codes, values)
+        present = count > 0
+        self._combine([labels[i] for i in np.flatnonzero(present)], count[present], mean[present], m2[present], minimum[present], maximum[present])
+        return self
+
+    def merge(self, other: "GroupMoments") -> "GroupMoments":
+        """Fold the accumulators of another shard of participants into these ones.
+
+        Args:
+            other (GroupMoments): Accumulators of the same measurement and groups.
+
+        Returns:
+            GroupMoments: The merged accumulators.
+
+        Raises:
+            ValueError: If the accumulators track another measurement or other groups.
+        """
+        if (other.value_column, other.group_columns) != (self.value_column, self.group_columns):
+            msg = "Error: only accumulators of the same measurement and groups can be merged."
+            raise ValueError(msg)
+        self._combine(other.groups, other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def summary(self) -> dict:
+        """Count, mean, standard deviation, minimum and maximum of every group.
+
+        Returns:
+            dict: The statistics of every group by label, as the 'summary_statistics' of `analyze_saa_response`.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / (self.count - 1))
+        return {label: {"count": int(self.count[i]), "mean": float(self.mean[i]), "std": float(std[i]),
+                        "min": float(self.min[i]), "max": float(self.max[i])} for i, label in enumerate(self.groups)}
+
+    def anova(self, groups: list | None = None) -> dict:
+        """One-way ANOVA of the measurement between groups, from their moments alone.
+
+        Args:
+            groups (list, optional): Labels of the compared groups. Default is every group.
+
+        Returns:
+            dict: The F statistic ('f_statistic') and p-value ('p_value'), as `f_oneway`.
+
+        Raises:
+            ValueError: If fewer than two groups are compared or a group is unknown.
+        """
+        rows = self._rows(groups)
+        if len(rows) < 2:
+            msg = "Error: the ANOVA needs at least two groups."
+            raise ValueError(msg)
+        f_statistic, p_value, _, _ = moments_anova(self.count[rows], self.mean[rows], self.m2[rows])
+        return {"f_statistic": float(f_statistic), "p_value": float(p_value)}
+
+    def cohens_d(self, group1: object, group2: object) -> float:
+        """Cohen's d of two groups, as `calculate_effect_size`, from their moments alone.
+
+        Args:
+            group1 (object): Label of the first group, e.g. 'HC'.
+            group2 (object): Label of the second group, e.g. 'NC'.
+
+        Returns:
+            float: Cohen's d effect size.
+
+        Raises:
+            ZeroDivisionError: If the pooled standard deviation is zero or undefined.
+        """
+        rows = self._rows([group1, group2])
+        return float(moments_cohens_d(self.count[rows], self.mean[rows], self.m2[rows]))
+
+    def _rows(self, groups: list | None) -> list:
+        """Positions of the given group labels in the accumulators (every group when None)."""
+        if groups is None:
+            return list(range(len(self.groups)))
+        unknown = [group for group in groups if group not in self._index]
+        if unknown:
+            msg = f"Error: unknown groups: {', '.join(map(str, unknown))}."
+            raise ValueError(msg)
+        return [self._index[group] for group in groups]
+
+    def _combine(self, labels: list, count: np.ndarray, mean: np.ndarray, m2: np.ndarray, minimum: np.ndarray, maximum: np.ndarray) -> None:
+        """Fold per-group moments into the accumulators, adding the groups not seen yet."""
+        new = [label for label in dict.fromkeys(labels) if label not in self._index]
+        if new:
+            self._index.update({label: len(self.groups) + i for i, label in enumerate(new)})
+            self.groups += new
+            self.count = np.r_[self.count, np.zeros(len(new), dtype=np.int64)]
+            self.mean, self.m2 = np.r_[self.mean, np.zeros(len(new))], np.r_[self.m2, np.zeros(len(new))]
+            self.min, self.max = np.r_[self.min, np.full(len(new), np.inf)], np.r_[self.max, np.full(len(new), -np.inf)]
+        rows = np.array([self._index[label] for label in labels], dtype=np.int64)
+        count, mean, m2 = merge_moments(self.count[rows], self.mean[rows, None], self.m2[rows, None],
+                                        np.asarray(count), np.asarray(mean, dtype=np.float64)[:, None], np.asarray(m2, dtype=np.float64)[:, None])
+        self.count[rows], self.mean[rows], self.m2[rows] = count, mean[:, 0], m2[:, 0]
+        self.min[rows] = np.minimum(self.min[rows], minimum)
+        self.max[rows] = np.maximum(self.max[rows], maximum)
+
+class ContingencyCounts:
+    """This class accumulates the contingency table of responder classes per group.
+
+    Every appended batch is counted with `build_contingency_table` and added to the running
+    table, so the chi-square test never recounts the participants already enrolled.
+
+    Attributes:
+        group_column (str): The column defining the groups (rows of the table).
+        definition (dict): The conditions of every class (columns of the table).
+        counts (pd.DataFrame): The running counts, indexed by group.
+    """
+
+    def __init__(self, group_column: str = "status", definition: dict = CORTISOL_RESPONDER_DEFINITION) -> None:
+        """Initializes an empty table.
+
+        Args:
+            group_column (str): The group column. Default is 'status'.
+            definition (dict): The class conditions. Default is the cortisol responders of `prepare_data_from_csv`.
+        """
+        self.group_column = group_column
+        self.definition = definition
+        self.counts = pd.DataFrame(columns=list(definition), dtype=np.int64).rename_axis("Group")
+
+    def update(self, data: pd.DataFrame) -> "ContingencyCounts":
+        """Add a batch of participants.
+
+        Args:
+            data (pd.DataFrame): The new rows, holding the group and label columns of the definition.
+
+        Returns:
+            ContingencyCounts: The updated table.
+
+        Raises:
+            KeyError: If a required column is missing in the batch.
+        """
+        return self._add(build_contingency_table(data, self.group_column, self.definition).set_index("Group"))
+
+    def merge(self, other: "ContingencyCounts") -> "ContingencyCounts":
+        """Add the counts of another shard of participants.
+
+        Args:
+            other (ContingencyCounts): Counts of the same groups and classes.
+
+        Returns:
+            ContingencyCounts: The merged table.
+
+        Raises:
+            ValueError: If the tables count other groups or classes.
+        """
+        if (other.group_column, other.definition) != (self.group_column, self.definition):
+            msg = "Error: only tables of the same groups and classes can be merged."
+            raise ValueError(msg)
+        return self._add(other.counts)
+
+    def table(self) -> pd.DataFrame:
+        """The contingency table of all participants added so far.
+
+        Returns:
+            pd.DataFrame: A 'Group' column followed by one count column per class, sorted by group, as `prepare_data_from_csv`.
+        """
+        return self.counts.sort_index().reset_index()
+
+    def chi_square(self) -> tuple:
+        """Chi-square test of the running table, as `chi_square`.
+
+        Returns:
+            tuple: The chi-square statistic, the p-value and the contingency table.
+        """
+        return chi_square(self.table())
+
+    def _add(self, counts: pd.DataFrame) -> "ContingencyCounts":
+        """Add counts indexed by group to the running table."""
+        self.counts = self.counts.add(counts, fill_value=0).astype(np.int64).rename_axis("Group")
+        return self
+
+class OnlineStudy:
+    """This class keeps the statistics of the sAA and cortisol analyses up to date as participants are enrolled.
+
+    It holds the moments of the sAA change per status and the cortisol responder counts, both
+    updated with every batch of new rows and mergeable across shards. The sAA ANOVA, Cohen's d
+    and the chi-square test are then derived from these accumulators in time proportional to the
+    number of groups, whatever the size of the cohort.
+
+    Attributes:
+        saa (GroupMoments): Moments of 'change_image_sAA_level' per status.
+        cortisol (ContingencyCounts): Cortisol responders and non-responders per status.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the accumulators of an empty cohort."""
+        self.saa = GroupMoments("change_image_sAA_level", "status")
+        self.cortisol = ContingencyCounts()
+
+    def update(self, data: pd.DataFrame) -> "OnlineStudy":
+        """Add a batch of participants.
+
+        Args:
+            data (pd.DataFrame): The new rows of the participant table.
+
+        Returns:
+            OnlineStudy: The updated study.
+        """
+        self.saa.update(data)
+        self.cortisol.update(data)
+        return self
+
+    def merge(self, other: "OnlineStudy") -> "OnlineStudy":
+        """Fold the accumulators of another shard of participants into this study.
+
+        Args:
+            other (OnlineStudy): The study of the other shard.
+
+        Returns:
+            OnlineStudy: The merged study.
+        """
+        self.saa.merge(other.saa)
+        self.cortisol.merge(other.cortisol)
+        return self
+
+    def saa_response(self) -> dict:
+        """The sAA response analysis of `analyze_saa_response`, without the raw group data.
+
+        Returns:
+            dict: The ANOVA ('anova_results'), Cohen's d ('effect_size') and per-group 'summary_statistics'.
+
+        Raises:
+            ValueError: If one of the groups is empty.
+        """
+        if "HC" not in self.saa.groups or "NC" not in self.saa.groups:
+            msg = "Error: one of the groups is empty."
+            raise ValueError(msg)
+        summary = self.saa.summary()
+        return {
+            "anova_results": self.saa.anova(["HC", "NC"]),
+            "effect_size": {"cohens_d": self.saa.cohens_d("HC", "NC")},
+            "summary_statistics": {"HC": summary["HC"], "NC": summary["NC"]},
+        }
+
+    def chi_square(self) -> tuple:
+        """Chi-square test of the cortisol responders, as `chi_square(prepare_data_from_csv(data))`.
+
+        Returns:
+            tuple: The chi-square statistic, the p-value and the contingency table.
+        """
+        return self.cortisol.chi_square()
@@ -0,0 +1,206 @@
+"""Module for running analysis stages in dependency order with memoized results."""
+import contextlib
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from src.objects.dataset_cache import CACHE_DIR, source_digest
+from src.objects.tracer import span
+
+
+class Pipeline:
+    """This class runs named stages in dependency order and memoizes their outputs on disk.
+
+    Every stage declares the stages it takes as inputs. Its cache key hashes its name, the source
+    code of the whole package (so changing an analysis its function calls counts), its parameters
+    (files by their content) and the content of its inputs, so a stage is re-executed only when one
+    of them changed; otherwise its output is loaded from disk. The least recently used outputs are
+    removed once the directory grows beyond its size limit.
+    Stages whose inputs are ready run concurrently on a thread pool, so independent branches
+    overlap, unless their memory is traced: each stage then runs alone so its peak is its own.
+
+    Attributes:
+        directory (Path | None): Directory of the memoized outputs, or None to keep nothing on disk.
+        max_bytes (int): Size limit of the memoized outputs together.
+        max_workers (int | None): Number of stages run at the same time.
+        executed (list): The stages executed by the last run, in completion order.
+        reused (list): The stages loaded from disk by the last run.
+        durations (dict): Wall time in seconds of every stage of the last run.
+        trace_memory (bool): Whether the peak memory of every stage is measured.
+        peak_memory (dict): Peak memory in bytes allocated by every stage of the last run, when traced.
+    """
+
+    def __init__(self, directory: str | Path | None = CACHE_DIR / "stages", max_workers: int | None = None, trace_memory: bool = False,
+                 max_bytes: int = 512 * 1024 ** 2) -> None:
+        """Initializes an empty pipeline.
+
+        Args:
+            directory (str | Path | None): Directory of the memoized outputs. Created when missing.
+            max_workers (int | None): Number of stages run at the same time. Defaults to the thread pool default.
+            trace_memory (bool): Measure the peak memory of every stage with `tracemalloc`. The stages then
+                run one at a time and somewhat slower. Default is False.
+            max_bytes (int): Size limit of the memoized outputs together. Default is 512 MiB.
+
+        Raises:
+            ValueError: If 'max_bytes' is not positive.
+        """
+        if max_bytes <= 0:
+            msg = "Error: 'max_bytes' must be positive."
+            raise ValueError(msg)
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.executed = []
+        self.reused = []
+        self.durations = {}
+        self.trace_memory = trace_memory
+        self.peak_memory = {}
+        self._stages = {}
+
+    def add(self, name: str, function: Callable, inputs: tuple = (), params: dict | None = None, cache: bool = True) -> None:
+        """Add a stage computing ``function(*input outputs, **params)``.
+
+        Args:
+            name (str): Unique name of the stage.
+            function (Callable): The computation; must be deterministic.
+            inputs (tuple): Names of the stages whose outputs are passed as positional arguments.
+            params (dict | None): Keyword arguments; Path values are identified by their file content.
+            cache (bool): Memoize the output on disk. Stages with cheap or unpicklable outputs can
+                opt out; they are then identified by their key instead of their content.
+
+        Raises:
+            ValueError: If the name is taken or an input stage has not been added yet.
+        """
+        if name in self._stages:
+            msg = f"Error: stage '{name}' already exists."
+            raise ValueError(msg)
+        unknown = [stage for stage in inputs if stage not in self._stages]
+        if unknown:
+            msg = f"Error: unknown input stages: {', '.join(unknown)}"
+            raise ValueError(msg)
+        self._stages[name] = (function, tuple(inputs), dict(params or {}), cache)
+
+    def run(self, targets: list | None = None) -> dict:
+        """Run the target stages and the stages they depend on.
+
+        Args:
+            targets (list | None): Names of the stages wanted. Defaults to every stage.
+
+        Returns:
+            dict: The output of every stage run, by name.
+        """
+        # The targets and all their ancestors
+        needed = set()
+        stack = list(targets if targets is not None else self._stages)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self._stages[name][1])
+
+        self.executed, self.reused, self.durations, self.peak_memory = [], [], {}, {}
+        outputs, identities = {}, {}
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            self._schedule(needed, outputs, identities)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        return outputs
+
+    def _schedule(self, needed: set, outputs: dict, identities: dict) -> None:
+        """Submit every needed stage as soon as its inputs are ready and collect the results."""
+        with ThreadPoolExecutor(max_workers=1 if self.trace_memory else self.max_workers) as pool:
+            running = {}
+            while len(outputs) < len(needed):
+                for name in needed:
+                    if name not in outputs and name not in running.values() and all(stage in outputs for stage in self._stages[name][1]):
+                        running[pool.submit(self._execute, name, outputs, identities)] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    outputs[name], identities[name] = future.result()
+
+    def _execute(self, name: str, outputs: dict, identities: dict) -> tuple:
+        """Load a stage from disk or execute it; returns its output and its content identity."""
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        function, inputs, params, cache = self._stages[name]
+        digest = hashlib.sha256(name.encode())
+        digest.update(_function_source(function).encode())
+        digest.update(source_digest().encode())
+        for key in sorted(params):
+            digest.update(key.encode())
+            digest.update(_value_digest(params[key]))
+        for stage in inputs:
+            digest.update(identities[stage].encode())
+        key = digest.hexdigest()
+
+        path = self.directory / f"{name}-{key}.pkl" if cache and self.directory is not None else None
+        if path is not None and path.exists():
+            payload = path.read_bytes()
+            output = pickle.loads(payload)
+            os.utime(path)  # Mark as recently used
+            self.reused.append(name)
+        else:
+            with span(name, category="stage"):
+                output = function(*(outputs[stage] for stage in inputs), **params)
+            self.executed.append(name)
+            if path is not None:
+                payload = pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL)
+                descriptor, staging = tempfile.mkstemp(dir=self.directory, prefix=".staging-")
+                with os.fdopen(descriptor, "wb") as handle:
+                    handle.write(payload)
+                Path(staging).replace(path)
+                self.evict()
+        self.durations[name] = time.perf_counter() - start
+        if self.trace_memory:
+            self.peak_memory[name] = tracemalloc.get_traced_memory()[1] - baseline
+        return output, key if path is None else hashlib.sha256(payload).hexdigest()
+
+    def evict(self) -> None:
+        """Remove the least recently used outputs until the directory fits its size limit."""
+        if self.directory is None:
+            return
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            with contextlib.suppress(FileNotFoundError):
+                stat = path.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+def _function_source(function: Callable) -> str:
+    """Identify a function by its qualified name and, when available, its source code."""
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = ""
+    return f"{function.__module__}.{function.__qualname__}\n{source}"
+
+def _value_digest(value: object) -> bytes:
+    """Digest of a parameter value, with files identified by their content."""
+    if isinstance(value, Path):
+        digest = hashlib.sha256()
+        with value.open("rb") as handle:
+            for block in iter(lambda: handle.read(1024 ** 2), b""):
+                digest.update(block)
+        return digest.digest()
+    return hashlib.sha256(pickle.dumps(value)).digest()
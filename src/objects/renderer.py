@@ -0,0 +1,90 @@
+"""Module for rendering the figures of the visualization functions on screen or to files."""
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+# matplotlib is imported when the first figure is created, so importing the renderer stays cheap
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# File formats a renderer can write
+RENDER_FORMATS = ("png", "svg", "pdf")
+
+
+class Renderer:
+    """This class decides where the figures of the visualization functions go.
+
+    An interactive renderer (the default) draws on pyplot figures and shows them, as a script run
+    does. A headless renderer builds plain ``Figure`` objects that never touch pyplot or a GUI
+    backend, so they are drawn by the non-interactive backend of the output format, and either
+    returns them or writes them to `output_dir` and releases them right away.
+
+    Attributes:
+        output_dir (Path | None): Directory the figures are written to, or None to keep them in memory.
+        fmt (str): File format of the written figures.
+        headless (bool): Whether figures bypass pyplot instead of being shown.
+        dpi (int): Resolution of raster output.
+    """
+
+    def __init__(self, output_dir: str | Path | None = None, fmt: str = "png", headless: bool | None = None, dpi: int = 100) -> None:
+        """Initializes the renderer.
+
+        Args:
+            output_dir (str | Path | None): Directory the figures are written to. Created when missing.
+            fmt (str): 'png', 'svg' or 'pdf'. Default is 'png'.
+            headless (bool | None): Bypass pyplot and never show figures. Defaults to True when
+                `output_dir` is given, False otherwise.
+            dpi (int): Resolution of raster output. Default is 100.
+
+        Raises:
+            ValueError: If 'fmt' is not a supported format.
+        """
+        if fmt not in RENDER_FORMATS:
+            msg = f"Error: 'fmt' must be one of {', '.join(RENDER_FORMATS)}."
+            raise ValueError(msg)
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        if self.output_dir is not None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.headless = self.output_dir is not None if headless is None else headless
+        self.dpi = dpi
+
+    def figure(self, figsize: tuple) -> "Figure":
+        """Create an empty figure.
+
+        Args:
+            figsize (tuple): Width and height in inches.
+
+        Returns:
+            Figure: A standalone figure when headless, a pyplot figure otherwise.
+        """
+        if self.headless:
+            from matplotlib.figure import Figure
+            return Figure(figsize=figsize)
+        import matplotlib.pyplot as plt
+        return plt.figure(figsize=figsize)
+
+    def finish(self, figure: "Figure", name: str) -> "Figure | Path | None":
+        """Write, return or show a completed figure.
+
+        Args:
+            figure (Figure): The figure, as created by `figure`.
+            name (str): File name of the figure, without extension.
+
+        Returns:
+            Figure | Path | None: The written file when there is an output directory, otherwise the
+            figure when headless, otherwise None once it has been shown.
+        """
+        path = None
+        if self.output_dir is not None:
+            path = self.output_dir / f"{name}.{self.fmt}"
+            figure.savefig(path, format=self.fmt, dpi=self.dpi)
+
+        if not self.headless:
+            import matplotlib.pyplot as plt
+            plt.show()
+            return path
+        if path is not None:
+            # Release the artists now instead of waiting for the figure to be collected
+            figure.clear()
+            return path
+        return figure
@@ -0,0 +1,308 @@
+"""Module for memoizing the results of analysis functions called again on unchanged data."""
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.objects.dataset_cache import source_digest
+
+# The cache serving memoized calls, or None when memoization is off
+_active = None
+
+# Values of a column or index entering a key, spread evenly over its rows (the first and last included)
+SAMPLE_SIZE = 1024
+
+
+class ResultCache:
+    """This class keeps the results of memoized function calls in memory and optionally on disk.
+
+    Calls are keyed by a hash of the function (its name and the source code of the whole package,
+    so a change of any helper it calls counts), of a fingerprint of the table columns it reads and
+    of its other arguments, so a result is reused when the same code runs on the same data with
+    the same parameters. A column is fingerprinted by its length, type and a strided sample of
+    `SAMPLE_SIZE` values, so computing a key costs microseconds whatever the size of the table;
+    an edit of a table in place that touches none of the sampled rows is not noticed, so clear
+    the cache after such edits. Results are kept pickled, and
+    every hit unpickles a fresh copy, so callers modifying their results never change the cache.
+    The memory tier keeps the most recently used results within its count and size limits; the
+    disk tier, when a directory is given, keeps them across sessions and evicts the least recently
+    used files beyond its size limit. Functions opt in with `memoized`; while no cache is active they run as usual at the
+    cost of a global lookup.
+
+    Attributes:
+        max_entries (int): Number of results kept in memory.
+        max_memory_bytes (int): Size limit of the pickled results kept in memory.
+        directory (Path | None): Directory of the disk tier, or None to keep results in memory only.
+        max_bytes (int): Size limit of the disk tier.
+        hits (int): Calls answered from memory.
+        disk_hits (int): Calls answered from disk.
+        misses (int): Calls that ran their function.
+    """
+
+    def __init__(self, max_entries: int = 128, directory: str | Path | None = None, max_bytes: int = 256 * 1024 ** 2,
+                 max_memory_bytes: int = 64 * 1024 ** 2) -> None:
+        """Initializes an empty, inactive cache.
+
+        Args:
+            max_entries (int): Number of results kept in memory. Default is 128.
+            directory (str | Path | None): Directory of the disk tier. Created when missing. Default is None (no disk tier).
+            max_bytes (int): Size limit of the disk tier. Default is 256 MiB.
+            max_memory_bytes (int): Size limit of the pickled results kept in memory. Default is 64 MiB.
+
+        Raises:
+            ValueError: If 'max_entries', 'max_bytes' or 'max_memory_bytes' is not positive.
+        """
+        if max_entries <= 0 or max_bytes <= 0 or max_memory_bytes <= 0:
+            msg = "Error: 'max_entries', 'max_bytes' and 'max_memory_bytes' must be positive."
+            raise ValueError(msg)
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = self.disk_hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def __enter__(self) -> "ResultCache":
+        """Activate the cache, replacing the active one until exit."""
+        return self.activate()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Deactivate the cache and restore the previously active one."""
+        self.deactivate()
+
+    def activate(self) -> "ResultCache":
+        """Serve the memoized functions from this cache, e.g. for the rest of an interactive session.
+
+        Returns:
+            ResultCache: The cache.
+        """
+        global _active
+        self._previous, _active = _active, self
+        return self
+
+    def deactivate(self) -> None:
+        """Stop serving the memoized functions and restore the previously active cache."""
+        global _active
+        _active = self._previous
+
+    def get(self, key: str) -> tuple:
+        """Look up a result, in memory first, then on disk.
+
+        Args:
+            key (str): The key of the call.
+
+        Returns:
+            tuple: Whether the result was found, and a fresh copy of it (or None).
+        """
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if payload is None and self.directory is not None:
+            path = self.directory / f"{key}.pkl"
+            try:
+                payload = path.read_bytes()
+                os.utime(path)  # Mark as recently used
+            except FileNotFoundError:
+                payload = None
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, payload)
+        if payload is None:
+            with self._lock:
+                self.misses += 1
+            return False, None
+        return True, pickle.loads(payload)
+
+    def put(self, key: str, value: object) -> None:
+        """Store a result in memory and on disk, evicting the least recently used ones beyond the limits.
+
+        Args:
+            key (str): The key of the call.
+            value (object): The result; stored pickled, so later changes of the caller do not reach the cache.
+        """
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, payload)
+        if self.directory is not None:
+            descriptor, staging = tempfile.mkstemp(dir=self.directory, prefix=".staging-")
+            with os.fdopen(descriptor, "wb") as handle:
+                handle.write(payload)
+            Path(staging).replace(self.directory / f"{key}.pkl")
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove the least recently used files of the disk tier until it fits its size limit."""
+        if self.directory is None:
+            return
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            stat = path.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        """Remove every result, in memory and on disk, and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+        if self.directory is not None:
+            for path in self.directory.glob("*.pkl"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        """The counters of the cache.
+
+        Returns:
+            dict: Memory 'hits', 'disk_hits', 'misses', the 'hit_rate' over all calls, the number of results in memory ('entries')
+                and their pickled size ('memory_bytes').
+        """
+        with self._lock:
+            calls = self.hits + self.disk_hits + self.misses
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_rate": (self.hits + self.disk_hits) / calls if calls else float("nan"), "entries": len(self._entries), "memory_bytes": self._memory_bytes}
+
+    def _remember(self, key: str, payload: bytes) -> None:
+        """Keep a pickled result in the memory tier, dropping the least recently used ones beyond the limits (lock held).
+
+        A result larger than the size limit of the memory tier is only kept on disk.
+        """
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        if len(payload) > self.max_memory_bytes:
+            return
+        self._entries[key] = payload
+        self._memory_bytes += len(payload)
+        while len(self._entries) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+            self._memory_bytes -= len(self._entries.popitem(last=False)[1])
+
+def memoized(columns: list | Callable | None = None, ignore: list | None = None, skip: Callable | None = None) -> Callable:
+    """Decorator serving the calls of a function from the active `ResultCache`.
+
+    The first argument is the table the function reads (a DataFrame, or an object holding it as
+    `data`, such as a `StudyDataset`); only its index and the listed columns enter the key, so
+    adding or changing other columns does not invalidate the results. The other arguments enter
+    the key by value, defaults included, except the ignored ones. Results are returned as fresh copies;
+    changes the function makes to its inputs (such as added columns) are not repeated when a call is
+    answered from the cache.
+
+    Args:
+        columns (list | Callable | None): The columns of the table the function reads, a function of the
+            bound arguments (by name) returning them, or None when the result depends on every column.
+        ignore (list | None): Arguments that do not change the result, e.g. a number of workers; they are left out of the key.
+        skip (Callable | None): A function of the bound arguments (by name) telling when a call must run anyway,
+            e.g. when it draws unseeded random numbers; such calls are neither looked up nor stored.
+
+    Returns:
+        Callable: The decorator.
+
+    Raises:
+        ValueError: If an ignored argument is not a parameter of the function.
+    """
+    ignored = set(ignore or [])
+
+    def decorate(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+        unknown = ignored.difference(signature.parameters)
+        if unknown:
+            msg = f"Error: {function.__qualname__} has no parameters {', '.join(sorted(unknown))}."
+            raise ValueError(msg)
+
+        @functools.wraps(function)
+        def wrapper(*args: object, **kwargs: object) -> object:
+            cache = _active
+            if cache is None:
+                return function(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if skip is not None and skip(bound.arguments):
+                return function(*args, **kwargs)
+            used = columns(bound.arguments) if callable(columns) else columns
+            digest = hashlib.sha256(_function_identity(function))
+            for i, (name, value) in enumerate(bound.arguments.items()):
+                if name in ignored:
+                    continue
+                digest.update(name.encode())
+                digest.update(_value_digest(value, used if i == 0 else None))
+            key = digest.hexdigest()
+
+            found, result = cache.get(key)
+            if found:
+                return result
+            result = function(*args, **kwargs)
+            cache.put(key, result)
+            return result
+        return wrapper
+    return decorate
+
+def _function_identity(function: Callable) -> bytes:
+    """Identify a function by its qualified name and the source code of the whole package, so changes of its helpers count too."""
+    return f"{function.__module__}.{function.__qualname__}\n{source_digest()}".encode()
+
+def _value_digest(value: object, columns: list | None = None) -> bytes:
+    """Digest of an argument; tables by fingerprints of their index and columns (all of them, or the listed ones)."""
+    table = getattr(value, "data", None)
+    if isinstance(table, pd.DataFrame):
+        value = table
+    digest = hashlib.sha256(type(value).__name__.encode())
+    if isinstance(value, pd.DataFrame):
+        names = list(value.columns) if columns is None else [column for column in columns if column in value.columns]
+        _update_index(digest, value.index)
+        for name in names:
+            digest.update(repr(name).encode())
+            _update_values(digest, value[name].array)
+    elif isinstance(value, pd.Series):
+        _update_index(digest, value.index)
+        _update_values(digest, value.array)
+    elif isinstance(value, np.ndarray):
+        _update_values(digest, value)
+    else:
+        digest.update(pickle.dumps(value))
+    return digest.digest()
+
+def _update_index(digest: object, index: pd.Index) -> None:
+    """Add the fingerprint of an index to a digest; a range index by its bounds only."""
+    if isinstance(index, pd.RangeIndex):
+        digest.update(repr((index.start, index.stop, index.step)).encode())
+    else:
+        _update_values(digest, index.array)
+
+def _update_values(digest: object, values: object) -> None:
+    """Add the fingerprint of a column to a digest: its type, length and a strided sample of its values.
+
+    Categoricals are sampled by their codes, with their categories; numbers by their bytes, others pickled.
+    """
+    if isinstance(values, pd.Categorical):
+        digest.update(repr(list(values.categories)).encode())
+        values = values.codes
+    values = np.asarray(values)
+    digest.update(f"{values.dtype.str}{values.shape}".encode())
+    if len(values) > SAMPLE_SIZE:
+        values = values[np.linspace(0, len(values) - 1, SAMPLE_SIZE).astype(np.int64)]
+    if values.dtype.kind in "biufcmM":
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+    else:
+        digest.update(pickle.dumps(values.tolist(), protocol=pickle.HIGHEST_PROTOCOL))
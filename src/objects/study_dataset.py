@@ -0,0 +1,137 @@
+"""Module for indexing the participant table by its labels."""
+import copy
+
+import numpy as np
+import pandas as pd
+
+from src.functions.general import LABEL_CATEGORIES, label_code, label_codes
+
+# Label columns indexed by StudyDataset
+INDEX_COLUMNS = ["status", "phase", "pill_type", "stress_test_condition", "responsive_state_SAA", "responsive_state_cortisol"]
+
+
+class StudyDataset:
+    """This class wraps the participant table with row indexes built once from its label columns.
+
+    At load time every participant is assigned to the group formed by its combination of labels,
+    and the rows are ordered by group. Any selection by status, phase, pill type, condition or
+    responder state (or a combination of them) is then answered from those groups without scanning
+    the table, and is returned as a zero-copy slice whenever the selected rows are contiguous.
+
+    Attributes:
+        data (pd.DataFrame): The participant table.
+        columns (list): The label columns indexed.
+    """
+
+    def __init__(self, data: pd.DataFrame) -> None:
+        """Initializes the dataset by building the group index of the label columns.
+
+        Args:
+            data (pd.DataFrame): The participant table.
+        """
+        self.data = data
+        self.columns = [column for column in INDEX_COLUMNS if column in data.columns]
+
+        # One mixed-radix key per row: code + 1 of every label column, 0 for missing labels
+        radix = [len(LABEL_CATEGORIES[column]) + 1 for column in self.columns]
+        key = np.zeros(len(data), dtype=np.int64)
+        for column, base in zip(self.columns, radix, strict=True):
+            key = key * base + label_codes(data, column).astype(np.int64) + 1
+
+        # Rows ordered by group, with the bounds and decoded labels of every group
+        self._order = np.argsort(key, kind="stable")
+        sorted_key = key[self._order]
+        boundaries = np.flatnonzero(sorted_key[1:] != sorted_key[:-1]) + 1
+        self._starts = np.r_[0, boundaries] if len(key) else boundaries
+        self._stops = np.r_[boundaries, len(key)] if len(key) else boundaries
+        group_key = sorted_key[self._starts]
+        self._group_codes = {}
+        for column, base in reversed(list(zip(self.columns, radix, strict=True))):
+            self._group_codes[column] = group_key % base - 1
+            group_key = group_key // base
+        self._rows = {}
+
+    @classmethod
+    def wrap(cls, data: "pd.DataFrame | StudyDataset") -> "StudyDataset":
+        """Return `data` itself when it is already a StudyDataset, otherwise index it.
+
+        Args:
+            data (pd.DataFrame | StudyDataset): The participant table or an indexed dataset.
+
+        Returns:
+            StudyDataset: The indexed dataset.
+        """
+        return data if isinstance(data, cls) else cls(data)
+
+    def copy(self) -> "StudyDataset":
+        """Return a dataset over a shallow copy of the table that shares this index.
+
+        Columns added to the copy's table (as some analyses do) do not reach this table, which
+        lets concurrent analyses share one index safely.
+
+        Returns:
+            StudyDataset: The dataset copy.
+        """
+        dataset = copy.copy(self)
+        dataset.data = self.data.copy(deep=False)
+        dataset._rows = dict(self._rows)
+        return dataset
+
+    def rows(self, **labels: str) -> np.ndarray | slice:
+        """Find the positions of the participants holding all the given labels.
+
+        Args:
+            **labels: Label per column, e.g. ``status="HC", responsive_state_SAA="responders"``.
+
+        Returns:
+            np.ndarray | slice: The row positions in table order, as a slice when they are contiguous.
+
+        Raises:
+            KeyError: If a column is not indexed or a label is unknown.
+        """
+        query = tuple(sorted(labels.items()))
+        if query in self._rows:
+            return self._rows[query]
+
+        match = np.ones(len(self._starts), dtype=bool)
+        for column, value in query:
+            if column not in self._group_codes:
+                msg = f"Column '{column}' is not indexed"
+                raise KeyError(msg)
+            match &= self._group_codes[column] == label_code(column, value)
+
+        groups = np.flatnonzero(match)
+        if len(groups) == 1:
+            positions = self._order[self._starts[groups[0]]:self._stops[groups[0]]]
+        else:
+            positions = np.sort(np.concatenate([self._order[self._starts[g]:self._stops[g]] for g in groups] or [np.empty(0, dtype=np.int64)]))
+
+        if len(positions) and positions[-1] - positions[0] + 1 == len(positions):
+            result = slice(int(positions[0]), int(positions[-1]) + 1)
+        else:
+            result = positions
+        self._rows[query] = result
+        return result
+
+    def select(self, **labels: str) -> pd.DataFrame:
+        """Select the participants holding all the given labels.
+
+        Args:
+            **labels: Label per column, e.g. ``status="NC", phase="luteal"``.
+
+        Returns:
+            pd.DataFrame: The selected participants.
+        """
+        return self.data.iloc[self.rows(**labels)]
+
+    def column(self, name: str, **labels: str) -> pd.Series:
+        """Select one column of the participants holding all the given labels.
+
+        Args:
+            name (str): The column to select.
+            **labels: Label per column, e.g. ``status="HC"``.
+
+        Returns:
+            pd.Series: The values of the selected participants.
+        """
+        return self.data[name].iloc[self.rows(**labels)]
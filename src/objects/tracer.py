@@ -0,0 +1,193 @@
+"""Module for tracing where the time and memory of a run go, function by function."""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# The tracer recording spans, or None when tracing is off
+_active = None
+
+
+class Tracer:
+    """This class records a span for every traced function call and block while it is active.
+
+    Each span holds its wall time, the CPU time of its thread, the number of rows of its input
+    and, when memory tracing is on, the bytes it allocated and its peak memory. Spans nest per
+    thread and can be written as JSON Lines logs or as a Chrome trace for ``chrome://tracing``
+    or Perfetto. Functions opt in with `traced` and blocks with `span`; while no tracer is active
+    both only cost a global lookup. Calls made in worker processes are not recorded.
+
+    Attributes:
+        memory (bool): Whether allocations are traced with `tracemalloc`, which slows the run down.
+        spans (list): The finished spans, as dictionaries in completion order.
+    """
+
+    def __init__(self, memory: bool = False) -> None:
+        """Initializes an inactive tracer.
+
+        Args:
+            memory (bool): Also record the allocated and peak bytes of every span. Default is False.
+        """
+        self.memory = memory
+        self.spans = []
+        self._origin = time.perf_counter_ns()
+        self._local = threading.local()
+        self._previous = None
+        self._started_tracing = False
+
+    def __enter__(self) -> "Tracer":
+        """Activate the tracer, replacing the active one until exit."""
+        global _active
+        self._previous, _active = _active, self
+        self._started_tracing = self.memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Deactivate the tracer and restore the previously active one."""
+        global _active
+        _active = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    @contextmanager
+    def record(self, name: str, rows: int | None = None, category: str = "function") -> Iterator[dict]:
+        """Record one span around the enclosed block.
+
+        Args:
+            name (str): Name of the span.
+            rows (int | None): Number of input rows, when known.
+            category (str): Category of the span in the trace. Default is 'function'.
+
+        Yields:
+            dict: The span, whose 'args' can be completed by the block.
+        """
+        stack = self._local.__dict__.setdefault("stack", [])
+        record = {"name": name, "category": category, "rows": rows, "args": {}}
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            # Keep the peak reached so far by the enclosing span before restarting the count
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+            record["_start_bytes"], record["_peak"] = current, current
+        stack.append(record)
+        start, cpu_start = time.perf_counter_ns(), time.thread_time_ns()
+        try:
+            yield record
+        finally:
+            record["wall_ns"] = time.perf_counter_ns() - start
+            record["cpu_ns"] = time.thread_time_ns() - cpu_start
+            stack.pop()
+            if memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(record.pop("_peak"), peak)
+                start_bytes = record.pop("_start_bytes")
+                record["allocated_bytes"] = current - start_bytes
+                record["peak_bytes"] = peak - start_bytes
+                if stack:
+                    stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            record.update(start_ns=start - self._origin, depth=len(stack), pid=os.getpid(), tid=threading.get_ident())
+            self.spans.append(record)
+
+    def summary(self) -> pd.DataFrame:
+        """Aggregate the spans by name.
+
+        Returns:
+            pd.DataFrame: Calls, total and mean wall seconds, total CPU seconds, rows and peak bytes
+            (when traced) of every span name, by decreasing total wall time.
+        """
+        spans = pd.DataFrame(self.spans, columns=["name", "wall_ns", "cpu_ns", "rows", "peak_bytes"])
+        summary = spans.groupby("name").agg(calls=("wall_ns", "size"), wall_s=("wall_ns", "sum"), mean_wall_s=("wall_ns", "mean"),
+                                            cpu_s=("cpu_ns", "sum"), rows=("rows", "sum"), peak_bytes=("peak_bytes", "max"))
+        summary[["wall_s", "mean_wall_s", "cpu_s"]] /= 1e9
+        return summary.sort_values("wall_s", ascending=False)
+
+    def write_log(self, path: str | Path) -> Path:
+        """Write the spans as JSON Lines, one object per span with times in seconds.
+
+        Args:
+            path (str | Path): Path of the log file.
+
+        Returns:
+            Path: The written file.
+        """
+        path = Path(path)
+        with path.open("w", encoding="utf-8") as handle:
+            for record in self.spans:
+                entry = {key: value for key, value in record.items() if not key.endswith("_ns")}
+                entry.update(start_s=record["start_ns"] / 1e9, wall_s=record["wall_ns"] / 1e9, cpu_s=record["cpu_ns"] / 1e9)
+                handle.write(json.dumps(entry, default=str) + "\n")
+        return path
+
+    def write_chrome_trace(self, path: str | Path) -> Path:
+        """Write the spans in the Chrome trace event format, readable by ``chrome://tracing`` and Perfetto.
+
+        Args:
+            path (str | Path): Path of the trace file.
+
+        Returns:
+            Path: The written file.
+        """
+        events = []
+        for record in self.spans:
+            args = {key: record[key] for key in ["rows", "cpu_ns", "allocated_bytes", "peak_bytes"] if record.get(key) is not None}
+            events.append({"name": record["name"], "cat": record["category"], "ph": "X", "ts": record["start_ns"] / 1000,
+                           "dur": record["wall_ns"] / 1000, "pid": record["pid"], "tid": record["tid"], "args": {**args, **record["args"]}})
+        path = Path(path)
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str))
+        return path
+
+def traced(function: Callable) -> Callable:
+    """Decorator recording a span for every call of `function` while a `Tracer` is active.
+
+    Args:
+        function (Callable): The function to trace.
+
+    Returns:
+        Callable: The wrapped function; it calls `function` directly while tracing is off.
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args: object, **kwargs: object) -> object:
+        if _active is None:
+            return function(*args, **kwargs)
+        with _active.record(name, _input_rows(args, kwargs)):
+            return function(*args, **kwargs)
+    return wrapper
+
+def span(name: str, rows: int | None = None, category: str = "block") -> object:
+    """Context manager recording a span around a block while a `Tracer` is active.
+
+    Args:
+        name (str): Name of the span.
+        rows (int | None): Number of input rows, when known.
+        category (str): Category of the span in the trace. Default is 'block'.
+
+    Returns:
+        object: The span context, or a no-op context while tracing is off.
+    """
+    if _active is None:
+        return nullcontext({"args": {}})
+    return _active.record(name, rows, category)
+
+def _input_rows(args: tuple, kwargs: dict) -> int | None:
+    """Number of rows of the first table or array among the arguments of a call."""
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, pd.DataFrame | pd.Series | np.ndarray):
+            return len(value) if value.ndim else None
+        data = getattr(value, "data", None)
+        if isinstance(data, pd.DataFrame):
+            return len(data)
+    return None
@@ -6,18 +6,21 @@ It includes:
 - File handling using InitializeFile
 """
 import sys
+import tempfile
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 sys.path.append(r"C:\Users\matan\OneDrive\שולחן העבודה\python\project")
+from src.objects.dataset_cache import DatasetCache
 from src.objects.initialize_file import InitializeFile
+from src.objects.study_dataset import StudyDataset
 
 
-def article_test(data: pd.DataFrame) -> None:
+def article_test(data: pd.DataFrame | StudyDataset) -> None:
     """Generate bar plots to visualize the sAA responses for different groups of women.
 
     Parameters:
-        data (pd.DataFrame): The DataFrame containing the required data with a column "change_image_sAA_level".
+        data (pd.DataFrame | StudyDataset): The DataFrame (or its indexed dataset) containing the required data with a column "change_image_sAA_level".
 
     Returns:
         None: The function generates plots and does not return a value.
@@ -27,11 +30,12 @@ def article_test(data: pd.DataFrame) -> None:
     2. sAA Non-Responders: Comparing the mean sAA change for HC and NC women who are non-responders.
     """
     # Define groups for responders and non-responders
+    dataset = StudyDataset.wrap(data)
     groups = {
-        "Responders NC": data["change_image_sAA_level"][:22],
-        "Non-Responders NC": data["change_image_sAA_level"][22:42],
-        "Responders HC": data["change_image_sAA_level"][42:59],
-        "Non-Responders HC": data["change_image_sAA_level"][59:],
+        "Responders NC": dataset.column("change_image_sAA_level", status="NC", responsive_state_SAA="responders"),
+        "Non-Responders NC": dataset.column("change_image_sAA_level", status="NC", responsive_state_SAA="non-responders"),
+        "Responders HC": dataset.column("change_image_sAA_level", status="HC", responsive_state_SAA="responders"),
+        "Non-Responders HC": dataset.column("change_image_sAA_level", status="HC", responsive_state_SAA="non-responders"),
     }
 
     # Plot for sAA Responders
@@ -69,8 +73,9 @@ def article_test(data: pd.DataFrame) -> None:
     plt.axhline(0, color="black", linewidth=0.8, linestyle="-")  # Add a horizontal line at y=0
     plt.show()
 
-# Initialize the data file
-file = InitializeFile().file
+# Initialize the data file, in a dataset cache removed afterwards
+with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as cache_directory:
+    file = InitializeFile(cache=DatasetCache(cache_directory)).file
 
-# Run the test function
-article_test(file)
+    # Run the test function
+    article_test(file)
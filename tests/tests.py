@@ -16,9 +16,19 @@ Notes:
     - The script expects specific data structures and column names.
 """
 
+import contextlib
+import io
+import json
+import subprocess
 import sys
+import tempfile
+import tracemalloc
 import unittest
+from pathlib import Path
+from unittest import mock
 
+import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 # Adding paths for importing custom modules
@@ -28,16 +38,56 @@ sys.path.append(r"C:\Users\matan\OneDrive\שולחן העבודה\python\project
 
 # Importing custom modules
 import pytest
+import statsmodels.api as sm
+from scipy.stats import chi2_contingency, f_oneway
+from statsmodels.formula.api import ols
 
-from src.functions.calculate import analyze_saa_response, chi_square
+from src.functions.calculate import (
+    analyze_saa_response,
+    calculate_effect_size,
+    calculate_two_way_anova_with_viz,
+    chi_square,
+    factorial_anova,
+    linear_regressions,
+    one_way_anova,
+    resample_two_groups,
+)
+from src.functions.general import (
+    augment_with_cohorts,
+    build_contingency_table,
+    encode_labels,
+    generate_numbers_with_stats,
+    generate_numbers_with_stats_batch,
+    label_code,
+    label_mask,
+    prepare_data_from_csv,
+)
 from src.functions.visualization import (
+    heat_map,
     plot_cortisol_phase_pill_effects,
     plot_difference_saa_responses,
     plot_negative_images_responses,
     plot_positive_images_responses,
+    render_figures,
     statistics_of_saa_responses,
+    vizualizations_two_way_anova,
 )
-from src.objects.initialize_file import InitializeFile
+from benchmarks.run import compare
+from benchmarks.run import run as run_benchmarks
+from src.cli import main
+from src.functions.batch import analyze_studies, read_manifest
+from src.functions.power import anova_power, chi_square_power, factorial_power, required_sample_size
+from src.functions.report import analyze_study, question_stages, study_pipeline, write_report
+from src.functions.simulation import simulate_study, study_statistics, summarize_simulation
+from src.objects.column_store import ColumnStore
+from src.objects.dataset_cache import DatasetCache
+from src.objects.initialize_file import COHORT_SPEC, DATA_PATH, SYNTHETIC_COLUMNS, InitializeFile, augment_csv, read_participants
+from src.objects.online_statistics import ContingencyCounts, GroupMoments, OnlineStudy
+from src.objects.pipeline import Pipeline
+from src.objects.renderer import Renderer
+from src.objects.result_cache import ResultCache, memoized
+from src.objects.study_dataset import StudyDataset
+from src.objects.tracer import Tracer, span
 
 
 class TestProjectFunctionsAdvanced(unittest.TestCase):
@@ -52,7 +102,13 @@ class TestProjectFunctionsAdvanced(unittest.TestCase):
 
         This method runs once before all tests in this class.
         """
-        cls.file = InitializeFile().file
+        cls.cache_directory = tempfile.TemporaryDirectory()
+        cls.file = InitializeFile(cache=DatasetCache(cls.cache_directory.name)).file
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Remove the dataset cache of the class."""
+        cls.cache_directory.cleanup()
 
     def test_initialize_file_columns_and_data(self) -> None:
         """Test that InitializeFile creates the required DataFrame with correct columns and data.
@@ -208,5 +264,1055 @@ class TestPlotCortisolPhasePillEffects(unittest.TestCase):
         except Exception as e:
             self.fail(f"plot_cortisol_phase_pill_effects raised an exception: {e}")
 
+class TestReadParticipants(unittest.TestCase):
+    """Unit tests for the typed and chunked participant loader."""
+
+    csv = "humans,gender,status,phase,pill_type,stress_test_condition,responsive_state_SAA,responsive_state_cortisol\n" + "".join(
+        f"human{i},woman,{status},,monophasic,cps,responders,responders\n" for i, status in enumerate(["NC", "NC", "HC", "HC", "HC"], 1)
+    )
+
+    def test_schema_is_applied(self) -> None:
+        """Test that label columns are read as categoricals from a file-like object."""
+        data = read_participants(io.StringIO(self.csv))
+        assert isinstance(data["status"].dtype, pd.CategoricalDtype)
+        assert list(data["status"].cat.categories) == ["HC", "NC"]
+
+    def test_chunked_read(self) -> None:
+        """Test that a chunked read yields typed chunks covering the whole file."""
+        chunks = list(read_participants(io.StringIO(self.csv), chunksize=2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert all(isinstance(chunk["status"].dtype, pd.CategoricalDtype) for chunk in chunks)
+
+    def test_unexpected_label(self) -> None:
+        """Test that a label outside the schema raises ValueError."""
+        with pytest.raises(ValueError, match="status"):
+            read_participants(io.StringIO(self.csv.replace("HC", "XX")))
+
+    def test_augment_csv_streams_chunks(self) -> None:
+        """Test that augment_csv writes every participant with the synthetic columns."""
+        output = io.StringIO()
+        assert augment_csv(io.StringIO(self.csv), output, chunksize=2, scale=2) == 10
+        result = pd.read_csv(io.StringIO(output.getvalue()))
+        assert len(result) == 10
+        assert result["humans"].is_unique
+        assert not result["negative_image"].isna().any()
+
+class TestLabelCodes(unittest.TestCase):
+    """Unit tests for the shared label code dictionary."""
+
+    def test_encoded_and_string_columns_agree(self) -> None:
+        """Test that masks on encoded columns match masks on plain string columns."""
+        data = pd.DataFrame({"status": ["NC", "HC", "HC", None]})
+        plain = label_mask(data, "status", "HC")
+        encoded = label_mask(encode_labels(data.copy()), "status", "HC")
+        assert list(plain) == [False, True, True, False]
+        assert list(encoded) == list(plain)
+
+    def test_encode_labels_is_compact(self) -> None:
+        """Test that encoded label columns use one-byte codes."""
+        data = encode_labels(pd.DataFrame({"responsive_state_cortisol": ["responders", "control-non-responders"] * 50}))
+        assert data["responsive_state_cortisol"].cat.codes.dtype == np.int8
+
+    def test_unknown_label(self) -> None:
+        """Test that looking up an unknown label raises KeyError."""
+        assert label_code("status", "NC") == 1
+        with pytest.raises(KeyError):
+            label_code("status", "XX")
+
+class TestResampleTwoGroups(unittest.TestCase):
+    """Unit tests for the permutation and bootstrap engine."""
+
+    def setUp(self) -> None:
+        """Create two clearly separated groups."""
+        rng = np.random.default_rng(0)
+        self.group1 = pd.Series(rng.normal(0.0, 1.0, 30))
+        self.group2 = pd.Series(rng.normal(1.5, 1.0, 25))
+
+    def test_seeded_results_are_reproducible(self) -> None:
+        """Test that the same seed gives the same results, also across processes."""
+        single = resample_two_groups(self.group1, self.group2, 2000, seed=3)
+        assert single == resample_two_groups(self.group1, self.group2, 2000, seed=3)
+        split = resample_two_groups(self.group1, self.group2, 2000, seed=3, n_jobs=2)
+        assert split["n_resamples"] == 2000
+
+    def test_separated_groups(self) -> None:
+        """Test that separated groups give a small p-value and an interval around the observed effect."""
+        results = resample_two_groups(self.group1, self.group2, 5000, seed=0)
+        assert results["permutation"]["f_p_value"] < 0.01
+        low, high = results["bootstrap"]["cohens_d_ci"]
+        d = calculate_effect_size(self.group1, self.group2)
+        assert low < d < high
+
+    def test_analyze_saa_response_resampling(self) -> None:
+        """Test that analyze_saa_response adds resampling results on request."""
+        data = pd.DataFrame({"status": ["HC"] * 30 + ["NC"] * 25, "change_image_sAA_level": pd.concat([self.group1, self.group2])})
+        assert "resampling" not in analyze_saa_response(data)
+        results = analyze_saa_response(data, n_resamples=500, seed=1)
+        assert 0 < results["resampling"]["permutation"]["cohens_d_p_value"] <= 1
+
+    def test_invalid_arguments(self) -> None:
+        """Test that a non-positive number of resamples raises ValueError."""
+        with pytest.raises(ValueError, match="n_resamples"):
+            resample_two_groups(self.group1, self.group2, 0)
+
+class TestOneWayAnova(unittest.TestCase):
+    """Unit tests for the batched one-way ANOVA."""
+
+    def setUp(self) -> None:
+        """Create a table with two outcomes, a three-level factor and two strata."""
+        rng = np.random.default_rng(5)
+        self.data = pd.DataFrame({
+            "status": np.repeat(["HC", "NC"], 30),
+            "site": np.tile(["a", "b", "c"], 20),
+            "x": rng.normal(10, 2, 60),
+            "y": rng.normal(-3, 1, 60),
+        })
+
+    def test_matches_scipy(self) -> None:
+        """Test that every F statistic and p-value matches scipy's f_oneway."""
+        anova = one_way_anova(self.data, ["x", "y"], ["site"], by="status")
+        for status in ["HC", "NC"]:
+            subset = self.data[self.data["status"] == status]
+            for outcome in ["x", "y"]:
+                expected = f_oneway(*[group[outcome] for _, group in subset.groupby("site")])
+                assert anova.loc[(status, "site", outcome), "F"] == pytest.approx(expected.statistic)
+                assert anova.loc[(status, "site", outcome), "p_value"] == pytest.approx(expected.pvalue)
+
+    def test_single_group_is_nan(self) -> None:
+        """Test that a factor with one group inside a stratum gives NaN."""
+        anova = one_way_anova(self.data, ["x"], ["status"], by="status")
+        assert np.isnan(anova.loc[("HC", "status", "x"), "F"])
+
+    def test_missing_column(self) -> None:
+        """Test that a missing outcome raises KeyError."""
+        with pytest.raises(KeyError, match="z"):
+            one_way_anova(self.data, ["z"], ["site"])
+
+class TestFactorialAnova(unittest.TestCase):
+    """Unit tests for the shared-design factorial ANOVA."""
+
+    def setUp(self) -> None:
+        """Create a three-factor table with one empty cell and two outcomes."""
+        rng = np.random.default_rng(11)
+        self.data = pd.DataFrame({
+            "a": rng.choice(["HC", "NC"], 90),
+            "b": rng.choice(["low", "mid", "high"], 90),
+            "c": rng.choice(["yes", "no"], 90),
+            "x": rng.normal(5, 1, 90),
+            "y": rng.normal(0, 2, 90),
+        })
+        self.data = self.data[~((self.data["a"] == "HC") & (self.data["b"] == "low") & (self.data["c"] == "no"))]
+
+    def test_matches_statsmodels(self) -> None:
+        """Test every type of sums of squares against anova_lm on a rank-deficient design."""
+        for typ, coding in [(1, ""), (2, ""), (3, ", Sum")]:
+            tables = factorial_anova(self.data, ["x", "y"], ["a", "b", "c"], typ=typ, contrast="sum" if coding else "treatment")
+            for outcome in ["x", "y"]:
+                model = ols(f"{outcome} ~ C(a{coding}) * C(b{coding}) * C(c{coding})", data=self.data).fit()
+                expected = sm.stats.anova_lm(model, typ=typ).drop(index="Intercept", errors="ignore")
+                # anova_lm gives partly testable terms their full df, so compare the fully testable ones
+                table = tables[outcome]
+                testable = table["df"].to_numpy() == expected["df"].to_numpy()
+                assert testable.sum() >= len(table) - 1
+                columns = ["sum_sq", "df", "F", "PR(>F)"]
+                np.testing.assert_allclose(table[columns].to_numpy()[testable], expected[columns].to_numpy()[testable], rtol=1e-6, atol=1e-9)
+
+    def test_invalid_type(self) -> None:
+        """Test that an unknown type of sums of squares raises ValueError."""
+        with pytest.raises(ValueError, match="typ"):
+            factorial_anova(self.data, ["x"], ["a"], typ=4)
+
+class TestLinearRegressions(unittest.TestCase):
+    """Unit tests for the batched grouped regressions."""
+
+    def setUp(self) -> None:
+        """Create a table with two predictors, two outcomes and two groups."""
+        rng = np.random.default_rng(3)
+        self.data = pd.DataFrame({
+            "status": np.repeat(["HC", "NC"], 40),
+            "x": rng.normal(100, 20, 80),
+            "z": rng.normal(0.3, 0.1, 80),
+        })
+        self.data["y"] = 0.02 * self.data["x"] - self.data["z"] + rng.normal(0, 0.5, 80)
+        self.data["w"] = rng.normal(25, 3, 80)
+
+    def test_matches_statsmodels(self) -> None:
+        """Test simple and multiple fits against statsmodels OLS."""
+        for multiple in [False, True]:
+            fits = linear_regressions(self.data, ["x", "z"], ["y", "w"], by="status", multiple=multiple)
+            for status in ["HC", "NC"]:
+                group = self.data[self.data["status"] == status]
+                for outcome in ["y", "w"]:
+                    for predictors in ([["x", "z"]] if multiple else [["x"], ["z"]]):
+                        model = sm.OLS(group[outcome], sm.add_constant(group[predictors])).fit()
+                        for predictor in predictors:
+                            fit = fits.loc[(status, predictor, outcome)]
+                            assert fit["slope"] == pytest.approx(model.params[predictor])
+                            assert fit["slope_se"] == pytest.approx(model.bse[predictor])
+                            assert fit["p_value"] == pytest.approx(model.pvalues[predictor])
+                            assert fit["intercept"] == pytest.approx(model.params["const"])
+                            assert fit["intercept_se"] == pytest.approx(model.bse["const"])
+                            assert fit["r_squared"] == pytest.approx(model.rsquared)
+
+    def test_degenerate_group_is_nan(self) -> None:
+        """Test that a group with a constant predictor gives NaN."""
+        data = self.data.assign(x=np.where(self.data["status"] == "HC", 1.0, self.data["x"]))
+        fits = linear_regressions(data, ["x"], ["y"], by="status")
+        assert np.isnan(fits.loc[("HC", "x", "y"), "slope"])
+        assert not np.isnan(fits.loc[("NC", "x", "y"), "slope"])
+
+class TestBuildContingencyTable(unittest.TestCase):
+    """Unit tests for the single-pass contingency table builder."""
+
+    def setUp(self) -> None:
+        """Create a small participant table."""
+        self.data = pd.DataFrame({
+            "status": ["NC", "NC", "HC", "HC", "HC", "NC"],
+            "stress_test_condition": ["cps", "control", "cps", "cps", "control", "cps"],
+            "responsive_state_cortisol": ["responders", "control-non-responders", "non-responders", "responders", "control-non-responders", "non-responders"],
+        })
+
+    def test_prepare_data_from_csv_counts(self) -> None:
+        """Test that the chi-square table counts responders and non-responders per group."""
+        table = prepare_data_from_csv(self.data)
+        assert list(table["Group"]) == ["HC", "NC"]
+        assert list(table["Responders"]) == [1, 1]
+        assert list(table["Non-Responders"]) == [2, 2]
+        chi2, p, _ = chi_square(table)
+        assert 0 <= p <= 1
+
+    def test_custom_groups_and_classes(self) -> None:
+        """Test grouping by any column with a custom class definition."""
+        data = self.data.assign(site=["b", "a", "c", "a", "b", "c"])
+        table = build_contingency_table(data, "site", {"CPS": [{"stress_test_condition": "cps"}], "Control": [{"stress_test_condition": "control"}]})
+        assert list(table["Group"]) == ["a", "b", "c"]
+        assert list(table["CPS"]) == [1, 1, 2]
+        assert list(table["Control"]) == [1, 1, 0]
+
+class TestStudyDataset(unittest.TestCase):
+    """Unit tests for the label-indexed dataset."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Index the generated dataset once for all tests."""
+        cls.cache_directory = tempfile.TemporaryDirectory()
+        cls.file = InitializeFile(cache=DatasetCache(cls.cache_directory.name)).file
+        cls.dataset = StudyDataset(cls.file)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Remove the dataset cache of the class."""
+        cls.cache_directory.cleanup()
+
+    def test_rows_match_boolean_masks(self) -> None:
+        """Test that indexed selections match a full scan of the table."""
+        selected = self.dataset.select(status="HC", responsive_state_cortisol="non-responders")
+        expected = self.file[(self.file["status"] == "HC") & (self.file["responsive_state_cortisol"] == "non-responders")]
+        pd.testing.assert_frame_equal(selected, expected)
+
+    def test_contiguous_rows_are_slices(self) -> None:
+        """Test that contiguous selections are returned as slices."""
+        assert self.dataset.rows(status="NC") == slice(0, 42)
+        assert not isinstance(self.dataset.rows(status="HC", responsive_state_cortisol="non-responders"), slice)
+
+    def test_shuffled_rows(self) -> None:
+        """Test that the analysis does not depend on the row order."""
+        shuffled = self.file.sample(frac=1, random_state=0)
+        expected = analyze_saa_response(self.file)["anova_results"]["f_statistic"]
+        assert analyze_saa_response(StudyDataset(shuffled))["anova_results"]["f_statistic"] == pytest.approx(expected)
+
+    def test_unknown_column(self) -> None:
+        """Test that selecting by a column that is not indexed raises KeyError."""
+        with pytest.raises(KeyError):
+            self.dataset.rows(gender="woman")
+
+class TestDatasetCache(unittest.TestCase):
+    """Unit tests for the on-disk dataset cache."""
+
+    def setUp(self) -> None:
+        """Create an empty cache in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = DatasetCache(self.directory.name)
+
+    def tearDown(self) -> None:
+        """Remove the temporary cache directory."""
+        self.directory.cleanup()
+
+    def test_round_trip(self) -> None:
+        """Test that a cached dataset loads back with the same values and dtypes."""
+        generated = InitializeFile(cache=self.cache).file
+        cached = InitializeFile(cache=self.cache).file
+        pd.testing.assert_frame_equal(generated, cached, check_dtype=False)
+        assert isinstance(cached["status"].dtype, pd.CategoricalDtype)
+
+    def test_key_depends_on_seed(self) -> None:
+        """Test that a different seed does not reuse the cached dataset."""
+        first = InitializeFile(cache=self.cache, seed=1).file
+        second = InitializeFile(cache=self.cache, seed=2).file
+        assert not first["BMI"].equals(second["BMI"])
+
+    def test_key_depends_on_code(self) -> None:
+        """Test that a change of the package's code, such as the generator, does not reuse the cached dataset."""
+        key = self.cache.key(DATA_PATH, seed=1)
+        assert self.cache.key(DATA_PATH, seed=1) == key
+        with mock.patch("src.objects.dataset_cache.source_digest", return_value="edited"):
+            assert self.cache.key(DATA_PATH, seed=1) != key
+
+    def test_eviction_respects_size_limit(self) -> None:
+        """Test that storing beyond the size limit evicts the oldest entries."""
+        data = pd.DataFrame({"value": np.arange(1000, dtype=np.float64)})
+        cache = DatasetCache(self.directory.name, max_bytes=12_000)
+        cache.store("old", data)
+        cache.store("new", data)
+        assert cache.load("old") is None
+        assert cache.load("new") is not None
+
+class TestRenderer(unittest.TestCase):
+    """Unit tests for the headless render mode of the visualization functions."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Compute the two-way ANOVA results drawn by the tests."""
+        cls.cache_directory = tempfile.TemporaryDirectory()
+        data = InitializeFile(cache=DatasetCache(cls.cache_directory.name)).file
+        cls.group_means, cls.anova_table = calculate_two_way_anova_with_viz(data, "negative_image")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Remove the dataset cache of the class."""
+        cls.cache_directory.cleanup()
+
+    def test_writes_files_without_pyplot(self) -> None:
+        """Test that every format is written to the output directory and no pyplot figure stays open."""
+        open_figures = plt.get_fignums()
+        with tempfile.TemporaryDirectory() as directory:
+            for fmt in ["png", "svg", "pdf"]:
+                renderer = Renderer(directory, fmt=fmt)
+                paths = [heat_map(self.group_means, "negative_image", renderer=renderer),
+                         *vizualizations_two_way_anova(self.anova_table, renderer=renderer, name="negative")]
+                assert [path.name for path in paths] == [f"heat_map_negative_image.{fmt}", f"negative_f_values.{fmt}", f"negative_p_values.{fmt}"]
+                assert all(path.stat().st_size > 0 for path in paths)
+        assert plt.get_fignums() == open_figures
+
+    def test_returns_figure_when_headless(self) -> None:
+        """Test that a headless renderer without output directory returns the figure."""
+        open_figures = plt.get_fignums()
+        figure = heat_map(self.group_means, "negative_image", renderer=Renderer(headless=True))
+        assert figure.axes[0].get_title() == "Heatmap of Group Means"
+        assert plt.get_fignums() == open_figures
+
+    def test_render_figures_in_pool(self) -> None:
+        """Test that a pool of workers renders every job and returns the files in job order."""
+        jobs = [(heat_map, (self.group_means, "negative_image")),
+                (vizualizations_two_way_anova, (self.anova_table,), {"name": "negative"})]
+        with tempfile.TemporaryDirectory() as directory:
+            outputs = render_figures(jobs, Renderer(directory), n_jobs=2)
+            assert outputs[0].name == "heat_map_negative_image.png"
+            assert [path.name for path in outputs[1]] == ["negative_f_values.png", "negative_p_values.png"]
+            assert all(path.exists() for path in [outputs[0], *outputs[1]])
+
+    def test_render_figures_needs_output_directory(self) -> None:
+        """Test that rendering a pool of figures without output directory raises ValueError."""
+        with pytest.raises(ValueError, match="output directory"):
+            render_figures([], Renderer(headless=True))
+
+    def test_invalid_format(self) -> None:
+        """Test that an unsupported format raises ValueError."""
+        with pytest.raises(ValueError, match="fmt"):
+            Renderer(fmt="bmp")
+
+class TestWriteReport(unittest.TestCase):
+    """Unit tests for the HTML and JSON report."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Generate the dataset of the tests in a temporary dataset cache."""
+        cls.cache_directory = tempfile.TemporaryDirectory()
+        cls.file = InitializeFile(cache=DatasetCache(cls.cache_directory.name)).file
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Remove the dataset cache of the class."""
+        cls.cache_directory.cleanup()
+
+    def test_report_contents(self) -> None:
+        """Test that the report covers every question with strict JSON and embedded figures."""
+        data = self.file
+        with tempfile.TemporaryDirectory() as directory:
+            html_path, json_path = write_report(data, directory, n_jobs=1)
+            payload = json.loads(json_path.read_text(), parse_constant=lambda constant: pytest.fail(f"{constant} in JSON"))
+            report = html_path.read_text(encoding="utf-8")
+
+        assert payload["participants"] == len(data)
+        assert len(payload["questions"]) == 6
+        chi2, p, _ = chi_square(prepare_data_from_csv(data))
+        assert payload["questions"][0]["statistics"]["chi_square"] == {"chi2": pytest.approx(chi2), "p_value": pytest.approx(p)}
+        figures = sum(len(question["figures"]) for question in payload["questions"])
+        assert report.count("data:image/png;base64,") == figures == 14
+
+class TestPipeline(unittest.TestCase):
+    """Unit tests for the memoizing stage runner."""
+
+    def setUp(self) -> None:
+        """Create a temporary stage directory and a log of the executed stages."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.calls = []
+
+    def tearDown(self) -> None:
+        """Remove the temporary stage directory."""
+        self.directory.cleanup()
+
+    def build(self, size: int, label: str = "a") -> Pipeline:
+        """Build a diamond of stages: a source feeding two independent branches joined at the end."""
+        def source(size: int, label: str) -> np.ndarray:
+            self.calls.append(f"source {label}")
+            return np.arange(size) % 4
+        def total(values: np.ndarray) -> int:
+            self.calls.append("total")
+            return int(values.sum())
+        def count(values: np.ndarray) -> int:
+            self.calls.append("count")
+            return len(values)
+        def mean(total: int, count: int) -> float:
+            self.calls.append("mean")
+            return total / count
+
+        pipeline = Pipeline(self.directory.name, max_workers=2)
+        pipeline.add("source", source, params={"size": size, "label": label})
+        pipeline.add("total", total, inputs=("source",))
+        pipeline.add("count", count, inputs=("source",))
+        pipeline.add("mean", mean, inputs=("total", "count"))
+        return pipeline
+
+    def test_second_run_reuses_every_stage(self) -> None:
+        """Test that an unchanged pipeline loads every stage from disk instead of executing it."""
+        first = self.build(8).run()
+        pipeline = self.build(8)
+        second = pipeline.run()
+        assert first["mean"] == second["mean"] == 1.5
+        assert sorted(self.calls) == ["count", "mean", "source a", "total"]
+        assert pipeline.executed == []
+        assert sorted(pipeline.reused) == ["count", "mean", "source", "total"]
+
+    def test_only_changed_stages_rerun(self) -> None:
+        """Test that a stage whose inputs kept their content is reused after an upstream change."""
+        self.build(8).run()
+        # The label changes the source key but not its output, so nothing downstream re-executes
+        pipeline = self.build(8, label="b")
+        pipeline.run()
+        assert pipeline.executed == ["source"]
+        # A new size changes the source output and every stage after it
+        pipeline = self.build(12)
+        assert pipeline.run(["total"]).keys() == {"source", "total"}
+        assert sorted(pipeline.executed) == ["source", "total"]
+
+    def test_code_change_and_eviction(self) -> None:
+        """Test that a change of the package's code reruns every stage and that outputs beyond the size limit are removed."""
+        self.build(8).run()
+        with mock.patch("src.objects.pipeline.source_digest", return_value="edited"):
+            pipeline = self.build(8)
+            pipeline.run()
+        assert sorted(pipeline.executed) == ["count", "mean", "source", "total"]
+        assert len(list(Path(self.directory.name).glob("*.pkl"))) == 8
+        pipeline.max_bytes = 1
+        pipeline.evict()
+        assert list(Path(self.directory.name).glob("*.pkl")) == []
+        with pytest.raises(ValueError, match="max_bytes"):
+            Pipeline(self.directory.name, max_bytes=0)
+
+    def test_invalid_stages(self) -> None:
+        """Test that unknown inputs and duplicate names raise ValueError."""
+        pipeline = self.build(8)
+        with pytest.raises(ValueError, match="unknown input stages: missing"):
+            pipeline.add("extra", len, inputs=("missing",))
+        with pytest.raises(ValueError, match="already exists"):
+            pipeline.add("mean", len)
+
+class TestCommandLine(unittest.TestCase):
+    """Unit tests for the console entry point and its question selection."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Generate the dataset of the tests in a temporary dataset cache."""
+        cls.cache_directory = tempfile.TemporaryDirectory()
+        cls.file = InitializeFile(cache=DatasetCache(cls.cache_directory.name)).file
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Remove the dataset cache of the class."""
+        cls.cache_directory.cleanup()
+
+    def test_runs_only_selected_questions(self) -> None:
+        """Test that a single question runs only its analysis and prints a timing row per stage."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            assert main(["-q", "cortisol", "--cache-dir", directory, "--trace-memory"]) == 0
+        summary = json.loads(stdout.getvalue())
+        assert len(summary) == 1
+        assert set(summary[0]["statistics"]) == {"chi_square", "contingency_table"}
+        table = stderr.getvalue().split("peak memory (MB)\n")[1]
+        stages = [line.split()[0] for line in table.splitlines()]
+        assert stages == ["data", "study", "cortisol_response", "summary"]
+        assert all(float(line.split()[-1]) >= 0 for line in table.splitlines())
+
+    def test_jobs_run_analyses_concurrently(self) -> None:
+        """Test that without memory tracing the analyses get the requested workers and no memory column."""
+        stderr = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, mock.patch("src.cli.study_pipeline", wraps=study_pipeline) as build, \
+                contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(stderr):
+            assert main(["-q", "saa", "regressions", "--cache-dir", directory, "-j", "2"]) == 0
+        assert build.call_args.kwargs["max_workers"] == 2
+        assert not build.call_args.kwargs["trace_memory"]
+        table = stderr.getvalue().split("peak memory (MB)\n")[1]
+        assert {line.split()[-1] for line in table.splitlines()} == {"-"}
+
+    def test_question_subset(self) -> None:
+        """Test that the memory questions share one analysis and unknown questions raise ValueError."""
+        assert question_stages(["positive_memory", "negative_memory", "saa"]) == ["memory", "saa_response"]
+        data = self.file
+        sections = analyze_study(data, questions=["positive_memory"])
+        assert [len(section["figures"]) for section in sections] == [3]
+        with pytest.raises(ValueError, match="unknown questions: memory"):
+            question_stages(["memory"])
+
+class TestBenchmarks(unittest.TestCase):
+    """Unit tests for the benchmark runner and its baseline comparison."""
+
+    def test_run_and_compare(self) -> None:
+        """Test that a run records every selected benchmark and flags only the slowed ones."""
+        current = run_benchmarks([78], ["chi_square", "heat_map"], min_time=0.0, max_repeat=1)
+        assert sorted(current["results"]) == ["chi_square@78", "heat_map@78"]
+        assert all(result["seconds"] > 0 and result["peak_memory_mb"] >= 0 for result in current["results"].values())
+
+        baseline = json.loads(json.dumps(current))
+        baseline["results"]["chi_square@78"]["seconds"] /= 2
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert compare(current, baseline) == ["chi_square@78"]
+            assert compare(current, baseline, tolerance=1.5) == []
+
+class TestTracer(unittest.TestCase):
+    """Unit tests for the opt-in function tracing."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Generate the dataset of the tests in a temporary dataset cache."""
+        cls.cache_directory = tempfile.TemporaryDirectory()
+        cls.file = InitializeFile(cache=DatasetCache(cls.cache_directory.name)).file
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Remove the dataset cache of the class."""
+        cls.cache_directory.cleanup()
+
+    def test_records_nested_calls(self) -> None:
+        """Test that traced calls are recorded with their nesting, input rows and a valid Chrome trace."""
+        data = self.file
+        with Tracer() as tracer, span("analysis") as block:
+            block["args"]["questions"] = 1
+            chi_square(prepare_data_from_csv(data))
+        names = [record["name"] for record in tracer.spans if record["name"] != "factor_codes"]
+        assert names == ["build_contingency_table", "prepare_data_from_csv", "chi_square", "analysis"]
+        records = {record["name"]: record for record in tracer.spans}
+        assert records["prepare_data_from_csv"]["rows"] == len(data)
+        assert [records[name]["depth"] for name in ["build_contingency_table", "prepare_data_from_csv", "analysis"]] == [2, 1, 0]
+        assert records["analysis"]["wall_ns"] >= records["prepare_data_from_csv"]["wall_ns"]
+
+        with tempfile.TemporaryDirectory() as directory:
+            trace = json.loads(tracer.write_chrome_trace(f"{directory}/trace.json").read_text())
+            log = tracer.write_log(f"{directory}/trace.jsonl").read_text().splitlines()
+        assert [event["ph"] for event in trace["traceEvents"]] == ["X"] * len(tracer.spans)
+        assert trace["traceEvents"][-1]["args"]["questions"] == 1
+        assert {json.loads(line)["name"] for line in log} == set(records)
+
+    def test_memory_and_disabled(self) -> None:
+        """Test that an enclosing span's peak covers its children, and nothing is recorded once the tracer exits."""
+        with Tracer(memory=True) as tracer, span("outer"):
+            kept = np.ones(100_000)
+            with span("inner"):
+                np.ones(200_000)
+        inner, outer = tracer.spans
+        assert inner["peak_bytes"] >= 1_600_000
+        assert outer["peak_bytes"] >= 2_400_000
+        assert outer["allocated_bytes"] >= kept.nbytes
+
+        chi_square(pd.DataFrame({"Responders": [5, 9], "Non-Responders": [8, 3]}))
+        assert len(tracer.spans) == 2
+
+class TestLazyImports(unittest.TestCase):
+    """Unit tests guarding the startup cost of statistics-only runs."""
+
+    def test_cli_import_skips_heavy_modules(self) -> None:
+        """Test that importing the command line loads neither the plotting stack nor scipy.stats."""
+        heavy = ["matplotlib", "seaborn", "scipy.stats", "statsmodels", "patsy"]
+        code = f"import json, sys; import src.cli; print(json.dumps([name for name in {heavy!r} if name in sys.modules]))"
+        loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        assert json.loads(loaded) == []
+
+    def test_chi_square_matches_scipy(self) -> None:
+        """Test that the chi-square test matches scipy's, with and without Yates' correction."""
+        for table in [[[12, 5], [7, 14]], [[12, 5], [7, 14], [3, 9]]]:
+            chi2, p, _ = chi_square(pd.DataFrame(table, columns=["Responders", "Non-Responders"]))
+            expected = chi2_contingency(table)
+            assert chi2 == pytest.approx(expected.statistic)
+            assert p == pytest.approx(expected.pvalue)
+
+class TestSimulation(unittest.TestCase):
+    """Unit tests for the Monte Carlo replicates of the study."""
+
+    def test_replicates_are_reproducible_and_independent(self) -> None:
+        """Test that replicates depend only on the seed, differ from each other and leave the global state alone."""
+        state = np.random.get_state()[1].copy()
+        replicates = simulate_study(4, seed=3, n_jobs=1)
+        assert (np.random.get_state()[1] == state).all()
+        pd.testing.assert_frame_equal(replicates, simulate_study(4, seed=3, n_jobs=2))
+        assert replicates["saa_anova.F"].nunique() == 4
+        assert {"cortisol_chi_square.p_value", "hc_pill_change.F", "negative_image.C(status).p_value"} <= set(replicates.columns)
+
+        # The first replicate reruns the analysis of one dataset
+        data = augment_with_cohorts(read_participants(), COHORT_SPEC, 1, SYNTHETIC_COLUMNS, rng=np.random.default_rng(np.random.SeedSequence(3).spawn(4)[0]))
+        assert replicates.loc[0, "saa_anova.F"] == pytest.approx(analyze_saa_response(data)["anova_results"]["f_statistic"])
+
+    def test_summary(self) -> None:
+        """Test the quantiles and rejection rates of the summary."""
+        replicates = pd.DataFrame({"test.F": [1.0, 2.0, 3.0, 4.0], "test.p_value": [0.01, 0.2, 0.04, np.nan]})
+        summary = summarize_simulation(replicates)
+        assert summary.loc["test.F", "median"] == 2.5
+        assert summary.loc["test.p_value", "rejection_rate"] == pytest.approx(2 / 3)
+        assert np.isnan(summary.loc["test.F", "rejection_rate"])
+        with pytest.raises(ValueError, match="n_replicates"):
+            simulate_study(0)
+
+class TestBatch(unittest.TestCase):
+    """Unit tests for the analysis of a batch of studies."""
+
+    def setUp(self) -> None:
+        """Write two studies of different participants and a manifest describing them."""
+        self.directory = tempfile.TemporaryDirectory()
+        root = Path(self.directory.name)
+        participants = pd.read_csv(DATA_PATH)
+        self.studies = {"site_a": participants.iloc[::2], "site_b": participants.iloc[1::2]}
+        for name, table in self.studies.items():
+            table.to_csv(root / f"{name}.csv", index=False)
+        self.manifest = root / "manifest.csv"
+        pd.DataFrame({"path": ["site_b.csv", "site_a.csv"], "site": ["B", "A"]}).to_csv(self.manifest, index=False)
+
+    def tearDown(self) -> None:
+        """Remove the study files."""
+        self.directory.cleanup()
+
+    def test_studies_and_pooled_row(self) -> None:
+        """Test the per-study rows against a direct analysis, the pooled row and that workers do not change them."""
+        results = analyze_studies(self.manifest, seed=5, n_jobs=1)
+        pd.testing.assert_frame_equal(results, analyze_studies(self.manifest, seed=5, n_jobs=2))
+        assert list(results.index) == ["site_b", "site_a", "pooled"]
+        assert results["site"].iloc[:2].tolist() == ["B", "A"]
+
+        # Every study draws from its own stream, spawned in manifest order
+        streams = np.random.SeedSequence(5).spawn(2)
+        augmented = [augment_with_cohorts(read_participants(Path(self.directory.name) / f"{name}.csv"), COHORT_SPEC, 1, SYNTHETIC_COLUMNS,
+                                          match_sizes=True, rng=np.random.default_rng(stream)) for name, stream in zip(["site_b", "site_a"], streams, strict=True)]
+        expected = analyze_saa_response(augmented[0], group_data=False)
+        assert results.loc["site_b", "saa_anova.F"] == pytest.approx(expected["anova_results"]["f_statistic"])
+
+        # The pooled row analyzes the participants of both studies as one cohort
+        pooled = pd.concat(augmented, ignore_index=True)
+        assert results.loc["pooled", "n_participants"] == len(pooled)
+        chi2, p, _ = chi_square(prepare_data_from_csv(pooled))
+        assert results.loc["pooled", ["cortisol_chi_square.chi2", "cortisol_chi_square.p_value"]].tolist() == pytest.approx([chi2, p])
+        expected = analyze_saa_response(pooled, group_data=False)
+        assert results.loc["pooled", "saa_anova.F"] == pytest.approx(expected["anova_results"]["f_statistic"])
+        assert results.loc["pooled", "saa_anova.cohens_d"] == pytest.approx(expected["effect_size"]["cohens_d"])
+        assert np.isnan(results.loc["pooled", "hc_pill_change.F"])
+
+    def test_directory_and_command_line(self) -> None:
+        """Test that a directory lists its CSV files and that the command line writes the results table."""
+        self.manifest.unlink()
+        assert list(read_manifest(self.directory.name).index) == ["site_a", "site_b"]
+        with tempfile.TemporaryDirectory() as output, contextlib.redirect_stderr(io.StringIO()):
+            assert main(["--batch", self.directory.name, "--output", output, "-j", "1"]) == 0
+            results = pd.read_csv(Path(output) / "results.csv", index_col="study")
+        assert list(results.index) == ["site_a", "site_b", "pooled"]
+
+    def test_read_ahead_is_bounded(self) -> None:
+        """Test that the files are read ahead of the analyses within a window of io_threads + n_jobs studies, not all at once."""
+        pd.DataFrame({"path": ["site_a.csv", "site_b.csv"] * 3, "study": list("abcdef")}).to_csv(self.manifest, index=False)
+        ahead = []
+        with mock.patch("src.functions.batch.study_statistics", wraps=study_statistics) as analyses:
+            def read(path: Path) -> pd.DataFrame:
+                ahead.append(len(ahead) + 1 - analyses.call_count)
+                return read_participants(path)
+            with mock.patch("src.functions.batch.read_participants", read):
+                results = analyze_studies(self.manifest, seed=5, n_jobs=1, io_threads=1)
+        assert len(ahead) == analyses.call_count == 6
+        assert max(ahead) <= 2
+        assert results["error"].isna().all()
+
+    def test_degenerate_study(self) -> None:
+        """Test that a study without HC participants gets its error instead of aborting the batch."""
+        participants = pd.read_csv(DATA_PATH)
+        participants[participants["status"] == "NC"].to_csv(Path(self.directory.name) / "nc_only.csv", index=False)
+        pd.DataFrame({"path": ["site_a.csv", "nc_only.csv", "site_b.csv"]}).to_csv(self.manifest, index=False)
+        results = analyze_studies(self.manifest, seed=5, n_jobs=1)
+        assert list(results.index) == ["site_a", "nc_only", "site_b", "pooled"]
+        assert results.columns[-1] == "error"
+        assert "groups is empty" in results.loc["nc_only", "error"]
+        assert results.loc["nc_only", ["cortisol_chi_square.chi2", "saa_anova.F", "hc_pill_change.F"]].isna().all()
+        assert results.loc["nc_only", "n_participants"] > 0
+        assert results.drop(index="nc_only")["error"].isna().all()
+        assert not np.isnan(results.loc["site_b", "saa_anova.F"])
+        assert not np.isnan(results.loc["pooled", "saa_anova.F"])
+
+    def test_errors(self) -> None:
+        """Test that invalid manifests raise errors and that a failing study is named."""
+        pd.DataFrame({"path": ["site_a.csv", "site_b.csv"], "study": ["x", "x"]}).to_csv(self.manifest, index=False)
+        with pytest.raises(ValueError, match="several studies are named x"):
+            read_manifest(self.manifest)
+        pd.DataFrame({"file": ["site_a.csv"]}).to_csv(self.manifest, index=False)
+        with pytest.raises(KeyError, match="path"):
+            read_manifest(self.manifest)
+        pd.DataFrame({"path": ["site_a.csv", "missing.csv"]}).to_csv(self.manifest, index=False)
+        with pytest.raises(FileNotFoundError) as error:
+            analyze_studies(self.manifest, n_jobs=1)
+        assert "study 'missing'" in error.value.__notes__[0]
+
+class TestPower(unittest.TestCase):
+    """Unit tests for the simulated power sweeps."""
+
+    def test_anova_power_matches_noncentral_f(self) -> None:
+        """Test that the simulated power of the one-way and factorial ANOVAs matches the noncentral F distribution."""
+        from scipy.stats import f, ncf
+        power = anova_power([20, 50], [0.0, 0.5], n_replicates=20_000, seed=1)
+        assert power.loc[:, 0.0].to_numpy() == pytest.approx([0.05, 0.05], abs=0.01)
+        for n in [20, 50]:
+            expected = ncf.sf(f.isf(0.05, 1, 2 * n - 2), 1, 2 * n - 2, 0.5 ** 2 * n / 2)
+            assert power.loc[n, 0.5] == pytest.approx(expected, abs=0.02)
+
+        power = factorial_power([5, 10], [0.5], term="C(status):C(saa_responders)", n_replicates=20_000, seed=1)
+        for n in [5, 10]:
+            expected = ncf.sf(f.isf(0.05, 1, 8 * (n - 1)), 1, 8 * (n - 1), 8 * n * 0.25 ** 2)
+            assert power.loc[n, 0.5] == pytest.approx(expected, abs=0.02)
+
+    def test_chi_square_power(self) -> None:
+        """Test that chi-square power stays below alpha without an effect, grows with the sample size, and is reproducible."""
+        power = chi_square_power([10, 40, 160], [0.0, 0.3], n_replicates=5_000, ratio=36 / 42, seed=2)
+        assert list(power.index) == [10, 40, 160]
+        assert (power[0.0] <= 0.06).all()
+        assert power[0.3].is_monotonic_increasing
+        assert power.loc[160, 0.3] > 0.9
+        pd.testing.assert_frame_equal(power, chi_square_power([10, 40, 160], [0.0, 0.3], n_replicates=5_000, ratio=36 / 42, seed=2))
+        with pytest.raises(ValueError, match="between 0 and 1"):
+            chi_square_power([10], [0.6])
+
+    def test_required_sample_size(self) -> None:
+        """Test that the smallest size reaching the target is found, and NaN when none does."""
+        power = pd.DataFrame({0.2: [0.1, 0.3, 0.5], 0.5: [0.4, 0.85, 0.95]}, index=pd.Index([10, 20, 30], name="n"))
+        sizes = required_sample_size(power)
+        assert np.isnan(sizes[0.2])
+        assert sizes[0.5] == 20
+        with pytest.raises(ValueError, match="unknown term"):
+            factorial_power([5], [0.5], term="C(age)")
+
+class TestOnlineStatistics(unittest.TestCase):
+    """Unit tests for the incremental statistics of enrolled participants."""
+
+    def setUp(self) -> None:
+        """Load a scaled dataset and split it into shuffled batches."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.data = InitializeFile(scale=5).file
+        order = np.random.default_rng(0).permutation(len(self.data))
+        self.batches = [self.data.iloc[part] for part in np.array_split(order, 7)]
+
+    def test_batches_and_shards_match_full_analysis(self) -> None:
+        """Test that statistics updated batch by batch on merged shards match those of the whole table."""
+        shards = [OnlineStudy(), OnlineStudy()]
+        for i, batch in enumerate(self.batches):
+            shards[i % 2].update(batch)
+        study = shards[0].merge(shards[1])
+
+        expected = analyze_saa_response(self.data)
+        result = study.saa_response()
+        for key in ["anova_results", "effect_size"]:
+            assert result[key] == pytest.approx(expected[key])
+        for group in ["HC", "NC"]:
+            assert result["summary_statistics"][group] == pytest.approx(expected["summary_statistics"][group])
+
+        chi2, p, table = study.chi_square()
+        expected_chi2, expected_p, expected_table = chi_square(prepare_data_from_csv(self.data))
+        assert (chi2, p) == pytest.approx((expected_chi2, expected_p))
+        assert (table == expected_table).all()
+        pd.testing.assert_frame_equal(study.cortisol.table(), prepare_data_from_csv(self.data))
+
+    def test_cell_moments(self) -> None:
+        """Test the moments of cells formed by several columns, skipping missing values."""
+        data = self.data.copy()
+        data.loc[data.index[:3], "negative_image"] = np.nan
+        moments = GroupMoments("negative_image", ["status", "responsive_state_SAA"])
+        for part in np.array_split(np.arange(len(data)), 4):
+            moments.update(data.iloc[part])
+        grouped = data.groupby(["status", "responsive_state_SAA"])["negative_image"]
+        summary = moments.summary()
+        for cell, values in grouped:
+            assert summary[cell]["count"] == values.count()
+            assert summary[cell]["mean"] == pytest.approx(values.mean())
+            assert summary[cell]["std"] == pytest.approx(values.std())
+            assert summary[cell]["max"] == values.max()
+        expected = f_oneway(*[values.dropna() for _, values in grouped])
+        assert moments.anova()["f_statistic"] == pytest.approx(expected.statistic)
+
+    def test_errors(self) -> None:
+        """Test that mismatched merges, unknown groups and missing columns raise errors."""
+        moments = GroupMoments("negative_image", "status").update(self.data)
+        with pytest.raises(ValueError, match="same measurement"):
+            moments.merge(GroupMoments("positive_image", "status"))
+        with pytest.raises(ValueError, match="unknown groups"):
+            moments.cohens_d("HC", "XX")
+        with pytest.raises(KeyError, match="Missing required columns"):
+            ContingencyCounts().update(self.data[["status"]])
+        with pytest.raises(ValueError, match="empty"):
+            OnlineStudy().update(self.data[self.data["status"] == "NC"]).saa_response()
+
+class TestOutOfCore(unittest.TestCase):
+    """Unit tests for the memory-mapped column store and the block-wise group statistics."""
+
+    def setUp(self) -> None:
+        """Augment the same scaled dataset in memory and into a column store."""
+        self.directory = tempfile.TemporaryDirectory()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.data = InitializeFile(scale=50, chunksize=30).file
+            self.mapped = InitializeFile(scale=50, chunksize=30, store=ColumnStore(self.directory.name)).file
+
+    def tearDown(self) -> None:
+        """Remove the column store."""
+        del self.mapped
+        self.directory.cleanup()
+
+    def test_store_round_trip(self) -> None:
+        """Test that the stored table holds the same values as memory-mapped columns, without the identifiers."""
+        assert list(self.mapped.columns) == [column for column in self.data.columns if column != "humans"]
+        for column in self.mapped.columns:
+            expected = self.data[column]
+            if isinstance(expected.dtype, pd.CategoricalDtype):
+                assert self.mapped[column].dtype == expected.dtype
+                assert self._mapped(self.mapped[column].cat.codes.to_numpy())
+                np.testing.assert_array_equal(self.mapped[column].cat.codes, expected.cat.codes)
+            else:
+                assert self._mapped(self.mapped[column].to_numpy())
+                np.testing.assert_array_equal(self.mapped[column], expected)
+        with pytest.raises(FileNotFoundError, match="no table"):
+            ColumnStore(self.directory.name + "/empty").open()
+
+    def test_write_keeps_foreign_files(self) -> None:
+        """Test that rewriting a store keeps the other files of its directory and that foreign directories are refused."""
+        foreign = Path(self.directory.name) / "notes"
+        foreign.mkdir()
+        (foreign / "readme.txt").write_text("keep")
+        store = ColumnStore(self.directory.name)
+        assert store.write([self.data.iloc[:10]]) == 10
+        assert (foreign / "readme.txt").read_text() == "keep"
+        assert len(store.open()) == 10
+        with pytest.raises(FileExistsError, match="not empty"):
+            ColumnStore(foreign).write([self.data.iloc[:10]])
+        assert (foreign / "readme.txt").exists()
+
+    def test_blocks_match_in_memory_analysis(self) -> None:
+        """Test that the analyses of the mapped table, read in small blocks, match those of the in-memory table."""
+        expected_saa = analyze_saa_response(self.data, group_data=False)
+        expected_anova = calculate_two_way_anova_with_viz(self.data, ["negative_image"])[1]["negative_image"]
+        expected_regressions = linear_regressions(self.data, ["BMI"], ["positive_image"], by="status")
+        with mock.patch("src.functions.calculate.BLOCK_SIZE", 1000):
+            saa = analyze_saa_response(self.mapped, group_data=False)
+            anova = calculate_two_way_anova_with_viz(self.mapped, ["negative_image"])[1]["negative_image"]
+            regressions = linear_regressions(self.mapped, ["BMI"], ["positive_image"], by="status")
+        for key in ["anova_results", "effect_size"]:
+            assert saa[key] == pytest.approx(expected_saa[key])
+        for group in ["HC", "NC"]:
+            assert saa["summary_statistics"][group] == pytest.approx(expected_saa["summary_statistics"][group])
+        pd.testing.assert_frame_equal(anova, expected_anova, rtol=1e-9, atol=1e-6)
+        pd.testing.assert_frame_equal(regressions, expected_regressions, rtol=1e-9)
+
+    def test_peak_memory_bounded_by_block(self) -> None:
+        """Test that the sAA statistics of the mapped table allocate far less than one of its columns."""
+        with mock.patch("src.functions.calculate.BLOCK_SIZE", 256):
+            tracemalloc.start()
+            try:
+                analyze_saa_response(self.mapped, group_data=False)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        assert peak < self.mapped["change_image_sAA_level"].nbytes
+
+    @staticmethod
+    def _mapped(array: np.ndarray) -> bool:
+        """Whether an array is a view of a memory-mapped file."""
+        while array is not None and not isinstance(array, np.memmap):
+            array = array.base
+        return array is not None
+
+class TestResultCache(unittest.TestCase):
+    """Unit tests for the memoized analysis results."""
+
+    def setUp(self) -> None:
+        """Load the dataset."""
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.data = InitializeFile().file
+
+    def test_keys_follow_used_columns_and_parameters(self) -> None:
+        """Test that only the columns a function reads and its parameters decide whether a result is reused."""
+        with ResultCache() as cache:
+            first = analyze_saa_response(self.data)
+            first["anova_results"]["f_statistic"] = 0.0
+            second = analyze_saa_response(self.data, n_resamples=0)
+            assert second == analyze_saa_response(self.data.copy())
+            assert second["anova_results"]["f_statistic"] > 0
+            assert (cache.hits, cache.misses) == (2, 1)
+
+            changed = self.data.copy()
+            changed["BMI"] = 0.0
+            analyze_saa_response(changed)
+            analyze_saa_response(self.data, group_data=False)
+            changed.loc[0, "change_image_sAA_level"] += 1
+            analyze_saa_response(changed)
+            stats = cache.stats()
+            assert stats | {"hit_rate": 0, "memory_bytes": 0} == {"hits": 3, "disk_hits": 0, "misses": 3, "hit_rate": 0, "entries": 3, "memory_bytes": 0}
+            assert stats["memory_bytes"] > 0
+
+            group_means, tables = calculate_two_way_anova_with_viz(self.data.copy(), ["negative_image"])
+            cached_means, cached_tables = calculate_two_way_anova_with_viz(self.data.copy(), ["negative_image"])
+            pd.testing.assert_frame_equal(cached_means, group_means)
+            pd.testing.assert_frame_equal(cached_tables["negative_image"], tables["negative_image"])
+            assert cache.hits == 4
+        analyze_saa_response(self.data)
+        assert cache.hits == 4
+
+    def test_key_samples_large_columns(self) -> None:
+        """Test that long columns are keyed by a sample: edits of sampled rows are noticed, column types too."""
+        data = pd.concat([self.data] * 20, ignore_index=True)
+        with ResultCache() as cache:
+            analyze_saa_response(data, group_data=False)
+            changed = data.copy()
+            changed.loc[len(data) - 1, "change_image_sAA_level"] += 1
+            analyze_saa_response(changed, group_data=False)
+            analyze_saa_response(data.astype({"change_image_sAA_level": np.float32}), group_data=False)
+            analyze_saa_response(data.copy(), group_data=False)
+            assert (cache.hits, cache.misses) == (1, 3)
+
+    def test_memory_lru_and_disk_tier(self) -> None:
+        """Test the eviction of the least recently used results and the reuse of results across caches through disk."""
+        table = prepare_data_from_csv(self.data)
+        counts = table.select_dtypes("number").columns
+        tables = [table.assign(**{column: table[column] + i for column in counts}) for i in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            with ResultCache(max_entries=2, directory=directory) as cache:
+                for table in tables:
+                    chi_square(table)
+                chi_square(tables[2])
+                chi_square(tables[0])
+                assert (cache.hits, cache.disk_hits, cache.misses) == (1, 1, 3)
+                assert cache.stats()["entries"] == 2
+
+            with ResultCache(directory=directory) as cache:
+                chi2, p, _ = chi_square(tables[1])
+                assert (chi2, p) == chi_square.__wrapped__.__wrapped__(tables[1])[:2]
+                assert cache.disk_hits == 1
+
+            # A change anywhere in the package's code makes the stored results stale
+            with mock.patch("src.objects.result_cache.source_digest", return_value="edited"), ResultCache(directory=directory) as cache:
+                chi_square(tables[1])
+                assert (cache.disk_hits, cache.misses) == (0, 1)
+
+            cache = ResultCache(directory=directory, max_bytes=1)
+            cache.evict()
+            assert list(Path(directory).glob("*.pkl")) == []
+        with pytest.raises(ValueError, match="max_entries"):
+            ResultCache(max_entries=0)
+
+    def test_ignored_and_skipped_arguments(self) -> None:
+        """Test that the number of workers does not enter the key and that unseeded resampling is never cached."""
+        with ResultCache() as cache:
+            seeded = analyze_saa_response(self.data, n_resamples=50, seed=3, n_jobs=1, group_data=False)
+            assert analyze_saa_response(self.data, n_resamples=50, seed=3, n_jobs=2, group_data=False) == seeded
+            assert (cache.hits, cache.misses) == (1, 1)
+            first = analyze_saa_response(self.data, n_resamples=50, group_data=False)
+            second = analyze_saa_response(self.data, n_resamples=50, group_data=False)
+            assert first["resampling"] != second["resampling"]
+            assert (cache.hits, cache.misses, cache.stats()["entries"]) == (1, 1, 1)
+        with pytest.raises(ValueError, match="no parameters workers"):
+            memoized(ignore=["workers"])(analyze_saa_response.__wrapped__.__wrapped__)
+
+    def test_memory_size_limit(self) -> None:
+        """Test that the memory tier drops the least recently used results beyond its size limit and skips larger ones."""
+        with ResultCache(max_memory_bytes=1) as cache:
+            analyze_saa_response(self.data)
+            analyze_saa_response(self.data)
+            assert cache.stats()["entries"] == cache.stats()["memory_bytes"] == 0
+            assert (cache.hits, cache.misses) == (0, 2)
+        with ResultCache() as cache:
+            analyze_saa_response(self.data, group_data=False)
+            small = cache.stats()["memory_bytes"]
+        with ResultCache(max_memory_bytes=2 * small) as cache:
+            tables = [self.data.assign(change_image_sAA_level=self.data["change_image_sAA_level"] + i) for i in range(3)]
+            for table in tables:
+                analyze_saa_response(table, group_data=False)
+            assert cache.stats()["entries"] == 2
+            assert cache.stats()["memory_bytes"] <= 2 * small
+            analyze_saa_response(tables[2], group_data=False)
+            analyze_saa_response(tables[0], group_data=False)
+            assert (cache.hits, cache.misses) == (1, 4)
+
+class TestGenerateNumbersWithStatsBatch(unittest.TestCase):
+    """Unit tests for the batched number generator."""
+
+    def test_matches_single_cohort_calls(self) -> None:
+        """Test that a batch reproduces one generate_numbers_with_stats call per cohort under the same seed."""
+        np.random.seed(7)
+        expected = [generate_numbers_with_stats(5, 1.0, 0.5, 0.0, 2.0), generate_numbers_with_stats(8, -3.0, 1.0, -5.0, 0.0)]
+        np.random.seed(7)
+        values, offsets = generate_numbers_with_stats_batch([5, 8], [1.0, -3.0], [0.5, 1.0], [0.0, -5.0], [2.0, 0.0])
+        assert list(offsets) == [0, 5, 13]
+        for i, cohort in enumerate(expected):
+            np.testing.assert_allclose(values[offsets[i]:offsets[i + 1]], cohort)
+
+    def test_invalid_arguments(self) -> None:
+        """Test that invalid cohorts raise ValueError."""
+        with pytest.raises(ValueError, match="at least 2"):
+            generate_numbers_with_stats_batch([1, 4], 0.0, 1.0, -1.0, 1.0)
+        with pytest.raises(ValueError, match="min_val"):
+            generate_numbers_with_stats_batch([4, 4], 0.0, 1.0, [1.0, -1.0], [0.0, 1.0])
+
+class TestAugmentWithCohorts(unittest.TestCase):
+    """Unit tests for the spec-driven cohort generator."""
+
+    def setUp(self) -> None:
+        """Create a small participant table and a matching cohort specification."""
+        self.data = pd.DataFrame({
+            "humans": ["human1", "human2", "human3", "human4", "human5"],
+            "status": ["NC", "NC", "HC", "HC", "HC"],
+        })
+        self.spec = pd.DataFrame(
+            [("score", "NC", 2, 1.0, 0.5, 0.0, 2.0), ("score", "HC", 3, 5.0, 1.0, 4.0, 6.0)],
+            columns=["column", "status", "n", "mean", "std", "min", "max"],
+        )
+
+    def test_cohorts_fill_matching_participants(self) -> None:
+        """Test that every cohort lands in its own participants and stays within its range."""
+        result = augment_with_cohorts(self.data, self.spec)
+        assert result["score"][:2].between(0.0, 2.0).all()
+        assert result["score"][2:].between(4.0, 6.0).all()
+        assert result["score"][2:].is_monotonic_increasing
+
+    def test_scale_replicates_participants(self) -> None:
+        """Test that scaling replicates participants and renames them uniquely."""
+        result = augment_with_cohorts(self.data, self.spec, scale=4)
+        assert len(result) == 20
+        assert (result["status"] == "NC").sum() == 8
+        assert result["humans"].is_unique
+
+    def test_mismatched_cohort_size(self) -> None:
+        """Test that a cohort size not matching the participants raises ValueError."""
+        spec = self.spec.copy()
+        spec.loc[0, "n"] = 3
+        with pytest.raises(ValueError, match="expects 3 participants"):
+            augment_with_cohorts(self.data, spec)
+
 if __name__ == "__main__":
     unittest.main()